@@ -0,0 +1,302 @@
+# Description:  Streams archives of recorded Gess games, such as the JSON lines
+# files written by GessSelfPlay, and replays every game through the headless
+# GessGame rules.  Files are read one line at a time and handed to a process
+# pool in chunks, with a bounded number of chunks in flight, so memory stays
+# flat however large the archive is.  Reports the distribution of game
+# lengths, the stones captured, the plies at which rings were lost and the
+# most frequent openings.
+#
+# Usage:  python GessAnalyze.py games.jsonl [more.jsonl.gz ...] [-w 4] [-o stats.json]
+#
+# Each line holds one game, either as a JSON object with a "moves" list or as a
+# bare JSON list of [x1, y1, x2, y2] moves. Blank lines are skipped.
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from GessBitboard import count, shift
+from GessGame import GessGame
+
+
+def open_archive(path):
+    """ Returns a text file object for the archive, - for stdin and .gz for gzip. """
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path)
+
+
+def read_lines(paths):
+    """ Yields the non-blank lines of the archives one at a time. """
+    for path in paths:
+        archive = open_archive(path)
+        try:
+            for line in archive:
+                if line.strip():
+                    yield line
+        finally:
+            if archive is not sys.stdin:
+                archive.close()
+
+
+def parse_moves(line):
+    """
+    Takes as a parameter one line of an archive. Returns a generator of its moves
+    as (x1, y1, x2, y2) tuples. Raises ValueError if the line is not a game.
+    """
+    record = json.loads(line)
+    if isinstance(record, dict):
+        record = record.get("moves")
+    if not isinstance(record, list):
+        raise ValueError("expected a list of moves")
+    return (tuple(move) for move in record)
+
+
+def read_games(paths):
+    """ Yields a generator of moves for every game in the archives, in order. """
+    for line in read_lines(paths):
+        yield parse_moves(line)
+
+
+def replay(moves, opening_plies=2):
+    """
+    Takes as parameters an iterable of moves and the number of plies that make up
+    an opening. Replays the moves from the starting position and returns a
+    dictionary with the number of plies played, the final game state, the stones
+    each player captured, the number of capturing moves, the (owner, ply) of every
+    ring lost, the opening moves and whether every move was legal.
+    """
+    game = GessGame()
+    bitboard = game.get_bitboard()
+    captured = {"x": 0, "o": 0}
+    capture_moves = 0
+    ring_losses = []
+    opening = []
+    legal = True
+
+    for move in moves:
+        if len(move) != 4 or game.get_game_state() != "UNFINISHED":
+            legal = False
+            break
+        player = game.get_current_player()
+        opponent = "o" if player == "x" else "x"
+        stones = count(bitboard.stones(opponent))
+        rings = {"x": game.get_ring_centres("x"), "o": game.get_ring_centres("o")}
+        if not game.push_move(*move):
+            legal = False
+            break
+
+        # The board is changed in place, so the same Bitboard shows the new stones.
+        lost = stones - count(bitboard.stones(opponent))
+        if lost:
+            captured[player] += lost
+            capture_moves += 1
+        ply = game.get_ply_count()
+        # A move can break one ring and make another, so compare the centers
+        # rather than the number of rings. The centers under the piece move
+        # with it, so a ring carried along is not lost.
+        geometry = bitboard.geometry
+        x1, y1, x2, y2 = move
+        carried = rings[player] & geometry.footprints[geometry.index(x1, y1)]
+        rings[player] = rings[player] & ~carried | shift(carried, (y2 - y1) * geometry.size + x2 - x1)
+        for owner in ("x", "o"):
+            for _ in range(count(rings[owner] & ~game.get_ring_centres(owner))):
+                ring_losses.append((owner, ply))
+        if ply <= opening_plies:
+            opening.append(move)
+
+    return {"plies": game.get_ply_count(), "result": game.get_game_state(),
+            "captured": captured, "capture_moves": capture_moves,
+            "ring_losses": ring_losses, "opening": tuple(opening), "legal": legal}
+
+
+class ArchiveStats:
+    """
+    The ArchiveStats class accumulates the statistics of many replayed games.
+    Every field is a count or a Counter, so the statistics of separate shards
+    can be merged in any order.
+    """
+
+    def __init__(self):
+        """ Initializes empty statistics. """
+        self.games = 0
+        self.illegal = 0
+        self.errors = 0
+        self.results = Counter()
+        self.lengths = Counter()
+        self.captured = Counter()
+        self.capture_moves = 0
+        self.captures_per_game = Counter()
+        self.ring_losses = {"x": Counter(), "o": Counter()}
+        self.openings = Counter()
+
+    def add(self, summary):
+        """ Adds the statistics of one game, as returned by replay. """
+        self.games += 1
+        self.illegal += not summary["legal"]
+        self.results[summary["result"]] += 1
+        self.lengths[summary["plies"]] += 1
+        self.captured.update(summary["captured"])
+        self.capture_moves += summary["capture_moves"]
+        self.captures_per_game[summary["capture_moves"]] += 1
+        for owner, ply in summary["ring_losses"]:
+            self.ring_losses[owner][ply] += 1
+        if summary["opening"]:
+            self.openings[" ".join("%d,%d-%d,%d" % move for move in summary["opening"])] += 1
+
+    def merge(self, other):
+        """ Adds the statistics of another ArchiveStats to this one. """
+        self.games += other.games
+        self.illegal += other.illegal
+        self.errors += other.errors
+        self.results.update(other.results)
+        self.lengths.update(other.lengths)
+        self.captured.update(other.captured)
+        self.capture_moves += other.capture_moves
+        self.captures_per_game.update(other.captures_per_game)
+        for owner in self.ring_losses:
+            self.ring_losses[owner].update(other.ring_losses[owner])
+        self.openings.update(other.openings)
+
+    def to_dict(self, top=10):
+        """
+        Returns the statistics as a dictionary that can be written as JSON, with
+        the given number of most frequent openings.
+        """
+        plies = sum(length * games for length, games in self.lengths.items())
+        return {
+            "games": self.games,
+            "illegal_games": self.illegal,
+            "unreadable_lines": self.errors,
+            "results": dict(self.results),
+            "average_plies": plies / self.games if self.games else 0.0,
+            "shortest": min(self.lengths) if self.lengths else 0,
+            "longest": max(self.lengths) if self.lengths else 0,
+            "lengths": {str(length): games for length, games in sorted(self.lengths.items())},
+            "captured_stones": {"x": self.captured["x"], "o": self.captured["o"]},
+            "capture_moves": self.capture_moves,
+            "captures_per_game": {str(moves): games
+                                  for moves, games in sorted(self.captures_per_game.items())},
+            "ring_losses": {owner: {str(ply): rings for ply, rings in sorted(losses.items())}
+                            for owner, losses in self.ring_losses.items()},
+            "openings": [[opening, games] for opening, games in self.openings.most_common(top)],
+        }
+
+
+def analyze_lines(lines, opening_plies=2):
+    """
+    Takes as parameters a list of archive lines and the number of plies in an
+    opening. Replays every game and returns the ArchiveStats of the chunk.
+    Lines that are not games are counted as errors.
+    """
+    stats = ArchiveStats()
+    for line in lines:
+        try:
+            moves = parse_moves(line)
+            summary = replay(moves, opening_plies)
+        except (ValueError, TypeError):
+            stats.errors += 1
+            continue
+        stats.add(summary)
+    return stats
+
+
+def _chunks(lines, size):
+    """ Yields lists of up to size lines. """
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def analyze(paths, workers=None, chunk_size=100, opening_plies=2, progress=None):
+    """
+    Takes as parameters a list of archive paths, and optionally the number of
+    worker processes, the number of games per chunk, the number of plies in an
+    opening and a function called with the number of games analyzed so far.
+    Returns the ArchiveStats of every game and the time taken in seconds.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = ArchiveStats()
+    start = time.perf_counter()
+    chunks = _chunks(read_lines(paths), chunk_size)
+
+    if workers == 1:
+        for chunk in chunks:
+            stats.merge(analyze_lines(chunk, opening_plies))
+            if progress is not None:
+                progress(stats.games + stats.errors)
+        return stats, time.perf_counter() - start
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        exhausted = False
+        while not exhausted or pending:
+            # Keep a bounded number of chunks in flight so memory stays flat.
+            while not exhausted and len(pending) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending.add(executor.submit(analyze_lines, chunk, opening_plies))
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stats.merge(future.result())
+            if progress is not None:
+                progress(stats.games + stats.errors)
+
+    return stats, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze archives of recorded Gess games.")
+    parser.add_argument("archives", nargs="+", help="JSON lines files, .gz allowed, - for stdin")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--chunk", type=int, default=100, help="games sent to a worker at a time")
+    parser.add_argument("--opening-plies", type=int, default=2, help="plies that make up an opening")
+    parser.add_argument("--top", type=int, default=10, help="number of openings to report")
+    parser.add_argument("-o", "--output", default=None, help="JSON file to write the statistics to")
+    args = parser.parse_args(argv)
+
+    try:
+        stats, seconds = analyze(args.archives, args.workers, args.chunk, args.opening_plies)
+    except OSError as error:
+        parser.error(str(error))
+
+    report = stats.to_dict(args.top)
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    print("%d games in %.1f s: %.1f games/s" % (
+        stats.games, seconds, stats.games / seconds if seconds > 0 else 0.0))
+    print("plies: average %.1f, shortest %d, longest %d" % (
+        report["average_plies"], report["shortest"], report["longest"]))
+    print("results: %s" % ", ".join("%s %d" % item for item in sorted(stats.results.items())))
+    print("captured stones: x %d, o %d in %d capturing moves" % (
+        report["captured_stones"]["x"], report["captured_stones"]["o"], stats.capture_moves))
+    for owner, name in (("x", "black"), ("o", "white")):
+        losses = stats.ring_losses[owner]
+        if losses:
+            first = min(losses)
+            print("%s rings lost: %d, first at ply %d" % (name, sum(losses.values()), first))
+    if stats.illegal or stats.errors:
+        print("illegal games %d, unreadable lines %d" % (stats.illegal, stats.errors))
+    for opening, games in report["openings"]:
+        print("%6d  %s" % (games, opening))
+
+
+if __name__ == "__main__":
+    main()
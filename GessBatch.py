@@ -0,0 +1,147 @@
+# Description:  Batched versions of the Gess ring and piece checks for many
+# boards at once, for dataset generation and rollouts.  Boards are stacked in an
+# (N, 20, 20) int8 NumPy array with EMPTY, BLACK and WHITE squares, and every
+# check works on whole arrays with shifted slices instead of Python loops.  The
+# results are the same as GessGame.check_ring and GamePiece.valid_piece.
+#
+# NumPy is an optional dependency: only this module needs it, and the rules,
+# the players and the tools run without it.
+
+import numpy as np
+
+from GessBitboard import SIZE
+
+# Square values in a board array.
+EMPTY = 0
+BLACK = 1
+WHITE = 2
+
+_CODES = {" ": EMPTY, "x": BLACK, "o": WHITE}
+
+# (row, column) offsets of the squares of a 3x3 piece, row by row.
+_PIECE_OFFSETS = tuple((dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+
+
+def player_code(player):
+    """ Returns the square value of the stones of player "x" or "o". """
+    if player == "x":
+        return BLACK
+    if player == "o":
+        return WHITE
+    raise ValueError("player must be 'x' or 'o', not %r" % (player,))
+
+
+def boards_to_array(boards):
+    """
+    Takes as a parameter a list of boards in the list of lists format used by
+    GessGame. Returns an (N, 20, 20) int8 array.
+    """
+    array = np.zeros((len(boards), SIZE, SIZE), dtype=np.int8)
+    for number, board in enumerate(boards):
+        array[number] = [[_CODES[square] for square in row] for row in board]
+    return array
+
+
+def bitboards_to_array(bitboards):
+    """
+    Takes as a parameter a list of Bitboard objects. Returns an (N, 20, 20) int8
+    array.
+    """
+    byte_count = (SIZE * SIZE + 7) // 8
+    black = np.frombuffer(b"".join(bitboard.black.to_bytes(byte_count, "little")
+                                   for bitboard in bitboards), dtype=np.uint8)
+    white = np.frombuffer(b"".join(bitboard.white.to_bytes(byte_count, "little")
+                                   for bitboard in bitboards), dtype=np.uint8)
+    shape = (len(bitboards), SIZE, SIZE)
+    black = np.unpackbits(black.reshape(len(bitboards), byte_count), axis=1,
+                          bitorder="little")[:, :SIZE * SIZE].reshape(shape)
+    white = np.unpackbits(white.reshape(len(bitboards), byte_count), axis=1,
+                          bitorder="little")[:, :SIZE * SIZE].reshape(shape)
+    return (black * BLACK + white * WHITE).astype(np.int8)
+
+
+def _check_boards(boards):
+    """ Raises ValueError unless boards is an (N, 20, 20) array. """
+    if boards.ndim != 3 or boards.shape[1:] != (SIZE, SIZE):
+        raise ValueError("boards must have shape (N, %d, %d), not %r" % (SIZE, SIZE, boards.shape))
+
+
+def ring_map(boards, code):
+    """
+    Takes as parameters an (N, 20, 20) board array and the square value of one
+    player's stones. Returns an (N, 18, 18) bool array that is True where the
+    square in row y + 1 and column x + 1 is the empty center of that player's
+    ring.
+    """
+    boards = np.asarray(boards)
+    _check_boards(boards)
+    rings = boards[:, 1:-1, 1:-1] == EMPTY
+    for dy, dx in _PIECE_OFFSETS:
+        if dy or dx:
+            rings &= boards[:, 1 + dy:SIZE - 1 + dy, 1 + dx:SIZE - 1 + dx] == code
+    return rings
+
+
+def ring_counts(boards):
+    """
+    Takes as a parameter an (N, 20, 20) board array. Returns two int arrays of
+    length N with the number of black rings and white rings on each board.
+    """
+    black = ring_map(boards, BLACK).sum(axis=(1, 2))
+    white = ring_map(boards, WHITE).sum(axis=(1, 2))
+    return black, white
+
+
+def check_rings(boards):
+    """
+    Takes as a parameter an (N, 20, 20) board array. Returns two bool arrays of
+    length N that say whether each board has a black ring and a white ring, the
+    batched counterpart of GessGame.check_ring.
+    """
+    black, white = ring_counts(boards)
+    return black > 0, white > 0
+
+
+def valid_piece_map(boards, player):
+    """
+    Takes as parameters an (N, 20, 20) board array and the player "x" or "o".
+    Returns an (N, 18, 18) bool array that is True where the 3x3 piece centered
+    on the square in row y + 1 and column x + 1 is a valid piece for the player,
+    as decided by GamePiece.valid_piece.
+    """
+    boards = np.asarray(boards)
+    _check_boards(boards)
+    code = player_code(player)
+    own = np.zeros((boards.shape[0], SIZE - 2, SIZE - 2), dtype=bool)
+    valid = np.ones((boards.shape[0], SIZE - 2, SIZE - 2), dtype=bool)
+    for dy, dx in _PIECE_OFFSETS:
+        squares = boards[:, 1 + dy:SIZE - 1 + dy, 1 + dx:SIZE - 1 + dx]
+        own |= squares == code
+        valid &= (squares == code) | (squares == EMPTY)
+    return valid & own
+
+
+def valid_pieces(boards, player, xs, ys):
+    """
+    Takes as parameters an (N, 20, 20) board array, the player "x" or "o", and
+    two integer arrays with the column and row of a candidate piece center for
+    every board. Returns a bool array of length N that is True where the piece
+    is valid, as decided by GamePiece.valid_piece. Every center must be in
+    columns and rows 1 to 18.
+    """
+    boards = np.asarray(boards)
+    _check_boards(boards)
+    code = player_code(player)
+    xs = np.asarray(xs, dtype=np.intp)
+    ys = np.asarray(ys, dtype=np.intp)
+    if xs.shape != (boards.shape[0],) or ys.shape != (boards.shape[0],):
+        raise ValueError("xs and ys must have one center per board")
+    if ((xs < 1) | (xs > SIZE - 2) | (ys < 1) | (ys > SIZE - 2)).any():
+        raise ValueError("piece centers must be in columns and rows 1 to %d" % (SIZE - 2))
+
+    offsets = np.array(_PIECE_OFFSETS, dtype=np.intp)
+    rows = ys[:, None] + offsets[:, 0]
+    columns = xs[:, None] + offsets[:, 1]
+    pieces = boards[np.arange(boards.shape[0])[:, None], rows, columns]
+    return (((pieces == code) | (pieces == EMPTY)).all(axis=1)
+            & (pieces == code).any(axis=1))
@@ -0,0 +1,640 @@
+# Description:  A bitboard representation of the Gess board.  The black and white
+# stones are each stored as one integer, with the square in row y and column x
+# at bit y * size + x, which is 400 bits on the standard 20x20 board.  The 3x3
+# footprint of a piece, the stones removed from the edges of the board, and the
+# search for rings all become a handful of integer mask operations instead of
+# loops over a list of lists.  The masks for a board size are kept in a
+# Geometry, and the module constants are those of the standard board.
+
+SIZE = 20
+
+# The eight directions a piece can move in, as (x, y) steps, in the same order
+# as the GamePiece.move_* methods.
+DIRECTIONS = ((-1, -1), (0, -1), (1, -1),
+              (-1, 0), (1, 0),
+              (-1, 1), (0, 1), (1, 1))
+
+# Boards up to this size build every mask table when the Geometry is made.
+# Larger boards build each mask the first time it is used, since a full table
+# of board-sized masks grows with the fourth power of the size.
+_EAGER_SIZE = 32
+
+
+class _LazyMasks(dict):
+    """ A dictionary from bit index to mask that builds each mask when it is first read. """
+
+    __slots__ = ("_build",)
+
+    def __init__(self, build):
+        super().__init__()
+        self._build = build
+
+    def __missing__(self, centre):
+        mask = self[centre] = self._build(centre)
+        return mask
+
+
+class Geometry:
+    """
+    The Geometry class holds everything that depends on the size of a square
+    board: the bit offsets of neighbouring squares, the edge and interior masks,
+    and tables indexed by the bit index of a center with the footprint of the
+    piece there, the centers near it and the squares it moves into.
+    """
+
+    def __init__(self, size=SIZE):
+        """ Takes as an optional parameter the number of rows and columns, at least 5. """
+        if size < 5:
+            raise ValueError("a board needs at least 5 rows and columns, not %d" % size)
+        self.size = size
+
+        # Bit offsets of the eight squares around a center square.
+        self.ring_offsets = tuple(dy * size + dx for dx, dy in DIRECTIONS)
+        self._up_left, self._up, self._up_right = size + 1, size, size - 1
+
+        row = (1 << size) - 1
+        self.full = (1 << (size * size)) - 1
+        inner_row = row & ~1 & ~(1 << (size - 1))
+        self.interior = sum(inner_row << (y * size) for y in range(1, size - 1))
+        self.edge = self.full & ~self.interior
+        self.not_edge = self.interior
+        self._block = 7 | 7 << size | 7 << (2 * size)
+
+        tables = list if size <= _EAGER_SIZE else _LazyMasks
+        self.footprints = self._table(tables, self._footprint)
+
+        # A piece centered within two squares of a ring overlaps that ring.
+        self.neighbourhoods = self._table(tables, lambda centre: self._centre_mask(centre, 2))
+
+        # Two rings more than four squares apart can never both be overlapped by one piece.
+        self.surroundings = self._table(tables, lambda centre: self._centre_mask(centre, 4))
+
+        # The squares within three of a ring center, which a piece overlapping
+        # the ring can cover.
+        self.ring_zones = self._table(tables, lambda centre: self._centre_mask(centre, 3))
+
+        # For every direction, the squares a piece moves into when it takes one
+        # step, and the number of steps it can take before its center leaves
+        # the board.
+        self.leads = [self._table(tables, self._lead_builder(direction))
+                      for direction in range(len(DIRECTIONS))]
+        self.ray_lengths = [self._table(tables, self._length_builder(direction))
+                            for direction in range(len(DIRECTIONS))]
+
+    def _table(self, tables, build):
+        """ Returns a list of the built mask of every square, or a lazy table. """
+        if tables is list:
+            return [build(centre) for centre in range(self.size * self.size)]
+        return _LazyMasks(build)
+
+    def index(self, x, y):
+        """ Returns the bit index of the square in column x and row y. """
+        return y * self.size + x
+
+    def is_centre(self, centre):
+        """ Returns True if the bit index is a square that can be the center of a piece. """
+        x, y = centre % self.size, centre // self.size
+        return 0 < x < self.size - 1 and 0 < y < self.size - 1
+
+    def _footprint(self, centre):
+        """ Returns the 3x3 footprint of the piece centered on the bit index. """
+        if not self.is_centre(centre):
+            return 0
+        return self._block << (centre - self.size - 1)
+
+    def _centre_mask(self, centre, distance):
+        """ Returns the mask of the centers within the given distance of a center. """
+        if not self.is_centre(centre):
+            return 0
+        size = self.size
+        x, y = centre % size, centre // size
+        low, high = max(x - distance, 1), min(x + distance, size - 2)
+        row = ((1 << (high - low + 1)) - 1) << low
+        mask = 0
+        for line in range(max(y - distance, 1), min(y + distance, size - 2) + 1):
+            mask |= row << (line * size)
+        return mask
+
+    def _length_builder(self, direction):
+        """ Returns a function giving the number of steps a center can take in the direction. """
+        dx, dy = DIRECTIONS[direction]
+        size = self.size
+
+        def length(centre):
+            if not self.is_centre(centre):
+                return 0
+            x, y = centre % size, centre // size
+            steps = size
+            if dx:
+                steps = min(steps, size - 2 - x if dx > 0 else x - 1)
+            if dy:
+                steps = min(steps, size - 2 - y if dy > 0 else y - 1)
+            return steps
+
+        return length
+
+    def _lead_builder(self, direction):
+        """ Returns a function giving the squares a piece moves into with one step. """
+        offset = self.ring_offsets[direction]
+        length = self._length_builder(direction)
+
+        def lead(centre):
+            if not length(centre):
+                return 0
+            return self._footprint(centre + offset) & ~self._footprint(centre)
+
+        return lead
+
+    def footprint_bits(self, stones, centre):
+        """
+        Returns the 9-bit pattern of the given stones inside the footprint of the
+        piece centered on the given bit index, read row by row from the top left.
+        """
+        size = self.size
+        rows = stones >> (centre - size - 1)
+        return (rows & 7) | (rows >> (size - 3) & 56) | (rows >> (2 * size - 6) & 448)
+
+    def piece_centres(self, stones):
+        """
+        Returns the mask of the centers whose 3x3 footprint contains at least one
+        of the given stones.
+        """
+        centres = stones
+        for offset in self.ring_offsets:
+            centres |= shift(stones, offset)
+        return centres & self.interior
+
+    def ring_centres(self, stones, occupied, centres=None):
+        """
+        Takes as parameters the mask of one player's stones, the mask of all
+        stones, and optionally the mask of the centers to look at. Returns the
+        mask of the empty squares that are surrounded by eight of the player's
+        stones, which are the centers of that player's rings.
+        """
+        if centres is None:
+            centres = self.interior
+        up_left, up, up_right = self._up_left, self._up, self._up_right
+        return (centres & ~occupied
+                & (stones << up_left) & (stones << up) & (stones << up_right)
+                & (stones << 1) & (stones >> 1)
+                & (stones >> up_right) & (stones >> up) & (stones >> up_left))
+
+
+# Geometries already made, by size.
+_GEOMETRIES = {}
+
+
+def board_geometry(size=SIZE):
+    """ Returns the Geometry of a square board with the given number of rows and columns. """
+    geometry = _GEOMETRIES.get(size)
+    if geometry is None:
+        geometry = _GEOMETRIES[size] = Geometry(size)
+    return geometry
+
+
+def shift(mask, offset):
+    """
+    Moves every bit of the mask by the given number of bit positions. A positive
+    offset moves the bits toward higher rows and columns.
+    """
+    if offset >= 0:
+        return mask << offset
+    return mask >> -offset
+
+
+# The standard 20x20 board.
+STANDARD = board_geometry(SIZE)
+RING_OFFSETS = STANDARD.ring_offsets
+EDGE = STANDARD.edge
+INTERIOR = STANDARD.interior
+FOOTPRINTS = STANDARD.footprints
+FULL = STANDARD.full
+NOT_EDGE = STANDARD.not_edge
+NEIGHBOURHOODS = STANDARD.neighbourhoods
+SURROUNDINGS = STANDARD.surroundings
+RING_ZONES = STANDARD.ring_zones
+LEADS = STANDARD.leads
+RAY_LENGTHS = STANDARD.ray_lengths
+index = STANDARD.index
+footprint_bits = STANDARD.footprint_bits
+piece_centres = STANDARD.piece_centres
+
+
+def ring_centres(stones, occupied, centres=INTERIOR):
+    """
+    Returns the mask of the ring centers of the given player's stones on the
+    standard board, like Geometry.ring_centres.
+    """
+    return STANDARD.ring_centres(stones, occupied, centres)
+
+
+def footprint(x, y):
+    """ Returns the mask of the 3x3 footprint of the piece centered on (x, y). """
+    return FOOTPRINTS[index(x, y)]
+
+
+# The index in DIRECTIONS of every (x, y) step.
+_DIRECTION_INDEX = {step: direction for direction, step in enumerate(DIRECTIONS)}
+
+# A 3x3 footprint is encoded as a base 3 number with one digit per square, read
+# row by row from the top left square: 0 for empty, 1 for black and 2 for white.
+PATTERN_COUNT = 3 ** 9
+
+# The base 3 number with a 1 for every square set in a 9-bit pattern.
+TERNARY = tuple(sum(3 ** square for square in range(9) if bits >> square & 1)
+                for bits in range(512))
+
+# The direction indices in each 8-bit mask of directions.
+MASK_DIRECTIONS = tuple(tuple(direction for direction in range(len(DIRECTIONS))
+                              if mask >> direction & 1)
+                        for mask in range(256))
+
+
+def _build_piece_table(digit):
+    """
+    Returns a tuple indexed by the encoded footprint with a (valid, directions,
+    unlimited) entry for the player whose stones have the given digit. A piece
+    is valid if it has at least one of the player's stones and none of the
+    opponent's. The directions are a mask of the directions it can move in, and
+    unlimited is True if it can move more than 3 squares.
+    """
+    table = [(False, 0, False)] * PATTERN_COUNT
+    for own in range(1, 512):
+        directions = 0
+        for direction, (dx, dy) in enumerate(DIRECTIONS):
+            if own >> ((dy + 1) * 3 + dx + 1) & 1:
+                directions |= 1 << direction
+        table[TERNARY[own] * digit] = (True, directions, own & 16 != 0)
+    return tuple(table)
+
+
+# Everything about a piece in one lookup, indexed by player and encoded footprint.
+PIECE_TABLE = {"x": _build_piece_table(1), "o": _build_piece_table(2)}
+
+
+def count(mask):
+    """ Returns the number of bits set in the mask. """
+    return bin(mask).count("1")
+
+
+# Python 3.10 and later count bits without building a string.
+if hasattr(int, "bit_count"):
+    count = int.bit_count
+
+
+class RingIndex:
+    """
+    The RingIndex class keeps the centers and the number of each player's rings.
+    After a move it only looks again at the centers near the squares the move
+    changed, so asking whether a player still has a ring costs nothing.
+    """
+
+    __slots__ = ("black", "white", "black_count", "white_count")
+
+    def __init__(self, bitboard):
+        """ Takes as a parameter a Bitboard and finds all of its rings. """
+        occupied = bitboard.black | bitboard.white
+        ring_centres = bitboard.geometry.ring_centres
+        self.black = ring_centres(bitboard.black, occupied)
+        self.white = ring_centres(bitboard.white, occupied)
+        self.black_count = count(self.black)
+        self.white_count = count(self.white)
+
+    def centres(self, player):
+        """ Returns the mask of the centers of the given player's rings. """
+        if player == "x":
+            return self.black
+        return self.white
+
+    def ring_count(self, player):
+        """ Returns the number of rings the given player has. """
+        if player == "x":
+            return self.black_count
+        return self.white_count
+
+    def copy(self):
+        """ Returns a copy of the RingIndex. """
+        rings = RingIndex.__new__(RingIndex)
+        rings.black = self.black
+        rings.white = self.white
+        rings.black_count = self.black_count
+        rings.white_count = self.white_count
+        return rings
+
+    def check_ring(self):
+        """ Returns a Boolean tuple for the existence of a black ring and a white ring. """
+        return self.black_count > 0, self.white_count > 0
+
+    def update(self, bitboard, centres):
+        """
+        Takes as parameters the Bitboard after a move and the mask of the centers
+        whose rings the move may have made or broken. Updates the index.
+        """
+        occupied = bitboard.black | bitboard.white
+        ring_centres = bitboard.geometry.ring_centres
+        black = (self.black & ~centres) | ring_centres(bitboard.black, occupied, centres)
+        white = (self.white & ~centres) | ring_centres(bitboard.white, occupied, centres)
+        if black != self.black:
+            self.black = black
+            self.black_count = count(black)
+        if white != self.white:
+            self.white = white
+            self.white_count = count(white)
+
+
+class Bitboard:
+    """
+    The Bitboard class stores a Gess position as two integers, one for the black
+    stones and one for the white stones, and the Geometry of the board. Has
+    methods to convert to and from the list of lists board used by GessGame, to
+    look for rings, to read a piece, and to slide a piece across the board.
+    """
+
+    __slots__ = ("black", "white", "geometry")
+
+    def __init__(self, black=0, white=0, geometry=STANDARD):
+        """
+        Takes as parameters and initializes the black and white stone masks, and
+        optionally the Geometry of the board, which defaults to the standard board.
+        """
+        self.black = black
+        self.white = white
+        self.geometry = geometry
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        Takes as a parameter a square list of lists, 20x20 for the standard board,
+        using "x" for black stones, "o" for white stones and " " for empty squares.
+        Returns the matching Bitboard.
+        """
+        geometry = board_geometry(len(board))
+        black = 0
+        white = 0
+        for y, row in enumerate(board):
+            if len(row) != geometry.size:
+                raise ValueError("the board must be square, but row %d has %d squares"
+                                 % (y, len(row)))
+            for x, square in enumerate(row):
+                if square == "x":
+                    black |= 1 << geometry.index(x, y)
+                elif square == "o":
+                    white |= 1 << geometry.index(x, y)
+        return cls(black, white, geometry)
+
+    def to_board(self):
+        """ Returns the position as a new list of lists with one list per row. """
+        size = self.geometry.size
+        board = []
+        for y in range(size):
+            row = []
+            for x in range(size):
+                bit = 1 << (y * size + x)
+                if self.black & bit:
+                    row.append("x")
+                elif self.white & bit:
+                    row.append("o")
+                else:
+                    row.append(" ")
+            board.append(row)
+        return board
+
+    def copy(self):
+        """ Returns a copy of the Bitboard. """
+        return Bitboard(self.black, self.white, self.geometry)
+
+    def __eq__(self, other):
+        if not isinstance(other, Bitboard):
+            return NotImplemented
+        return (self.black == other.black and self.white == other.white
+                and self.geometry.size == other.geometry.size)
+
+    def __repr__(self):
+        return "Bitboard(black=%#x, white=%#x)" % (self.black, self.white)
+
+    def stones(self, player):
+        """ Returns the mask of the stones of the given player, "x" or "o". """
+        if player == "x":
+            return self.black
+        return self.white
+
+    def occupied(self):
+        """ Returns the mask of all stones on the board. """
+        return self.black | self.white
+
+    def ring_centres(self, player):
+        """ Returns the mask of the centers of the given player's rings. """
+        return self.geometry.ring_centres(self.stones(player), self.black | self.white)
+
+    def check_ring(self):
+        """
+        Returns a Boolean tuple for the existence of a black ring and a white ring,
+        like GessGame.check_ring.
+        """
+        occupied = self.black | self.white
+        ring_centres = self.geometry.ring_centres
+        return (ring_centres(self.black, occupied) != 0,
+                ring_centres(self.white, occupied) != 0)
+
+    def piece(self, x, y):
+        """
+        Returns the black and white stone masks inside the 3x3 footprint of the
+        piece centered on (x, y).
+        """
+        geometry = self.geometry
+        mask = geometry.footprints[geometry.index(x, y)]
+        return self.black & mask, self.white & mask
+
+    def pattern(self, x, y):
+        """
+        Returns the base 3 encoding of the footprint of the piece centered on
+        (x, y), which indexes PIECE_TABLE.
+        """
+        geometry = self.geometry
+        centre = geometry.index(x, y)
+        return (TERNARY[geometry.footprint_bits(self.black, centre)]
+                + 2 * TERNARY[geometry.footprint_bits(self.white, centre)])
+
+    def piece_info(self, player, x, y):
+        """
+        Returns the (valid, directions, unlimited) entry of PIECE_TABLE for the
+        piece centered on (x, y) and the given player.
+        """
+        return PIECE_TABLE[player][self.pattern(x, y)]
+
+    def slide(self, player, x, y, dx, dy, move_spaces, rings=None):
+        """
+        Takes the same parameters as slide_masks. Returns a new Bitboard if the
+        move is valid. Otherwise returns None.
+        """
+        masks = self.slide_masks(player, x, y, dx, dy, move_spaces, rings)
+        if masks is None:
+            return None
+        return Bitboard(masks[0], masks[1], self.geometry)
+
+    def blocked(self, x, y, dx, dy, move_spaces):
+        """
+        Takes as parameters the center of a piece, the step in each direction and
+        the number of squares to move. Returns True if a stone in the squares the
+        piece moves into blocks the move before its last square.
+        """
+        geometry = self.geometry
+        occupied = self.black | self.white
+        leads = geometry.leads[_DIRECTION_INDEX[dx, dy]]
+        offset = dy * geometry.size + dx
+        centre = geometry.index(x, y)
+        for _ in range(move_spaces - 1):
+            if occupied & leads[centre]:
+                return True
+            centre += offset
+        return False
+
+    def slide_masks(self, player, x, y, dx, dy, move_spaces, rings=None):
+        """
+        Takes as parameters the current player, the center of the piece, the step
+        in each direction, the number of squares to move, and optionally the mask
+        of the player's ring centers from a RingIndex. Resolves the move with the
+        same rules as the Move class: a stone in the path blocks the move before
+        its last square, every stone under the final footprint is removed, stones
+        on the edges are removed, and the player may not be left without a ring
+        after any step. Returns the black and white stone masks after the move if
+        it is valid. Otherwise returns None.
+        """
+        geometry = self.geometry
+        footprints = geometry.footprints
+        neighbourhoods = geometry.neighbourhoods
+        not_edge = geometry.not_edge
+        ring_centres = geometry.ring_centres
+        black = self.black
+        white = self.white
+        occupied = black | white
+        if rings is None:
+            rings = ring_centres(self.stones(player), occupied)
+
+        if self.blocked(x, y, dx, dy, move_spaces):
+            return None
+
+        start = geometry.index(x, y)
+        offset = dy * geometry.size + dx
+
+        # The squares the piece passes over are empty, so the board after any
+        # step is the board without the starting and the current footprint,
+        # plus the piece at its current center.
+        start_mask = footprints[start]
+        piece_black = black & start_mask
+        piece_white = white & start_mask
+        near_start = neighbourhoods[start]
+
+        # Rings away from the starting footprint can only be broken by the piece
+        # covering them, so only the steps that come near every one of them need
+        # to be checked.
+        far_rings = rings & ~near_start
+        centre = start
+        for step in range(1, move_spaces + 1):
+            centre += offset
+            if far_rings & ~neighbourhoods[centre]:
+                continue
+            keep = ~(start_mask | footprints[centre]) & not_edge
+            step_black = (black & keep) | (shift(piece_black, step * offset) & not_edge)
+            step_white = (white & keep) | (shift(piece_white, step * offset) & not_edge)
+            near = near_start | neighbourhoods[centre]
+            if player == "x":
+                if not ring_centres(step_black, step_black | step_white, near):
+                    return None
+            elif not ring_centres(step_white, step_black | step_white, near):
+                return None
+
+        keep = ~(start_mask | footprints[centre]) & not_edge
+        total = move_spaces * offset
+        return ((black & keep) | (shift(piece_black, total) & not_edge),
+                (white & keep) | (shift(piece_white, total) & not_edge))
+
+    def legal_moves(self, player, rings=None):
+        """
+        Takes as parameters the player and optionally the mask of the player's
+        ring centers from a RingIndex. Returns a list of every legal move for the
+        player as (x1, y1, x2, y2) tuples, with the same rules as
+        GessGame.make_move. Walks each direction a piece can move in from the
+        occupied squares and stops at the first stone in the path, so no board is
+        built for a move that is blocked. A move is only checked for a lost ring
+        when none of the player's rings is away from both the starting and the
+        final footprint of the piece.
+        """
+        geometry = self.geometry
+        size = geometry.size
+        footprints = geometry.footprints
+        neighbourhoods = geometry.neighbourhoods
+        surroundings = geometry.surroundings
+        not_edge = geometry.not_edge
+        ring_centres = geometry.ring_centres
+        if player == "x":
+            own, enemy, digit = self.black, self.white, 1
+        else:
+            own, enemy, digit = self.white, self.black, 2
+        occupied = own | enemy
+        table = PIECE_TABLE[player]
+        if rings is None:
+            rings = ring_centres(own, occupied)
+
+        # A valid piece has at least one of the player's stones and none of the
+        # opponent's stones.
+        centres = geometry.piece_centres(own) & ~geometry.piece_centres(enemy)
+
+        moves = []
+        append = moves.append
+        while centres:
+            low = centres & -centres
+            centres ^= low
+            centre = low.bit_length() - 1
+            x1, y1 = centre % size, centre // size
+
+            # The piece has none of the opponent's stones, so its encoding only
+            # has the player's digit.
+            rows = own >> (centre - size - 1)
+            pattern = (rows & 7) | (rows >> (size - 3) & 56) | (rows >> (2 * size - 6) & 448)
+            _, direction_mask, unlimited = table[TERNARY[pattern] * digit]
+            if not direction_mask:
+                continue
+            directions = MASK_DIRECTIONS[direction_mask]
+
+            # A piece without a stone in its center may not move more than 3 squares.
+            limit = size if unlimited else 3
+
+            # A ring that does not touch the starting or the final footprint
+            # survives the move. With two such rings far apart, one of them
+            # survives every move of this piece.
+            far_rings = rings & ~neighbourhoods[centre]
+            if far_rings:
+                first = far_rings & -far_rings
+                safe = far_rings & ~surroundings[first.bit_length() - 1] != 0
+            else:
+                safe = False
+            start_mask = footprints[centre]
+            piece = own & start_mask
+
+            for direction in directions:
+                offset = geometry.ring_offsets[direction]
+                dx, dy = DIRECTIONS[direction]
+                leads = geometry.leads[direction]
+                steps = geometry.ray_lengths[direction][centre]
+                if steps > limit:
+                    steps = limit
+                new_centre = centre
+                for move_spaces in range(1, steps + 1):
+                    lead = leads[new_centre]
+                    new_centre += offset
+
+                    if not safe and not far_rings & ~neighbourhoods[new_centre]:
+                        moved = shift(piece, move_spaces * offset) & not_edge
+                        keep = ~(start_mask | footprints[new_centre]) & not_edge
+                        if not ring_centres((own & keep) | moved, (occupied & keep) | moved,
+                                            neighbourhoods[centre] | neighbourhoods[new_centre]):
+                            break
+
+                    append((x1, y1, x1 + dx * move_spaces, y1 + dy * move_spaces))
+
+                    # A stone in the squares the piece moves into ends the move.
+                    if occupied & lead:
+                        break
+
+        return moves
@@ -0,0 +1,248 @@
+# Description:  An incrementally updated evaluation of Gess positions.  The
+# evaluator keeps, for both players, the number of stones, the stones in the
+# center of the board, the stones next to the edge, the piece mobility and the
+# enemy stones close to their rings.  Attached to a GessGame, it is updated by
+# each push_move and restored by pop_move.  The stone counts and ring threats
+# come from the squares the move changed, while the piece centers and mobility
+# of a player whose stones changed are recomputed with a fixed number of
+# whole-board mask operations.
+#
+# Usage:
+#     game.set_evaluator(IncrementalEvaluator())
+#     score = game.get_evaluator().evaluate(game)
+
+from GessBitboard import STANDARD, count
+
+# Weights of the components, in the units of GessSearch.evaluate.
+RING_VALUE = 1000
+STONE_VALUE = 10
+CENTRE_VALUE = 2
+MOBILITY_VALUE = 1
+EDGE_VALUE = 3
+THREAT_VALUE = 5
+
+
+def _build_region(geometry, low, high):
+    """ Returns the mask of the squares whose row and column are both within low and high. """
+    row = ((1 << (high - low + 1)) - 1) << low
+    mask = 0
+    for y in range(low, high + 1):
+        mask |= row << (y * geometry.size)
+    return mask
+
+
+class Regions:
+    """
+    The Regions class holds the masks the evaluator counts stones in for one
+    board size: the 8x8 block in the middle of the board and the rows and
+    columns next to the edge.
+    """
+
+    def __init__(self, geometry):
+        """ Takes as a parameter the Geometry of the board. """
+        size = geometry.size
+        self.geometry = geometry
+        self.centre = _build_region(geometry, size // 2 - 4, size // 2 + 3)
+
+        # A piece with stones next to the edge loses them when it moves along
+        # the edge, since the edge rows are cleared after every move.
+        self.edge_band = geometry.interior & ~_build_region(geometry, 2, size - 3)
+
+        # The offsets of the neighbours of a square come in pairs, one either way.
+        self.neighbour_offsets = tuple(offset for offset in geometry.ring_offsets if offset > 0)
+
+
+# Regions already made, by board size.
+_REGIONS = {}
+
+
+def board_regions(geometry):
+    """ Returns the Regions of the board with the given Geometry. """
+    regions = _REGIONS.get(geometry.size)
+    if regions is None:
+        regions = _REGIONS[geometry.size] = Regions(geometry)
+    return regions
+
+
+# The regions of the standard board.
+CENTRE = board_regions(STANDARD).centre
+EDGE_BAND = board_regions(STANDARD).edge_band
+
+
+def ring_zone(rings, geometry=STANDARD):
+    """ Returns the union of the ring zones of every ring center in the mask. """
+    ring_zones = geometry.ring_zones
+    zone = 0
+    while rings:
+        low = rings & -rings
+        zone |= ring_zones[low.bit_length() - 1]
+        rings ^= low
+    return zone
+
+
+def valid_centres(stones, enemy, geometry=STANDARD):
+    """
+    Returns the mask of the centers of the valid pieces of the player with the
+    given stones: those with at least one of the stones and no enemy stone.
+    """
+    return geometry.piece_centres(stones) & ~geometry.piece_centres(enemy)
+
+
+def mobility(stones, valid, geometry=STANDARD):
+    """
+    Returns the number of (piece, direction) pairs the valid pieces can move in,
+    which is the number of their stones outside the center.
+    """
+    total = 0
+    for offset in board_regions(geometry).neighbour_offsets:
+        total += count(valid << offset & stones) + count(valid >> offset & stones)
+    return total
+
+
+class IncrementalEvaluator:
+    """
+    The IncrementalEvaluator class keeps the evaluation components of one game.
+    Every component is a (black, white) tuple. GessGame calls update after each
+    move and undo when the move is taken back, and evaluate scores the position
+    for the player to move from the components alone.
+    """
+
+    def __init__(self):
+        """ Initializes empty components. GessGame.set_evaluator calls reset. """
+        self.black = 0
+        self.white = 0
+        self.black_rings = 0
+        self.white_rings = 0
+        self.ring_counts = (0, 0)
+        self.stones = (0, 0)
+        self.centre = (0, 0)
+        self.edge = (0, 0)
+        self.pieces = (0, 0)
+        self.mobility = (0, 0)
+        self.zones = (0, 0)
+        self.threats = (0, 0)
+        self._regions = board_regions(STANDARD)
+        self._undo = []
+
+    def reset(self, bitboard, rings):
+        """
+        Takes as parameters a Bitboard and its RingIndex and computes every
+        component from the whole board.
+        """
+        geometry = bitboard.geometry
+        regions = self._regions = board_regions(geometry)
+        black, white = bitboard.black, bitboard.white
+        self.black = black
+        self.white = white
+        self.black_rings = rings.black
+        self.white_rings = rings.white
+        self.ring_counts = (rings.black_count, rings.white_count)
+        self.stones = (count(black), count(white))
+        self.centre = (count(black & regions.centre), count(white & regions.centre))
+        self.edge = (count(black & regions.edge_band), count(white & regions.edge_band))
+        self.pieces = (geometry.piece_centres(black), geometry.piece_centres(white))
+        self.mobility = (mobility(black, valid_centres(black, white, geometry), geometry),
+                         mobility(white, valid_centres(white, black, geometry), geometry))
+        self.zones = (ring_zone(self.black_rings, geometry), ring_zone(self.white_rings, geometry))
+        self.threats = (count(white & self.zones[0]), count(black & self.zones[1]))
+        self._undo = []
+
+    def _state(self):
+        """ Returns a tuple of everything update changes. """
+        return (self.black, self.white, self.black_rings, self.white_rings, self.ring_counts,
+                self.stones, self.centre, self.edge, self.pieces, self.mobility,
+                self.zones, self.threats)
+
+    def update(self, bitboard, rings):
+        """
+        Takes as parameters the Bitboard and RingIndex after a move. Saves the
+        components for undo and updates the counts from the squares that changed.
+        The piece centers and mobility are recomputed from the whole board.
+        """
+        self._undo.append(self._state())
+        regions = self._regions
+        geometry = regions.geometry
+        centre, edge_band = regions.centre, regions.edge_band
+        old_black, old_white = self.black, self.white
+        black, white = bitboard.black, bitboard.white
+        black_change = old_black ^ black
+        white_change = old_white ^ white
+        self.black = black
+        self.white = white
+
+        self.stones = (self.stones[0] + _delta(old_black, black, black_change),
+                       self.stones[1] + _delta(old_white, white, white_change))
+        self.centre = (
+            self.centre[0] + _delta(old_black, black, black_change & centre),
+            self.centre[1] + _delta(old_white, white, white_change & centre))
+        self.edge = (
+            self.edge[0] + _delta(old_black, black, black_change & edge_band),
+            self.edge[1] + _delta(old_white, white, white_change & edge_band))
+
+        # The valid pieces and their mobility are a fixed number of whole-board
+        # mask operations, fewer than comparing them before and after the move.
+        # A player's piece centers only change if that player's stones did.
+        black_pieces, white_pieces = self.pieces
+        if black_change:
+            black_pieces = geometry.piece_centres(black)
+        if white_change:
+            white_pieces = geometry.piece_centres(white)
+        self.pieces = (black_pieces, white_pieces)
+        black_valid = black_pieces & ~white_pieces
+        white_valid = white_pieces & ~black_pieces
+        self.mobility = (mobility(black, black_valid, geometry),
+                         mobility(white, white_valid, geometry))
+
+        # The zones only change with the rings, which most moves leave alone.
+        black_zone, white_zone = self.zones
+        black_threat, white_threat = self.threats
+        if rings.black != self.black_rings:
+            self.black_rings = rings.black
+            black_zone = ring_zone(rings.black, geometry)
+            black_threat = count(white & black_zone)
+        else:
+            black_threat += _delta(old_white, white, white_change & black_zone)
+        if rings.white != self.white_rings:
+            self.white_rings = rings.white
+            white_zone = ring_zone(rings.white, geometry)
+            white_threat = count(black & white_zone)
+        else:
+            white_threat += _delta(old_black, black, black_change & white_zone)
+        self.zones = (black_zone, white_zone)
+        self.threats = (black_threat, white_threat)
+        self.ring_counts = (rings.black_count, rings.white_count)
+
+    def undo(self):
+        """ Restores the components saved by the last update. """
+        (self.black, self.white, self.black_rings, self.white_rings, self.ring_counts,
+         self.stones, self.centre, self.edge, self.pieces, self.mobility,
+         self.zones, self.threats) = self._undo.pop()
+
+    def components(self):
+        """ Returns a dictionary with the (black, white) value of every component. """
+        return {"rings": self.ring_counts, "stones": self.stones, "centre": self.centre,
+                "edge": self.edge, "mobility": self.mobility, "threats": self.threats}
+
+    def score(self, player):
+        """ Returns the score of the position for the given player, "x" or "o". """
+        value = (RING_VALUE * (self.ring_counts[0] - self.ring_counts[1])
+                 + STONE_VALUE * (self.stones[0] - self.stones[1])
+                 + CENTRE_VALUE * (self.centre[0] - self.centre[1])
+                 + MOBILITY_VALUE * (self.mobility[0] - self.mobility[1])
+                 - EDGE_VALUE * (self.edge[0] - self.edge[1])
+                 - THREAT_VALUE * (self.threats[0] - self.threats[1]))
+        if player == "x":
+            return value
+        return -value
+
+    def evaluate(self, game):
+        """
+        Takes as a parameter the GessGame the evaluator is attached to. Returns the
+        score for the player to move, like GessSearch.evaluate.
+        """
+        return self.score(game.get_current_player())
+
+
+def _delta(old, new, changed):
+    """ Returns the change in the number of stones inside the changed squares. """
+    return count(new & changed) - count(old & changed)
@@ -3,71 +3,295 @@
 # a variant of the games Go and Chess. The complete rules for the game can be
 # found here:  https://www.chessvariants.com/crossover.dir/gess.html
 
-import pygame
+from GessBitboard import SIZE, Bitboard, RingIndex, board_geometry
+from GessHash import WHITE_TO_MOVE, board_keys, hash_squares, zobrist_hash
+
+# The starting position.  Black stones are represented by "x", white stones by "o"
+# and empty squares by " ".
+STARTING_BOARD = [[" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", "o", " ", "o", " ", "o", "o", "o", "o",
+                   "o", "o", "o", "o", " ", "o", " ", "o", " ", " "],
+                  [" ", "o", "o", "o", " ", "o", " ", "o", "o", "o",
+                   "o", " ", "o", " ", "o", " ", "o", "o", "o", " "],
+                  [" ", " ", "o", " ", "o", " ", "o", "o", "o", "o",
+                   "o", "o", "o", "o", " ", "o", " ", "o", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", "o", " ", " ", "o", " ", " ", "o", " ",
+                   " ", "o", " ", " ", "o", " ", " ", "o", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", "x", " ", " ", "x", " ", " ", "x", " ",
+                   " ", "x", " ", " ", "x", " ", " ", "x", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  [" ", " ", "x", " ", "x", " ", "x", "x", "x", "x",
+                   "x", "x", "x", "x", " ", "x", " ", "x", " ", " "],
+                  [" ", "x", "x", "x", " ", "x", " ", "x", "x", "x",
+                   "x", " ", "x", " ", "x", " ", "x", "x", "x", " "],
+                  [" ", " ", "x", " ", "x", " ", "x", "x", "x", "x",
+                   "x", "x", "x", "x", " ", "x", " ", "x", " ", " "],
+                  [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
+                   " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
+                  ]
+
+# Reason codes returned by GessGame.validate_move.
+VALID = "VALID"
+NO_MOVE = "NO_MOVE"
+OFF_BOARD = "OFF_BOARD"
+GAME_OVER = "GAME_OVER"
+NO_STONE = "NO_STONE"
+ENEMY_STONE = "ENEMY_STONE"
+OVER_RANGE = "OVER_RANGE"
+NOT_STRAIGHT = "NOT_STRAIGHT"
+DIRECTION_NOT_ALLOWED = "DIRECTION_NOT_ALLOWED"
+BLOCKED = "BLOCKED"
+SELF_RING_LOSS = "SELF_RING_LOSS"
+
+# The game states a Position can hold, in the order used by Position.pack.
+GAME_STATES = ("UNFINISHED", "BLACK_WON", "WHITE_WON")
+
+_STARTING_BITBOARD = Bitboard.from_board(STARTING_BOARD)
+_STARTING_RINGS = RingIndex(_STARTING_BITBOARD)
+_STARTING_HASH = zobrist_hash(_STARTING_BITBOARD, "x")
+
+# The hash of the starting position of every board size used so far.
+_STARTING_HASHES = {SIZE: _STARTING_HASH}
+
+
+def starting_board(size=SIZE):
+    """
+    Takes as an optional parameter the number of rows and columns, at least 20.
+    Returns the starting position for a board of that size as a list of lists.
+    Larger boards keep the standard rows of stones at the top and the bottom:
+    the left 7 columns stay on the left, the other 13 with the rings move to the
+    right edge, and the columns in between repeat standard columns 3 to 5.
+    """
+    if size < SIZE:
+        raise ValueError("the starting layout needs at least %d rows and columns, not %d"
+                         % (SIZE, size))
+    extra = size - SIZE
+    board = []
+    for y in range(size):
+        if y < SIZE // 2:
+            source = STARTING_BOARD[y]
+        elif y >= size - SIZE // 2:
+            source = STARTING_BOARD[y - extra]
+        else:
+            board.append([" "] * size)
+            continue
+        board.append(source[:7] + [source[3 + column % 3] for column in range(extra)]
+                     + source[7:])
+    return board
 
 
 class GessGame:
     """
     The GessGame class represents an abstract board game called Gess. Has methods
-    to get the game board, game state, current player, and to make a move.
-    Communicates with the GamePiece class to determine a valid game piece and move
-    direction. Communicates with the Move class to determine a valid move and update
-    the board.
+    to get the game board, game state, current player, and to make a move. The
+    board is stored as a Bitboard, so pieces, moves and rings are checked with
+    mask operations. The GamePiece and Move classes implement the same rules on
+    a list of lists board and serve as the reference for the Bitboard rules.
     """
 
-    def __init__(self):
+    def __init__(self, size=None, layout=None):
         """
         Initializes the playing board, the state of the game to "UNFINISHED", and
         the current player to the player with the black stones, represented by 'x'.
-        The player with white stones is represented by 'o'.
-        """
-        self._board = [[" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", "o", " ", "o", " ", "o", "o", "o", "o",
-                        "o", "o", "o", "o", " ", "o", " ", "o", " ", " "],
-                       [" ", "o", "o", "o", " ", "o", " ", "o", "o", "o",
-                        "o", " ", "o", " ", "o", " ", "o", "o", "o", " "],
-                       [" ", " ", "o", " ", "o", " ", "o", "o", "o", "o",
-                        "o", "o", "o", "o", " ", "o", " ", "o", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", "o", " ", " ", "o", " ", " ", "o", " ",
-                        " ", "o", " ", " ", "o", " ", " ", "o", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", "x", " ", " ", "x", " ", " ", "x", " ",
-                        " ", "x", " ", " ", "x", " ", " ", "x", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       [" ", " ", "x", " ", "x", " ", "x", "x", "x", "x",
-                        "x", "x", "x", "x", " ", "x", " ", "x", " ", " "],
-                       [" ", "x", "x", "x", " ", "x", " ", "x", "x", "x",
-                        "x", " ", "x", " ", "x", " ", "x", "x", "x", " "],
-                       [" ", " ", "x", " ", "x", " ", "x", "x", "x", "x",
-                        "x", "x", "x", "x", " ", "x", " ", "x", " ", " "],
-                       [" ", " ", " ", " ", " ", " ", " ", " ", " ", " ",
-                        " ", " ", " ", " ", " ", " ", " ", " ", " ", " "],
-                       ]
+        The player with white stones is represented by 'o'. Takes as optional
+        parameters the number of rows and columns of a square board and the
+        starting layout as a list of lists. The standard 20x20 board and layout
+        are used by default, and a larger board gets the layout of starting_board.
+        Raises ValueError if a layout is not size rows of size squares or has
+        stones on the edge rows or columns.
+        """
+        if size is None:
+            size = len(layout) if layout is not None else SIZE
+        if layout is None and size == SIZE:
+            self._bitboard = _STARTING_BITBOARD.copy()
+            self._rings = _STARTING_RINGS.copy()
+            self._hash = _STARTING_HASH
+        else:
+            if layout is None:
+                layout = starting_board(size)
+            elif len(layout) != size:
+                raise ValueError("the layout has %d rows, not %d" % (len(layout), size))
+            for y, row in enumerate(layout):
+                if len(row) != size:
+                    raise ValueError("row %d of the layout has %d squares, not %d"
+                                     % (y, len(row), size))
+            self._bitboard = Bitboard.from_board(layout)
+            # The rules clear the edge rows and columns after every move, so a
+            # stone there could only make rings no move would leave standing.
+            if (self._bitboard.black | self._bitboard.white) & self._bitboard.geometry.edge:
+                raise ValueError("the layout has stones on the edge rows or columns")
+            self._rings = RingIndex(self._bitboard)
+            self._hash = zobrist_hash(self._bitboard, "x")
+        self._geometry = self._bitboard.geometry
+        self._keys = board_keys(size)
         self._game_state = "UNFINISHED"
         self._current_player = "x"
 
+        # Undo records for the moves made so far, most recent last.
+        self._undo = []
+
+        # The hashes of the positions before the game was made, for a game made
+        # with from_position. They count for repetitions but cannot be undone.
+        self._earlier_hashes = ()
+
+        # An optional incremental evaluator kept up to date by every move, and
+        # the number of undo records made before it was attached.
+        self._evaluator = None
+        self._evaluator_ply = 0
+
+        # An optional MoveCache consulted by generate_moves.
+        self._move_cache = None
+
     def get_board(self):
-        """ Returns the current board configuration. """
-        return self._board
+        """ Returns the current board configuration as a list of lists. """
+        return self._bitboard.to_board()
+
+    def get_size(self):
+        """ Returns the number of rows and columns of the board. """
+        return self._geometry.size
+
+    def get_bitboard(self):
+        """
+        Returns the current board configuration as a Bitboard. The Bitboard is
+        updated in place by later moves, so copy it to keep a position.
+        """
+        return self._bitboard
+
+    def get_position(self):
+        """
+        Returns an immutable Position holding the current stones, player and game
+        state. It shares the stone masks with the game, so it is cheap to take.
+        """
+        bitboard = self._bitboard
+        return Position(bitboard.black, bitboard.white, self._current_player,
+                        self._game_state, self._hash, self._geometry.size)
+
+    @classmethod
+    def from_position(cls, position, cache=None, history=()):
+        """
+        Takes as a parameter a Position, and optionally a GessHash.MoveCache to
+        attach to the new game, which also saves finding the rings of a position
+        it has seen, and the hashes of the positions that came before it, oldest
+        first, as returned by get_hash_history. Returns a new GessGame in that
+        position with no moves to take back. The earlier positions still count
+        for repetitions.
+        """
+        game = cls(position.size)
+        game._bitboard = Bitboard(position.black, position.white, game._geometry)
+        rings = cache.rings(position._hash) if cache is not None else None
+        if rings is None:
+            game._rings = RingIndex(game._bitboard)
+            if cache is not None:
+                cache.store_rings(position._hash, _ring_status(game._rings), position.size)
+        else:
+            game._rings = RingIndex.__new__(RingIndex)
+            (game._rings.black, game._rings.white,
+             game._rings.black_count, game._rings.white_count) = rings
+        game._move_cache = cache
+        game._current_player = position.player
+        game._game_state = position.game_state
+        game._hash = position._hash
+        game._earlier_hashes = tuple(history)
+        return game
+
+    def get_ring_count(self, player):
+        """ Returns the number of rings the given player has. """
+        return self._rings.ring_count(player)
+
+    def get_ring_centres(self, player):
+        """ Returns the mask of the center squares of the given player's rings. """
+        return self._rings.centres(player)
+
+    def get_evaluator(self):
+        """ Returns the evaluator attached with set_evaluator, or None. """
+        return self._evaluator
+
+    def set_evaluator(self, evaluator):
+        """
+        Takes as a parameter an evaluator such as GessEval.IncrementalEvaluator, or
+        None to detach the current one. The evaluator is reset from the current
+        position, then updated by every move and taken back by pop_move. Taking
+        back a move made before the evaluator was attached resets it again.
+        """
+        if evaluator is not None:
+            evaluator.reset(self._bitboard, self._rings)
+        self._evaluator = evaluator
+        self._evaluator_ply = len(self._undo)
+
+    def get_move_cache(self):
+        """ Returns the MoveCache attached with set_move_cache, or None. """
+        return self._move_cache
+
+    def set_move_cache(self, cache):
+        """
+        Takes as a parameter a GessHash.MoveCache, or None to detach the current
+        one. While a cache is attached, generate_moves returns the cached moves
+        of positions it has already seen. One cache can be shared by many games.
+        """
+        self._move_cache = cache
+
+    def get_hash(self):
+        """
+        Returns the Zobrist hash of the current position, which covers the stones
+        and the player to move.
+        """
+        return self._hash
+
+    def get_move_history(self):
+        """
+        Returns a list of the moves that pop_move can take back, oldest first, as
+        (x1, y1, x2, y2) tuples.
+        """
+        return [record[9] for record in self._undo]
+
+    def is_replayable(self):
+        """
+        Returns True if making the moves of get_move_history on a new GessGame of
+        the same size reaches the current position. A game made with
+        from_position or from another layout usually is not, and should be sent
+        to another process as a Position instead.
+        """
+        size = self._geometry.size
+        start = _STARTING_HASHES.get(size)
+        if start is None:
+            start = _STARTING_HASHES[size] = GessGame(size).get_hash()
+        return (self._undo[0][8] if self._undo else self._hash) == start
+
+    def get_hash_history(self):
+        """
+        Returns a list of the hashes of the positions before each move that
+        pop_move can take back, oldest first, after those of the positions given
+        to from_position.
+        """
+        return list(self._earlier_hashes) + [record[8] for record in self._undo]
+
+    def repetitions(self):
+        """
+        Returns how many times the current position occurred earlier in the moves
+        that pop_move can take back, or before the position given to from_position.
+        """
+        return (self._earlier_hashes.count(self._hash)
+                + sum(1 for record in self._undo if record[8] == self._hash))
 
     def get_game_state(self):
         """ Returns the current state of the game. """
@@ -77,368 +301,326 @@ class GessGame:
         """ Returns the current player. """
         return self._current_player
 
-    def pygame_board(self, board):
-        """
-        Uses Pygame to create a board. Gets user input from the mouse to
-        move the player's game piece and play the game.
-        """
-        # Initialize the board dimensions.
-        width = 30
-        height = 30
-        margin = 2
-        frame = 75
-
-        # Define the board and game piece colors.
-        brown = (143, 82, 9)
-        dark_brown = (92, 65, 13)
-        black = (0, 0, 0)
-        gray = (53, 69, 94)
-        white = (255, 255, 255)
-        off_white = (235, 241, 250)
-        green = (147, 219, 167)
-
-        pygame.init()
-
-        # Initialize the display.
-        screen = pygame.display.set_mode((800, 800))
-        pygame.display.set_caption("Gess Game")
-
-        # Set background images.
-        bamboo = pygame.image.load("bamboo.png")
-        bamboo = pygame.transform.scale(bamboo, (800, 800))
-        screen.blit(bamboo, (0, 0))
-        pygame.draw.rect(screen, dark_brown, (72, 72, 647, 647))
-        wood = pygame.image.load("wood.png")
-        wood = pygame.transform.scale(wood, (638, 638))
-        screen.blit(wood, (77, 77))
-
-        playing = True
-        click_1 = True
-
-        # Draw the game board.
-        for row in range(20):
-            for col in range(20):
-
-                pygame.draw.line(screen, brown, ((frame + (width+margin)*col), frame),
-                                 ((frame + (width+margin)*col), (800 - frame - 10)), 2)
-
-                pygame.draw.line(screen, brown, (frame, (frame + (width + margin) * col)),
-                                 ((800 - frame - 10), (frame + (width + margin) * col)), 2)
-
-                # Draw the black stones.
-                if board[row][col] == "x":
-                    pygame.draw.circle(screen, black,
-                                       [int(frame + ((margin + width) * col + margin) + width / 2),
-                                        int(frame + ((margin + height) * row + margin) + height / 2)], 12)
-                    pygame.draw.circle(screen, gray,
-                                       [int(frame + ((margin + width) * col + margin) + width / 2),
-                                        int(frame + ((margin + height) * row + margin) + height / 2)], 10)
-
-                # Draw the white stones.
-                if board[row][col] == "o":
-                    pygame.draw.circle(screen, black,
-                                       [int(frame + ((margin + width) * col + margin) + width / 2),
-                                        int(frame + ((margin + height) * row + margin) + height / 2)], 13)
-                    pygame.draw.circle(screen, off_white,
-                                       [int(frame + ((margin + width) * col + margin) + width / 2),
-                                        int(frame + ((margin + height) * row + margin) + height / 2)], 11)
-
-        # Create a text display to show the current player or if the game has been won.
-        font = pygame.font.Font("CaviarDreams.ttf", 20)
-
-        turn = self.get_current_player()
-        won = self.get_game_state()
-
-        if turn == "x":
-            text_to_print = "Black's turn"
-        else:
-            text_to_print = "White's turn"
-
-        if won != "UNFINISHED":
-            if won == "BLACK_WON":
-                text_to_print = "Black won! Game over"
-            else:
-                text_to_print = "White won! Game over"
-
-        text = font.render(text_to_print, True, black, white)
-        text_rect = text.get_rect()
-        text_rect.center = (120, 40)
-        screen.blit(text, text_rect)
-
-        pygame.display.update()
-
-        # Play the game!
-        while playing:
-            event = pygame.event.wait()
-
-            # End the game if the Pygame window is closed.
-            if event.type == pygame.QUIT:
-                playing = False
-                pygame.display.quit()
-                pygame.quit()
-                exit()
-
-            if event.type == pygame.MOUSEWHEEL:
-                pass
-
-            # First click selects game piece to move.
-            if event.type == pygame.MOUSEBUTTONDOWN and click_1:
-                click_1 = False
-                pos1 = pygame.mouse.get_pos()
-
-                # Convert the mouse position to board coordinates.
-                x1 = (pos1[0] - frame) // (width + margin)
-                y1 = (pos1[1] - frame) // (height + margin)
-
-                # Highlight the selected game piece.
-                pygame.draw.rect(screen, green, (int((pos1[0]-(1.5 * width))),
-                                                 int((pos1[1]-(1.5 * height))), 3 * width,
-                                                 3 * height), 4)
-                pygame.display.update()
-
-            # Second click selects position to move game piece.
-            elif event.type == pygame.MOUSEBUTTONDOWN and not click_1:
-                pos2 = pygame.mouse.get_pos()
-
-                # Convert mouse position to board coordinates.
-                x2 = (pos2[0] - frame) // (width + margin)
-                y2 = (pos2[1] - frame) // (height + margin)
-
-                # Highlight the selected move
-                pygame.draw.rect(screen, green, (int(pos2[0]-(1.5 * width)),
-                                                 int(pos2[1]-(1.5 * height)), 3 * width,
-                                                 3 * height), 4)
-                pygame.display.update()
-
-                # Call the make_move method to complete the move if it is valid.
-                if self.get_game_state() == "UNFINISHED":
-                    self.make_move(x1, y1, x2, y2)
-                else:
-                    playing = False
-
     def make_move(self, x1, y1, x2, y2):
         """
         Takes as parameters the coordinates of the piece being moved and the desired
-        location of the move. Communicates with the GamePiece class to validate the
-        game piece and move direction.  Communicates with the Move class to validate
-        the move and make the move.  Updates the game board, the game state, and the
-        current player after a valid move. Returns True for a valid move. Returns False
-        if the move is invalid.
+        location of the move. Validates the game piece, the move direction and the
+        move on the Bitboard, using the same rules as the GamePiece and Move classes.
+        Updates the game board, the game state, and the current player after a valid
+        move, which pop_move can take back. Returns True for a valid move. Returns
+        False if the move is invalid.
         """
-        # Make sure the piece is moving.
-        if x1 == x2 and y1 == y2:
+        # Make sure the piece is moving and the current and new piece centers
+        # are on the board.
+        if self._check_bounds(x1, y1, x2, y2) is not None:
             print("Invalid")
-            self.pygame_board(self.get_board())
             return False
 
-        # Make sure current and new piece centers are on the board.
-        if x1 <= 0 or x2 <= 0:
-            print("Invalid")
-            self.pygame_board(self.get_board())
+        player = self.get_current_player()
+
+        #  Make sure both players have valid rings.
+        black_ring, white_ring = self._rings.check_ring()
+        if not black_ring:
+            self._game_state = "WHITE_WON"
+            print("White won. Game over")
             return False
 
-        elif x1 >= 19 or x2 >= 19:
-            print("Invalid")
-            self.pygame_board(self.get_board())
+        if not white_ring:
+            self._game_state = "BLACK_WON"
+            print("Black won. Game over")
             return False
 
-        elif y1 <= 0 or y1 >= 19:
-            print("Invalid")
-            self.pygame_board(self.get_board())
+        #  Check if a player has won.
+        if self._game_state != "UNFINISHED":
             return False
 
-        elif y2 <= 0 or y2 >= 19:
+        masks = self._slide_piece(player, x1, y1, x2, y2)
+        if masks is None:
             print("Invalid")
-            self.pygame_board(self.get_board())
             return False
 
-        player = self.get_current_player()
+        self._apply_move(x1, y1, x2, y2, masks)
 
-        #  Make sure both players have valid rings.
-        if not self.check_ring(self.get_board())[0]:
-            self._game_state = "WHITE_WON"
+        #  See if the current player won.
+        black_ring, white_ring = self._rings.check_ring()
+        if not black_ring:
             print("White won. Game over")
-            return False
 
-        if not self.check_ring(self.get_board())[1]:
-            self._game_state = "BLACK_WON"
+        if not white_ring:
             print("Black won. Game over")
+
+        return True
+
+    def push_move(self, x1, y1, x2, y2):
+        """
+        Takes as parameters the coordinates of the piece being moved and the desired
+        location of the move. Makes the move in place like make_move, but without
+        printing anything, and saves an undo record so that pop_move can take the
+        move back. Returns True for a valid move. Returns False if the move is
+        invalid, in which case nothing changes.
+        """
+        if self._check_bounds(x1, y1, x2, y2) is not None:
             return False
 
-        #  Check if a player has won.
-        if self._game_state != "UNFINISHED":
+        if self._game_state != "UNFINISHED" or not self._rings.black_count \
+                or not self._rings.white_count:
             return False
 
-        game_piece = GamePiece(self.get_board(), player, x1, y1)
-        new_game_piece = GamePiece(self.get_board(), player, x2, y2)
+        masks = self._slide_piece(self._current_player, x1, y1, x2, y2)
+        if masks is None:
+            return False
 
-        # Check for a valid piece
-        if not game_piece.valid_piece():
-            print("Invalid")
-            self.pygame_board(self.get_board())
+        self._apply_move(x1, y1, x2, y2, masks)
+        return True
+
+    def pop_move(self):
+        """
+        Takes back the last move made with make_move or push_move, restoring the
+        board, the rings, the hash, the current player and the game state. Returns
+        True if a move was taken back. Returns False if there are no moves to take back.
+        """
+        if not self._undo:
             return False
 
+        (black_change, white_change, black_rings, white_rings, black_count,
+         white_count, player, game_state, position_hash, move) = self._undo.pop()
+
+        bitboard = self._bitboard
+        bitboard.black ^= black_change
+        bitboard.white ^= white_change
+
+        rings = self._rings
+        rings.black = black_rings
+        rings.white = white_rings
+        rings.black_count = black_count
+        rings.white_count = white_count
+
+        # The evaluator saved nothing for moves made before it was attached.
+        evaluator = self._evaluator
+        if evaluator is not None:
+            if len(self._undo) < self._evaluator_ply:
+                evaluator.reset(bitboard, rings)
+                self._evaluator_ply = len(self._undo)
+            else:
+                evaluator.undo()
+
+        self._current_player = player
+        self._game_state = game_state
+        self._hash = position_hash
+        return True
+
+    def get_ply_count(self):
+        """ Returns the number of moves that pop_move can take back. """
+        return len(self._undo)
+
+    def _check_bounds(self, x1, y1, x2, y2):
+        """
+        Returns NO_MOVE if the piece is not moving, OFF_BOARD if the current or
+        new piece center is not on the board, and None otherwise.
+        """
+        if x1 == x2 and y1 == y2:
+            return NO_MOVE
+
+        last = self._geometry.size - 1
+        if not (0 < x1 < last and 0 < y1 < last and 0 < x2 < last and 0 < y2 < last):
+            return OFF_BOARD
+
+        return None
+
+    def _check_piece(self, player, x1, y1, x2, y2):
+        """
+        Takes as parameters the player and the coordinates of a move whose centers
+        are on the board. Validates the game piece and the move direction, using
+        the same rules as the GamePiece class. Returns a tuple of the reason code
+        the move is invalid, or None if it may be valid, and the step in each
+        direction and the number of squares to move.
+        """
+        # Check for a valid piece. The piece must contain none of the opponent's
+        # stones and at least one of the current player's stones.
+        piece_black, piece_white = self._bitboard.piece(x1, y1)
+        if player == "x":
+            own, enemy = piece_black, piece_white
+        else:
+            own, enemy = piece_white, piece_black
+
+        if enemy:
+            return ENEMY_STONE, 0, 0, 0
+        if not own:
+            return NO_STONE, 0, 0, 0
+
         # Find the move direction
         x_change = x2 - x1
         y_change = y2 - y1
 
         move_spaces = max(abs(x_change), abs(y_change))
 
-        # Check for a 3 square limit on the move.
-        # If more than a 3 square move is attempted, but the game piece
-        # does not allow it, the move is invalid, and False is returned.
-        if game_piece.move_three() and move_spaces > 3:
-            print("Invalid")
-            self.pygame_board(self.get_board())
-            return False
-
-        piece = game_piece.playing_piece()
-        move = Move(piece, player)
+        # Check for a 3 square limit on the move. A piece without a stone in its
+        # center may not move more than 3 squares.
+        index = self._geometry.index
+        if not own >> index(x1, y1) & 1 and move_spaces > 3:
+            return OVER_RANGE, 0, 0, 0
 
-        # Create a copy of the board.
-        new_board = [[i for i in row] for row in self.get_board()]
+        # Diagonal moves must change the row and column by the same amount.
+        if x_change and y_change and abs(x_change) != abs(y_change):
+            return NOT_STRAIGHT, 0, 0, 0
 
-        # Move diagonally up and left.
-        if x_change < 0 and y_change < 0:
-            if abs(y_change / x_change) != 1.0:
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
-
-            if not game_piece.move_up_left():
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
-            else:
-                if not move.up_left(new_board, x1, y1, move_spaces):
-                    print("Invalid")
-                    self.pygame_board(self.get_board())
-                    return False
-                self._board = new_board
+        x_step = (x_change > 0) - (x_change < 0)
+        y_step = (y_change > 0) - (y_change < 0)
 
-        # Move up.
-        if x_change == 0 and y_change < 0:
-            if not game_piece.move_up():
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
-            else:
-                if not move.up(new_board, x1, y1, move_spaces):
-                    print("Invalid")
-                    self.pygame_board(self.get_board())
-                    return False
-                self._board = new_board
+        # The piece can only move in the direction of one of its outer stones.
+        if not own >> index(x1 + x_step, y1 + y_step) & 1:
+            return DIRECTION_NOT_ALLOWED, 0, 0, 0
 
-        # Move diagonally up and right.
-        if x_change > 0 and y_change < 0:
-            if abs(y_change / x_change) != 1.0:
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
+        return None, x_step, y_step, move_spaces
 
-            if not game_piece.move_up_right():
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
-            else:
-                if not move.up_right(new_board, x1, y1, move_spaces):
-                    print("Invalid")
-                    self.pygame_board(self.get_board())
-                    return False
-                self._board = new_board
+    def _slide_piece(self, player, x1, y1, x2, y2):
+        """
+        Takes as parameters the player and the coordinates of a move whose centers
+        are on the board. Validates the game piece, the move direction and the
+        move on the Bitboard, using the same rules as the GamePiece and Move
+        classes. Returns the black and white stone masks after the move if it is
+        valid. Otherwise returns None.
+        """
+        reason, x_step, y_step, move_spaces = self._check_piece(player, x1, y1, x2, y2)
+        if reason is not None:
+            return None
 
-        # Move left.
-        if x_change < 0 and y_change == 0:
-            if not game_piece.move_left():
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
-            else:
-                if not move.left(new_board, x1, y1, move_spaces):
-                    print("Invalid")
-                    self.pygame_board(self.get_board())
-                    return False
-                self._board = new_board
+        return self._bitboard.slide_masks(player, x1, y1, x_step, y_step, move_spaces,
+                                          self._rings.centres(player))
 
-        # Move right.
-        if x_change > 0 and y_change == 0:
-            if not game_piece.move_right():
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
-            else:
-                if not move.right(new_board, x1, y1, move_spaces):
-                    print("Invalid")
-                    self.pygame_board(self.get_board())
-                    return False
-                self._board = new_board
+    def validate_move(self, x1, y1, x2, y2):
+        """
+        Takes as parameters the coordinates of the piece being moved and the desired
+        location of the move. Checks the move for the current player with the same
+        rules as make_move, without printing anything or changing the game.
+        Returns a MoveValidation with the reason code, which is VALID for a valid
+        move.
+        """
+        move = (x1, y1, x2, y2)
+        reason = self._check_bounds(x1, y1, x2, y2)
+        if reason is not None:
+            return MoveValidation(move, reason)
 
-        # Move diagonally down and left.
-        if x_change < 0 and y_change > 0:
-            if abs(y_change / x_change) != 1.0:
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
+        if self._game_state != "UNFINISHED" or not self._rings.black_count \
+                or not self._rings.white_count:
+            return MoveValidation(move, GAME_OVER)
 
-            if not game_piece.move_down_left():
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
-            else:
-                if not move.down_left(new_board, x1, y1, move_spaces):
-                    print("Invalid")
-                    self.pygame_board(self.get_board())
-                    return False
-                self._board = new_board
+        player = self._current_player
+        reason, x_step, y_step, move_spaces = self._check_piece(player, x1, y1, x2, y2)
+        if reason is not None:
+            return MoveValidation(move, reason)
 
-        # Move down.
-        if x_change == 0 and y_change > 0:
-            if not game_piece.move_down():
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
-            else:
-                if not move.down(new_board, x1, y1, move_spaces):
-                    print("Invalid")
-                    self.pygame_board(self.get_board())
-                    return False
-                self._board = new_board
+        bitboard = self._bitboard
+        if bitboard.blocked(x1, y1, x_step, y_step, move_spaces):
+            return MoveValidation(move, BLOCKED)
 
-        # Move diagonally down and right.
-        if x_change > 0 and y_change > 0:
-            if abs(y_change / x_change) != 1.0:
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
+        if bitboard.slide_masks(player, x1, y1, x_step, y_step, move_spaces,
+                                self._rings.centres(player)) is None:
+            return MoveValidation(move, SELF_RING_LOSS)
 
-            if not game_piece.move_down_right():
-                print("Invalid")
-                self.pygame_board(self.get_board())
-                return False
-            else:
-                if not move.down_right(new_board, x1, y1, move_spaces):
-                    print("Invalid")
-                    self.pygame_board(self.get_board())
-                    return False
-                self._board = new_board
+        return MoveValidation(move, VALID)
 
-        #  See if the current player won.
-        if not self.check_ring(self.get_board())[0]:
+    def validate_moves(self, moves, replay=False):
+        """
+        Takes as a parameter a list of (x1, y1, x2, y2) moves. Returns a list with
+        a MoveValidation for each move. By default every move is checked against
+        the current position. With replay set the moves are checked as the next
+        moves of the game, one after the other, stopping after the first invalid
+        move. Either way the game is left as it was.
+        """
+        if not replay:
+            return [self.validate_move(*move) for move in moves]
+
+        results = []
+        made = 0
+        for move in moves:
+            result = self.validate_move(*move)
+            results.append(result)
+            if not result.valid:
+                break
+            self.push_move(*move)
+            made += 1
+        for _ in range(made):
+            self.pop_move()
+        return results
+
+    def _apply_move(self, x1, y1, x2, y2, masks):
+        """
+        Takes as parameters the coordinates of a valid move and the black and white
+        stone masks after it. Saves an undo record holding the squares that change,
+        the rings, the current player, the game state, the hash and the move, then
+        updates the board, the rings, the hash and the game state and changes
+        players.
+        """
+        black, white = masks
+        bitboard = self._bitboard
+        rings = self._rings
+        black_change = bitboard.black ^ black
+        white_change = bitboard.white ^ white
+        self._undo.append((black_change, white_change,
+                           rings.black, rings.white, rings.black_count, rings.white_count,
+                           self._current_player, self._game_state, self._hash,
+                           (x1, y1, x2, y2)))
+
+        bitboard.black = black
+        bitboard.white = white
+
+        # Only the keys of the squares that changed and of the player to move
+        # change the hash.
+        black_keys, white_keys = self._keys
+        self._hash ^= (hash_squares(black_change, black_keys)
+                       ^ hash_squares(white_change, white_keys) ^ WHITE_TO_MOVE)
+
+        # Only the rings near the starting and the final footprint can change.
+        geometry = self._geometry
+        rings.update(bitboard, geometry.neighbourhoods[geometry.index(x1, y1)]
+                     | geometry.neighbourhoods[geometry.index(x2, y2)])
+
+        if self._evaluator is not None:
+            self._evaluator.update(bitboard, rings)
+
+        if not rings.black_count:
             self._game_state = "WHITE_WON"
-            print("White won. Game over")
 
-        if not self.check_ring(self.get_board())[1]:
+        if not rings.white_count:
             self._game_state = "BLACK_WON"
-            print("Black won. Game over")
 
         # Change players at the end of the turn.
-        if player == "x":
+        if self._current_player == "x":
             self._current_player = "o"
         else:
             self._current_player = "x"
 
-        self.pygame_board(self.get_board())
-        return True
+    def generate_moves(self, player=None):
+        """
+        Takes as an optional parameter the player to move, which defaults to the
+        current player. Returns a list of every move that make_move would accept
+        for that player, as (x1, y1, x2, y2) tuples. Returns an empty list once the
+        game is over. Does not change the game or print anything.
+        """
+        if player is None:
+            player = self.get_current_player()
+
+        if self._game_state != "UNFINISHED":
+            return []
+
+        black_ring, white_ring = self._rings.check_ring()
+        if not black_ring or not white_ring:
+            return []
+
+        cache = self._move_cache
+        if cache is None:
+            return self._bitboard.legal_moves(player, self._rings.centres(player))
+
+        # The hash includes the player to move, so the other player's moves are
+        # kept under the hash with the side to move flipped.
+        key = self._hash if player == self._current_player else self._hash ^ WHITE_TO_MOVE
+        moves = cache.moves(key)
+        if moves is None:
+            moves = tuple(self._bitboard.legal_moves(player, self._rings.centres(player)))
+            cache.store_moves(key, moves)
+            cache.store_rings(key, _ring_status(self._rings), self._geometry.size)
+        return list(moves)
 
     def check_ring(self, board):
         """
@@ -449,8 +631,8 @@ class GessGame:
         white_ring = False
         black_ring = False
 
-        for row in range(1, 19):
-            for column in range(1, 19):
+        for row in range(1, len(board) - 1):
+            for column in range(1, len(board) - 1):
 
                 if board[row][column] == " ":
 
@@ -477,6 +659,121 @@ class GessGame:
         return black_ring, white_ring
 
 
+def _ring_status(rings):
+    """ Returns the ring status tuple a MoveCache stores for a RingIndex. """
+    return rings.black, rings.white, rings.black_count, rings.white_count
+
+
+class Position:
+    """
+    The Position class is an immutable snapshot of a game: the black and white
+    stones as masks, 400 bits on the standard board, the player to move, the
+    game state and the size of the board. The masks are shared, not copied, so
+    a standard Position takes about 250 bytes. Positions are hashable by their
+    Zobrist hash and compare equal when every field matches.
+    """
+
+    __slots__ = ("black", "white", "player", "game_state", "_hash", "size")
+
+    def __init__(self, black, white, player="x", game_state="UNFINISHED", position_hash=None,
+                 size=SIZE):
+        """
+        Takes as parameters the black and white stone masks, and optionally the
+        player to move, the game state, the Zobrist hash if it is known and the
+        number of rows and columns of the board.
+        """
+        if player not in ("x", "o"):
+            raise ValueError("player must be 'x' or 'o', not %r" % (player,))
+        if game_state not in GAME_STATES:
+            raise ValueError("unknown game state %r" % (game_state,))
+        if position_hash is None:
+            position_hash = zobrist_hash(Bitboard(black, white, board_geometry(size)), player)
+        set_field = object.__setattr__
+        set_field(self, "black", black)
+        set_field(self, "white", white)
+        set_field(self, "player", player)
+        set_field(self, "game_state", game_state)
+        set_field(self, "_hash", position_hash)
+        set_field(self, "size", size)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Position is immutable")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, Position):
+            return NotImplemented
+        return (self._hash == other._hash and self.black == other.black
+                and self.white == other.white and self.player == other.player
+                and self.game_state == other.game_state and self.size == other.size)
+
+    def __repr__(self):
+        return "Position(black=%#x, white=%#x, player=%r, game_state=%r)" % (
+            self.black, self.white, self.player, self.game_state)
+
+    def __reduce__(self):
+        return Position, (self.black, self.white, self.player, self.game_state, self._hash,
+                          self.size)
+
+    def copy(self):
+        """ Returns the Position itself, since it cannot change. """
+        return self
+
+    def to_board(self):
+        """ Returns the stones as a new list of lists with one list per row. """
+        return Bitboard(self.black, self.white, board_geometry(self.size)).to_board()
+
+    def pack(self):
+        """
+        Returns the position as bytes, 101 on the standard board: the black and
+        the white stone masks in little endian order, then one byte with the
+        player to move in the low bit and the game state above it.
+        """
+        size = (self.size * self.size + 7) // 8
+        flags = (self.player == "o") | GAME_STATES.index(self.game_state) << 1
+        return (self.black.to_bytes(size, "little") + self.white.to_bytes(size, "little")
+                + bytes((flags,)))
+
+    @classmethod
+    def unpack(cls, data, size=SIZE):
+        """
+        Takes as parameters the bytes made by pack and the number of rows and
+        columns of the board. Returns the Position.
+        """
+        board_size, size = size, (size * size + 7) // 8
+        if len(data) != 2 * size + 1:
+            raise ValueError("a packed position has %d bytes, not %d" % (2 * size + 1, len(data)))
+        flags = data[2 * size]
+        return cls(int.from_bytes(data[:size], "little"), int.from_bytes(data[size:2 * size], "little"),
+                   "o" if flags & 1 else "x", GAME_STATES[flags >> 1], size=board_size)
+
+
+class MoveValidation:
+    """
+    The MoveValidation class holds the result of GessGame.validate_move: the
+    move, whether it is valid, and the reason code. It is true for a valid move.
+    """
+
+    __slots__ = ("move", "valid", "reason")
+
+    def __init__(self, move, reason):
+        """ Takes as parameters the (x1, y1, x2, y2) move and its reason code. """
+        self.move = move
+        self.valid = reason == VALID
+        self.reason = reason
+
+    def __bool__(self):
+        return self.valid
+
+    def __repr__(self):
+        return "MoveValidation(move=%r, reason=%s)" % (self.move, self.reason)
+
+
 class Move:
     """
     The Move class represents a move in the Gess Game.  Has methods to move in each
@@ -526,11 +823,12 @@ class Move:
         new_board[old_y + 1][old_x + 1] = " "
 
         # Remove any stones on the edges of the board.
-        for index in range(0, 20):
+        last = len(new_board) - 1
+        for index in range(0, last + 1):
             new_board[0][index] = " "
-            new_board[19][index] = " "
+            new_board[last][index] = " "
             new_board[index][0] = " "
-            new_board[index][19] = " "
+            new_board[index][last] = " "
 
         # Check if the move will leave the current player without a ring.
         if self._player == "x" and not ggame.check_ring(new_board)[0]:
@@ -575,11 +873,12 @@ class Move:
         new_board[old_y + 1][old_x + 1] = " "
 
         # Remove any stones on the edges of the board.
-        for index in range(0, 20):
+        last = len(new_board) - 1
+        for index in range(0, last + 1):
             new_board[0][index] = " "
-            new_board[19][index] = " "
+            new_board[last][index] = " "
             new_board[index][0] = " "
-            new_board[index][19] = " "
+            new_board[index][last] = " "
 
         # Check if the move will leave the current player without a ring.
         if self._player == "x" and not ggame.check_ring(new_board)[0]:
@@ -628,11 +927,12 @@ class Move:
         new_board[old_y + 1][old_x + 1] = " "
 
         # Remove any stones on the edges of the board.
-        for index in range(0, 20):
+        last = len(new_board) - 1
+        for index in range(0, last + 1):
             new_board[0][index] = " "
-            new_board[19][index] = " "
+            new_board[last][index] = " "
             new_board[index][0] = " "
-            new_board[index][19] = " "
+            new_board[index][last] = " "
 
         # Check if the move will leave the current player without a ring.
         if self._player == "x" and not ggame.check_ring(new_board)[0]:
@@ -677,11 +977,12 @@ class Move:
         new_board[old_y + 1][old_x + 1] = " "
 
         # Remove any stones on the edges of the board.
-        for index in range(0, 20):
+        last = len(new_board) - 1
+        for index in range(0, last + 1):
             new_board[0][index] = " "
-            new_board[19][index] = " "
+            new_board[last][index] = " "
             new_board[index][0] = " "
-            new_board[index][19] = " "
+            new_board[index][last] = " "
 
         # Check if the move will leave the current player without a ring.
         if self._player == "x" and not ggame.check_ring(new_board)[0]:
@@ -726,11 +1027,12 @@ class Move:
         new_board[old_y + 1][old_x - 1] = " "
 
         # Remove any stones on the edges of the board.
-        for index in range(0, 20):
+        last = len(new_board) - 1
+        for index in range(0, last + 1):
             new_board[0][index] = " "
-            new_board[19][index] = " "
+            new_board[last][index] = " "
             new_board[index][0] = " "
-            new_board[index][19] = " "
+            new_board[index][last] = " "
 
         # Check if the move will leave the current player without a ring.
         if self._player == "x" and not ggame.check_ring(new_board)[0]:
@@ -779,11 +1081,12 @@ class Move:
         new_board[old_y + 1][old_x + 1] = " "
 
         # Remove any stones on the edges of the board.
-        for index in range(0, 20):
+        last = len(new_board) - 1
+        for index in range(0, last + 1):
             new_board[0][index] = " "
-            new_board[19][index] = " "
+            new_board[last][index] = " "
             new_board[index][0] = " "
-            new_board[index][19] = " "
+            new_board[index][last] = " "
 
         # Check if the move will leave the current player without a ring.
         if self._player == "x" and not ggame.check_ring(new_board)[0]:
@@ -828,11 +1131,12 @@ class Move:
         new_board[old_y - 1][old_x + 1] = " "
 
         # Remove any stones on the edges of the board.
-        for index in range(0, 20):
+        last = len(new_board) - 1
+        for index in range(0, last + 1):
             new_board[0][index] = " "
-            new_board[19][index] = " "
+            new_board[last][index] = " "
             new_board[index][0] = " "
-            new_board[index][19] = " "
+            new_board[index][last] = " "
 
         # Check if the move will leave the current player without a ring.
         if self._player == "x" and not ggame.check_ring(new_board)[0]:
@@ -858,7 +1162,7 @@ class Move:
         new_spaces = [new_board[old_y][old_x + 2],
                       new_board[old_y + 1][old_x + 2],
                       new_board[old_y + 2][old_x + 2],
-                      new_board[old_y + 2][old_x - 1],
+                      new_board[old_y + 2][old_x + 1],
                       new_board[old_y + 2][old_x]]
         if new_spaces != [" ", " ", " ", " ", " "]:
             if move_spaces > 1:
@@ -881,11 +1185,12 @@ class Move:
         new_board[old_y + 1][old_x - 1] = " "
 
         # Remove any stones on the edges of the board.
-        for index in range(0, 20):
+        last = len(new_board) - 1
+        for index in range(0, last + 1):
             new_board[0][index] = " "
-            new_board[19][index] = " "
+            new_board[last][index] = " "
             new_board[index][0] = " "
-            new_board[index][19] = " "
+            new_board[index][last] = " "
 
         # Check if the move will leave the current player without a ring.
         if self._player == "x" and not ggame.check_ring(new_board)[0]:
@@ -1049,5 +1354,8 @@ class GamePiece:
             return False
 
 
-gg = GessGame()
-gg.pygame_board(gg.get_board())
+if __name__ == "__main__":
+    # The Pygame front end is optional and only imported when the game is run
+    # as a program.
+    import GessGui
+    GessGui.main()
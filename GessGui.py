@@ -0,0 +1,336 @@
+# Author:  Amy Salley
+# Description:  The Pygame front end for the Gess Game.  Draws the board and gets
+# user input from the mouse.  The rules live in GessGame.py, which does not
+# import Pygame, so this module is only loaded when the game is played on screen.
+
+import os
+
+import pygame
+
+from GessBitboard import DIRECTIONS, MASK_DIRECTIONS
+from GessGame import GessGame
+
+# Board dimensions.
+WIDTH = 30
+HEIGHT = 30
+MARGIN = 2
+FRAME = 75
+SQUARES = 20
+SCREEN_SIZE = (800, 800)
+
+# Board and game piece colors.
+BROWN = (143, 82, 9)
+DARK_BROWN = (92, 65, 13)
+BLACK = (0, 0, 0)
+GRAY = (53, 69, 94)
+WHITE = (255, 255, 255)
+OFF_WHITE = (235, 241, 250)
+GREEN = (147, 219, 167)
+RED = (219, 118, 118)
+
+# The window only redraws when something changes, so a low frame rate is
+# enough to keep the mouse responsive while using almost no CPU when idle.
+FRAMES_PER_SECOND = 30
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# The radius of the largest circle of a stone, which sets the size of its sprite.
+STONE_RADIUS = 13
+
+
+def _asset(name):
+    """ Returns the path of an image or font that ships next to this module. """
+    return os.path.join(ASSET_DIR, name)
+
+
+def check_size(game):
+    """
+    Raises ValueError unless the GessGame is on the standard board, the only size
+    the window is laid out for.
+    """
+    if game.get_size() != SQUARES:
+        raise ValueError("the window draws a %dx%d board, not %dx%d" % (
+            SQUARES, SQUARES, game.get_size(), game.get_size()))
+
+
+def render_background():
+    """
+    Returns a surface with the background images and the board lines. A display
+    mode must be set first, since the surface is converted to its pixel format.
+    """
+    background = pygame.Surface(SCREEN_SIZE).convert()
+
+    bamboo = pygame.image.load(_asset("bamboo.png")).convert()
+    background.blit(pygame.transform.scale(bamboo, SCREEN_SIZE), (0, 0))
+    pygame.draw.rect(background, DARK_BROWN, (72, 72, 647, 647))
+    wood = pygame.image.load(_asset("wood.png")).convert()
+    background.blit(pygame.transform.scale(wood, (638, 638)), (77, 77))
+
+    end = SCREEN_SIZE[0] - FRAME - 10
+    for line in range(SQUARES):
+        position = FRAME + (WIDTH + MARGIN) * line
+        pygame.draw.line(background, BROWN, (position, FRAME), (position, end), 2)
+        pygame.draw.line(background, BROWN, (FRAME, position), (end, position), 2)
+
+    return background
+
+
+def render_stones():
+    """
+    Returns a dictionary from "x" and "o" to a transparent sprite of the black
+    and the white stone, centered on (STONE_RADIUS, STONE_RADIUS).
+    """
+    side = 2 * STONE_RADIUS + 1
+    center = (STONE_RADIUS, STONE_RADIUS)
+    sprites = {}
+    for stone, rim, face in (("x", 12, 10), ("o", 13, 11)):
+        sprite = pygame.Surface((side, side), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, BLACK, center, rim)
+        pygame.draw.circle(sprite, GRAY if stone == "x" else OFF_WHITE, center, face)
+        sprites[stone] = sprite.convert_alpha()
+    return sprites
+
+
+class BoardView:
+    """
+    The BoardView class draws a GessGame in a Pygame window. The background, the
+    stones, the board lines and the text are rendered once and cached. After a
+    move only the squares that changed are redrawn, and only their rectangles
+    are sent to the display.
+    """
+
+    def __init__(self, game, screen):
+        """
+        Takes as parameters the GessGame to draw and the Pygame surface to draw
+        it on, which may be an offscreen surface. Loads and scales the images
+        and the font once. Raises ValueError for a game on another board size.
+        """
+        check_size(game)
+        self._game = game
+        self._screen = screen
+        self._background = render_background()
+        self._stones = render_stones()
+        self._font = pygame.font.Font(_asset("CaviarDreams.ttf"), 20)
+        self._text_cache = {}
+        self._text = None
+        self._text_rect = None
+        self._board = None
+        self._dirty = []
+
+    def _square_rect(self, row, col):
+        """ Returns the rectangle of the board square in the given row and column. """
+        return pygame.Rect(FRAME + (WIDTH + MARGIN) * col, FRAME + (HEIGHT + MARGIN) * row,
+                           WIDTH + MARGIN + 1, HEIGHT + MARGIN + 1)
+
+    def _draw_stone(self, row, col, stone):
+        """ Draws a black or white stone, if there is one, on the given square. """
+        sprite = self._stones.get(stone)
+        if sprite is not None:
+            self._screen.blit(sprite, (
+                int(FRAME + ((MARGIN + WIDTH) * col + MARGIN) + WIDTH / 2) - STONE_RADIUS,
+                int(FRAME + ((MARGIN + HEIGHT) * row + MARGIN) + HEIGHT / 2) - STONE_RADIUS))
+
+    def _restore(self, rect):
+        """
+        Redraws the background and every stone inside the given rectangle and marks
+        it to be sent to the display.
+        """
+        rect = rect.clip(self._screen.get_rect())
+        self._screen.blit(self._background, rect, rect)
+
+        first_col = max((rect.left - FRAME) // (WIDTH + MARGIN), 0)
+        last_col = min((rect.right - FRAME) // (WIDTH + MARGIN), SQUARES - 1)
+        first_row = max((rect.top - FRAME) // (HEIGHT + MARGIN), 0)
+        last_row = min((rect.bottom - FRAME) // (HEIGHT + MARGIN), SQUARES - 1)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                self._draw_stone(row, col, self._board[row][col])
+
+        if self._text is not None and rect.colliderect(self._text_rect):
+            self._screen.blit(self._text, self._text_rect)
+
+        self._dirty.append(rect)
+
+    def _status_text(self):
+        """ Returns the text that shows the current player or the winner. """
+        won = self._game.get_game_state()
+        if won == "BLACK_WON":
+            return "Black won! Game over"
+        if won == "WHITE_WON":
+            return "White won! Game over"
+        if self._game.get_current_player() == "x":
+            return "Black's turn"
+        return "White's turn"
+
+    def _draw_status(self):
+        """ Draws the status text, replacing the previous text. """
+        message = self._status_text()
+        text = self._text_cache.get(message)
+        if text is None:
+            text = self._font.render(message, True, BLACK, WHITE)
+            self._text_cache[message] = text
+
+        if text is self._text:
+            return
+
+        if self._text is not None:
+            self._text = None
+            self._restore(self._text_rect)
+
+        self._text = text
+        self._text_rect = text.get_rect()
+        self._text_rect.center = (120, 40)
+        self._screen.blit(text, self._text_rect)
+        self._dirty.append(self._text_rect)
+
+    def set_game(self, game):
+        """ Takes as a parameter another GessGame to show and draws the whole window. """
+        check_size(game)
+        self._game = game
+        self.draw()
+
+    def draw(self):
+        """ Draws the whole window. """
+        self._board = self._game.get_board()
+        self._screen.blit(self._background, (0, 0))
+        for row in range(SQUARES):
+            for col in range(SQUARES):
+                self._draw_stone(row, col, self._board[row][col])
+        self._text = None
+        self._draw_status()
+        self._dirty = [self._screen.get_rect()]
+
+    def refresh(self):
+        """ Redraws only the squares that changed since the last draw. """
+        board = self._game.get_board()
+        old_board = self._board
+        self._board = board
+        for row in range(SQUARES):
+            if board[row] != old_board[row]:
+                for col in range(SQUARES):
+                    if board[row][col] != old_board[row][col]:
+                        self._restore(self._square_rect(row, col))
+        self._draw_status()
+
+    def highlight_rect(self, x, y):
+        """ Returns the rectangle around the 3x3 piece centered on the given square. """
+        return pygame.Rect(FRAME + (WIDTH + MARGIN) * (x - 1), FRAME + (HEIGHT + MARGIN) * (y - 1),
+                           3 * (WIDTH + MARGIN) + 2, 3 * (HEIGHT + MARGIN) + 2)
+
+    def highlight(self, x, y, hint=False):
+        """
+        Highlights the 3x3 piece centered on the given square. With hint set, a
+        piece the current player cannot move is outlined in red, and the stones
+        that give a valid piece its directions are marked. Returns the
+        highlighted rectangle so that it can be cleared later.
+        """
+        rect = self.highlight_rect(x, y)
+        color = GREEN
+        if hint:
+            valid, directions = False, 0
+            if 1 <= x <= SQUARES - 2 and 1 <= y <= SQUARES - 2:
+                player = self._game.get_current_player()
+                valid, directions, _ = self._game.get_bitboard().piece_info(player, x, y)
+            if not valid:
+                color = RED
+            for direction in MASK_DIRECTIONS[directions]:
+                dx, dy = DIRECTIONS[direction]
+                center = (int(FRAME + (MARGIN + WIDTH) * (x + dx) + MARGIN + WIDTH / 2),
+                          int(FRAME + (MARGIN + HEIGHT) * (y + dy) + MARGIN + HEIGHT / 2))
+                pygame.draw.circle(self._screen, GREEN, center, 4)
+        pygame.draw.rect(self._screen, color, rect, 4)
+        self._dirty.append(rect)
+        return rect
+
+    def clear(self, rect):
+        """ Removes a highlight drawn by the highlight method. """
+        self._restore(rect)
+
+    def changed(self):
+        """ Returns the rectangles drawn since the last call and forgets them. """
+        dirty = self._dirty
+        self._dirty = []
+        return dirty
+
+    def flip(self):
+        """ Sends the changed rectangles to the display. """
+        dirty = self.changed()
+        if dirty:
+            pygame.display.update(dirty)
+
+
+def square_at(position):
+    """ Converts a mouse position to board coordinates. """
+    return ((position[0] - FRAME) // (WIDTH + MARGIN),
+            (position[1] - FRAME) // (HEIGHT + MARGIN))
+
+
+def play(game):
+    """
+    Takes as a parameter the GessGame to play. Opens a Pygame window and gets
+    user input from the mouse to move the player's game piece and play the game.
+    The first click selects a game piece and the second click selects where to
+    move it. Once the game is over, the next click closes the window. Raises
+    ValueError for a game on a board other than the standard 20x20.
+    """
+    check_size(game)
+    pygame.init()
+
+    # Initialize the display.
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    pygame.display.set_caption("Gess Game")
+    clock = pygame.time.Clock()
+
+    view = BoardView(game, screen)
+    view.draw()
+    view.flip()
+
+    selected = None
+    playing = True
+
+    # Play the game!
+    while playing:
+        for event in pygame.event.get():
+
+            # End the game if the Pygame window is closed.
+            if event.type == pygame.QUIT:
+                playing = False
+
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                if game.get_game_state() != "UNFINISHED":
+                    playing = False
+
+                # First click selects game piece to move.
+                elif selected is None:
+                    x1, y1 = square_at(event.pos)
+                    selected = (x1, y1, view.highlight(x1, y1, hint=True))
+
+                # Second click selects position to move game piece.
+                else:
+                    x1, y1, first_rect = selected
+                    x2, y2 = square_at(event.pos)
+                    second_rect = view.highlight(x2, y2)
+                    view.flip()
+
+                    # Call the make_move method to complete the move if it is valid.
+                    game.make_move(x1, y1, x2, y2)
+                    view.refresh()
+                    view.clear(first_rect)
+                    view.clear(second_rect)
+                    selected = None
+
+        view.flip()
+        clock.tick(FRAMES_PER_SECOND)
+
+    pygame.display.quit()
+    pygame.quit()
+
+
+def main():
+    """ Starts a new game in a Pygame window. """
+    play(GessGame())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# Description:  Zobrist hashing of Gess positions and a size-bounded
+# transposition table.  Every (stone colour, square) pair and the side to move
+# has a fixed random 64-bit key, and the hash of a position is the XOR of the
+# keys that apply to it, so a move updates the hash from the squares it changed.
+
+import random
+import sys
+from collections import OrderedDict
+
+from GessBitboard import SIZE
+
+# The keys are drawn from a fixed seed so that hashes are the same in every
+# process, which lets worker processes and saved tables share them.
+_rng = random.Random(0x6E55)
+BLACK_KEYS = tuple(_rng.getrandbits(64) for _ in range(SIZE * SIZE))
+WHITE_KEYS = tuple(_rng.getrandbits(64) for _ in range(SIZE * SIZE))
+WHITE_TO_MOVE = _rng.getrandbits(64)
+del _rng
+
+# The square keys of every board size used so far.
+_BOARD_KEYS = {SIZE: (BLACK_KEYS, WHITE_KEYS)}
+
+# Transposition table entry flags: the stored value is exact, a lower bound
+# (the search failed high) or an upper bound (the search failed low).
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+def hash_squares(mask, keys):
+    """ Returns the XOR of the keys of every square set in the mask. """
+    value = 0
+    while mask:
+        low = mask & -mask
+        value ^= keys[low.bit_length() - 1]
+        mask ^= low
+    return value
+
+
+def board_keys(size=SIZE):
+    """
+    Returns the black and the white square keys for a board with the given number
+    of rows and columns. Boards other than the standard one draw their keys from
+    a fixed seed of their own, so their hashes are also the same in every process.
+    """
+    keys = _BOARD_KEYS.get(size)
+    if keys is None:
+        rng = random.Random(0x6E55 << 16 | size)
+        keys = _BOARD_KEYS[size] = (tuple(rng.getrandbits(64) for _ in range(size * size)),
+                                    tuple(rng.getrandbits(64) for _ in range(size * size)))
+    return keys
+
+
+def zobrist_hash(bitboard, player):
+    """
+    Takes as parameters a Bitboard and the player to move. Returns the Zobrist
+    hash of the position.
+    """
+    black_keys, white_keys = board_keys(bitboard.geometry.size)
+    value = hash_squares(bitboard.black, black_keys) ^ hash_squares(bitboard.white, white_keys)
+    if player == "o":
+        value ^= WHITE_TO_MOVE
+    return value
+
+
+class TranspositionTable:
+    """
+    The TranspositionTable class stores search results keyed by Zobrist hash in a
+    fixed number of two-slot buckets. The first slot of a bucket keeps the
+    deepest result from the current search and the second slot always takes the
+    newest result, so the table never grows past its size.
+    """
+
+    def __init__(self, entries=1 << 18):
+        """
+        Takes as an optional parameter the maximum number of entries, which is
+        rounded down to a power of two.
+        """
+        buckets = 1
+        while buckets * 4 <= entries:
+            buckets *= 2
+        self._mask = buckets - 1
+        self._deep = [None] * buckets
+        self._recent = [None] * buckets
+        self._generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def __len__(self):
+        """ Returns the number of entries in the table. """
+        return (sum(1 for entry in self._deep if entry is not None)
+                + sum(1 for entry in self._recent if entry is not None))
+
+    def capacity(self):
+        """ Returns the maximum number of entries the table can hold. """
+        return 2 * (self._mask + 1)
+
+    def new_search(self):
+        """
+        Marks the start of a new search. Entries from earlier searches stay usable
+        but are replaced first.
+        """
+        self._generation += 1
+
+    def clear(self):
+        """ Removes every entry and resets the counters. """
+        self._deep = [None] * (self._mask + 1)
+        self._recent = [None] * (self._mask + 1)
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """
+        Takes as a parameter a Zobrist hash. Returns the stored entry as a
+        (key, depth, value, flag, move, generation) tuple, or None if the position
+        is not in the table.
+        """
+        self.probes += 1
+        bucket = key & self._mask
+        entry = self._deep[bucket]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self._recent[bucket]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, value, flag, move=None):
+        """
+        Takes as parameters a Zobrist hash, the search depth, the value, its flag
+        (EXACT, LOWER or UPPER) and the best move found. Stores the result in the
+        deep slot if it is at least as deep as the entry there or that entry is
+        from an earlier search, and in the recent slot otherwise.
+        """
+        self.stores += 1
+        bucket = key & self._mask
+        entry = (key, depth, value, flag, move, self._generation)
+        deep = self._deep[bucket]
+        if deep is None or deep[0] == key or depth >= deep[1] or deep[5] != self._generation:
+            if deep is not None and deep[0] != key:
+                self._recent[bucket] = deep
+            self._deep[bucket] = entry
+        else:
+            self._recent[bucket] = entry
+
+
+# Estimated bytes for the parts of a MoveCache entry: the dictionary slot with
+# its key and list, and one (x1, y1, x2, y2) move.
+_ENTRY_BYTES = 200
+_MOVE_BYTES = sys.getsizeof((1, 2, 3, 4))
+
+# Estimated bytes of a ring status tuple for every board size used so far.
+_RINGS_BYTES = {}
+
+
+def _rings_bytes(size):
+    """
+    Returns the estimated bytes of a ring status tuple with its two masks, which
+    have one bit per square of a board with the given number of rows and columns.
+    """
+    estimate = _RINGS_BYTES.get(size)
+    if estimate is None:
+        estimate = _RINGS_BYTES[size] = (sys.getsizeof((0, 0, 0, 0))
+                                         + 2 * sys.getsizeof(1 << (size * size - 1)))
+    return estimate
+
+
+class MoveCache:
+    """
+    The MoveCache class keeps the legal move lists and ring status of recently
+    seen positions, keyed by Zobrist hash, and evicts the least recently used
+    position once its estimated size passes a memory cap. Move lists are
+    stored as tuples and ring status as (black centers, white centers, black
+    count, white count) tuples.
+    """
+
+    def __init__(self, max_bytes=64 << 20):
+        """ Takes as an optional parameter the memory cap in bytes. """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """ Returns the number of positions in the cache. """
+        return len(self._entries)
+
+    def clear(self):
+        """ Removes every entry and resets the counters. """
+        self._entries.clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key, slot):
+        """ Returns the given slot of the entry for the key, or None, and counts the probe. """
+        entry = self._entries.get(key)
+        if entry is None or entry[slot] is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[slot]
+
+    def moves(self, key):
+        """ Takes as a parameter a Zobrist hash. Returns the cached move tuple, or None. """
+        return self._lookup(key, 0)
+
+    def rings(self, key):
+        """ Takes as a parameter a Zobrist hash. Returns the cached ring status, or None. """
+        return self._lookup(key, 1)
+
+    def store_moves(self, key, moves):
+        """ Takes as parameters a Zobrist hash and a tuple of moves and caches the moves. """
+        self._store(key, 0, moves, sys.getsizeof(moves) + _MOVE_BYTES * len(moves))
+
+    def store_rings(self, key, rings, size=SIZE):
+        """
+        Takes as parameters a Zobrist hash and a ring status tuple and caches it.
+        Takes as an optional parameter the number of rows and columns of the board.
+        """
+        self._store(key, 1, rings, _rings_bytes(size))
+
+    def _store(self, key, slot, value, size):
+        """ Puts the value in the given slot of the key's entry and evicts down to the cap. """
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = [None, None, _ENTRY_BYTES]
+            self.bytes += _ENTRY_BYTES
+        else:
+            entries.move_to_end(key)
+        if entry[slot] is None:
+            entry[slot] = value
+            entry[2] += size
+            self.bytes += size
+
+        while self.bytes > self.max_bytes and entries:
+            _, evicted = entries.popitem(last=False)
+            self.bytes -= evicted[2]
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Returns a dictionary with the hits, misses, evictions, number of entries,
+        estimated bytes and hit rate.
+        """
+        probes = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._entries), "bytes": self.bytes,
+                "hit_rate": self.hits / probes if probes else 0.0}
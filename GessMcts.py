@@ -0,0 +1,297 @@
+# Description:  A Monte Carlo Tree Search player for the Gess Game.  Uses UCT
+# with a configurable exploration constant on top of GessGame.generate_moves,
+# push_move and pop_move.  With more than one worker the search is parallelised
+# at the root: every worker process grows its own tree from the same position
+# with a different random seed, and the visit counts of the root moves are
+# added together, so playouts per second grow with the number of cores.
+
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from GessBitboard import DIRECTIONS
+from GessGame import GessGame
+from GessSearch import evaluate
+
+# Scale that turns an evaluation at the end of a cut-off playout into the chance
+# that the player to move wins.
+_EVALUATION_SCALE = 400.0
+
+
+def push_random_move(game, rng, attempts=16):
+    """
+    Takes as parameters a GessGame and a random.Random. Makes a random legal move
+    for the current player with push_move and returns it, or returns None if the
+    player has no legal moves. Tries cheap random moves that start from one of the
+    player's stones first, and only falls back to generating every legal move
+    when none of them is valid.
+    """
+    stones = game.get_bitboard().stones(game.get_current_player())
+    squares = []
+    while stones:
+        low = stones & -stones
+        squares.append(low.bit_length() - 1)
+        stones ^= low
+
+    if squares:
+        size = game.get_size()
+        for _ in range(attempts):
+            # Center the piece so that the chosen stone is the one that lets it
+            # move in the chosen direction.
+            square = rng.choice(squares)
+            dx, dy = rng.choice(DIRECTIONS)
+            x1 = square % size - dx
+            y1 = square // size - dy
+            move_spaces = rng.randint(1, 3) if rng.random() < 0.8 else rng.randint(1, size - 3)
+            move = (x1, y1, x1 + dx * move_spaces, y1 + dy * move_spaces)
+            if game.push_move(*move):
+                return move
+
+    moves = game.generate_moves()
+    if not moves:
+        return None
+    move = rng.choice(moves)
+    game.push_move(*move)
+    return move
+
+
+class _Node:
+    """
+    The _Node class is a node of the search tree. It holds the move that leads to
+    it, the player who made that move, the moves not yet expanded, and the
+    number of visits and wins for that player.
+    """
+
+    __slots__ = ("move", "player", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, player, parent, untried):
+        """ Takes as parameters and initializes the node. """
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        """ Returns the child with the highest upper confidence bound. """
+        log_visits = math.log(self.visits)
+        best = None
+        best_value = -1.0
+        for child in self.children:
+            value = (child.wins / child.visits
+                     + exploration * math.sqrt(log_visits / child.visits))
+            if value > best_value:
+                best = child
+                best_value = value
+        return best
+
+
+def _playout_result(game, rng, rollout_limit):
+    """
+    Plays random moves from the current position until the game ends or the
+    rollout limit is reached, then takes them back. Returns the chance that the
+    player who just moved into the position wins: 1 or 0 for a finished game, or
+    an estimate from the evaluation for a cut-off playout.
+    """
+    mover = "o" if game.get_current_player() == "x" else "x"
+    plies = 0
+    while game.get_game_state() == "UNFINISHED" and plies < rollout_limit:
+        if push_random_move(game, rng) is None:
+            break
+        plies += 1
+
+    state = game.get_game_state()
+    if state == "BLACK_WON":
+        result = 1.0 if mover == "x" else 0.0
+    elif state == "WHITE_WON":
+        result = 1.0 if mover == "o" else 0.0
+    else:
+        score = evaluate(game)
+        if game.get_current_player() == mover:
+            result = 1.0 / (1.0 + math.exp(-score / _EVALUATION_SCALE))
+        else:
+            result = 1.0 / (1.0 + math.exp(score / _EVALUATION_SCALE))
+
+    for _ in range(plies):
+        game.pop_move()
+    return result
+
+
+def mcts_search(game, time_ms=1000, playouts=None, exploration=1.4, rollout_limit=60, seed=None):
+    """
+    Takes as parameters a GessGame, the time budget in milliseconds, and optionally
+    a playout budget, the exploration constant, the longest random playout and a
+    random seed. Grows a UCT tree from the current position in this process.
+    Returns a dictionary mapping each root move to its [visits, wins] and the
+    number of playouts. The game is left as it was. At least one of the budgets
+    must be given.
+    """
+    if time_ms is None and playouts is None:
+        raise ValueError("mcts_search needs a time or a playout budget")
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_ms / 1000 if time_ms is not None else None
+    mover = "o" if game.get_current_player() == "x" else "x"
+    root = _Node(None, mover, None, game.generate_moves())
+
+    count = 0
+    while (playouts is None or count < playouts) and \
+            (deadline is None or time.perf_counter() < deadline):
+        node = root
+        depth = 0
+
+        # Selection: follow the best children while the node is fully expanded.
+        while not node.untried and node.children:
+            node = node.select_child(exploration)
+            game.push_move(*node.move)
+            depth += 1
+
+        # Expansion: add one child for a move not tried yet.
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            player = game.get_current_player()
+            game.push_move(*move)
+            depth += 1
+            child = _Node(move, player, node, game.generate_moves())
+            node.children.append(child)
+            node = child
+
+        # Simulation and backpropagation. The result is for the player who
+        # moved into the node, and flips for each ply back up the tree.
+        result = _playout_result(game, rng, rollout_limit)
+        while node is not None:
+            node.visits += 1
+            node.wins += result
+            result = 1.0 - result
+            node = node.parent
+
+        for _ in range(depth):
+            game.pop_move()
+        count += 1
+
+    stats = {child.move: [child.visits, child.wins] for child in root.children}
+    return stats, count
+
+
+def _worker_search(position, history, time_ms, playouts, exploration, rollout_limit, seed):
+    """
+    Rebuilds the game from a Position and the hashes of the positions before it
+    in a worker process, and runs mcts_search on the result. A game made with
+    GessGame.from_position, or on another board size or layout, has no moves
+    that could be replayed from the standard starting position.
+    """
+    game = GessGame.from_position(position, history=history)
+    return mcts_search(game, time_ms, playouts, exploration, rollout_limit, seed)
+
+
+class MctsResult:
+    """
+    The MctsResult class holds the outcome of a search: the most visited move,
+    its visits and win rate, the number of playouts and the time taken.
+    """
+
+    def __init__(self, move, visits, win_rate, playouts, seconds, workers):
+        """ Takes as parameters and initializes the outcome of a search. """
+        self.move = move
+        self.visits = visits
+        self.win_rate = win_rate
+        self.playouts = playouts
+        self.seconds = seconds
+        self.workers = workers
+
+    @property
+    def playouts_per_second(self):
+        """ Returns the number of playouts per second across all workers. """
+        if self.seconds <= 0:
+            return 0.0
+        return self.playouts / self.seconds
+
+    def __repr__(self):
+        return ("MctsResult(move=%r, visits=%d, win_rate=%.3f, playouts=%d, workers=%d, "
+                "playouts_per_second=%.0f)" % (self.move, self.visits, self.win_rate,
+                                               self.playouts, self.workers,
+                                               self.playouts_per_second))
+
+
+class MctsPlayer:
+    """
+    The MctsPlayer class chooses moves with Monte Carlo Tree Search. With one
+    worker it searches in the calling process. With more workers it runs one
+    independent tree per worker in a process pool and combines their root moves.
+    """
+
+    def __init__(self, time_ms=1000, playouts=None, exploration=1.4, rollout_limit=60,
+                 workers=1, seed=None):
+        """
+        Takes as optional parameters the time budget in milliseconds, a playout
+        budget shared by the workers, the exploration constant, the longest
+        random playout, the number of worker processes and a random seed. At
+        least one of the budgets must be given.
+        """
+        if time_ms is None and playouts is None:
+            raise ValueError("MctsPlayer needs a time or a playout budget")
+        self.time_ms = time_ms
+        self.playouts = playouts
+        self.exploration = exploration
+        self.rollout_limit = rollout_limit
+        self.workers = workers
+        self.seed = seed
+
+    def search(self, game, executor=None):
+        """
+        Takes as parameters a GessGame and optionally a ProcessPoolExecutor to
+        reuse. Returns an MctsResult for the current player. The game is left as
+        it was.
+        """
+        start = time.perf_counter()
+        rng = random.Random(self.seed)
+        if self.workers <= 1:
+            stats, count = mcts_search(game, self.time_ms, self.playouts, self.exploration,
+                                       self.rollout_limit, rng.getrandbits(64))
+            return self._result(stats, count, time.perf_counter() - start)
+
+        share = None
+        if self.playouts is not None:
+            share = -(-self.playouts // self.workers)
+        position = game.get_position()
+        history = game.get_hash_history()
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            futures = [executor.submit(_worker_search, position, history, self.time_ms, share,
+                                       self.exploration, self.rollout_limit,
+                                       rng.getrandbits(64))
+                       for _ in range(self.workers)]
+            stats = {}
+            count = 0
+            for future in futures:
+                worker_stats, worker_count = future.result()
+                count += worker_count
+                for move, (visits, wins) in worker_stats.items():
+                    total = stats.setdefault(move, [0, 0.0])
+                    total[0] += visits
+                    total[1] += wins
+        finally:
+            if own_executor:
+                executor.shutdown()
+        return self._result(stats, count, time.perf_counter() - start)
+
+    def _result(self, stats, count, seconds):
+        """ Returns an MctsResult for the most visited root move. """
+        if not stats:
+            return MctsResult(None, 0, 0.0, count, seconds, self.workers)
+        move, (visits, wins) = max(stats.items(), key=lambda item: item[1][0])
+        return MctsResult(move, visits, wins / visits, count, seconds, self.workers)
+
+
+def best_move(game, time_ms=1000, exploration=1.4, workers=1, playouts=None, seed=None):
+    """
+    Takes as parameters a GessGame, the time budget in milliseconds, and optionally
+    the exploration constant, the number of worker processes, a playout budget
+    and a random seed. Returns an MctsResult with the most visited move.
+    """
+    player = MctsPlayer(time_ms, playouts, exploration, workers=workers, seed=seed)
+    return player.search(game)
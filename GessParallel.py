@@ -0,0 +1,328 @@
+# Description:  Lazy SMP parallel search for the Gess Game.  Several worker
+# processes run the GessSearch alpha-beta search on the same position at the
+# same time and share what they learn through one transposition table in
+# multiprocessing.shared_memory.  Each worker starts from a different part of
+# the root move list, so the workers spread over the root moves and fill the
+# table for each other.  The table takes no locks: every entry is stored with
+# its key XORed with its data, so an entry torn by two writers fails its check
+# and is treated as missing.
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from GessBitboard import DIRECTIONS, SIZE
+from GessGame import GessGame
+from GessSearch import SearchResult, Searcher
+
+# Entry layout, from the lowest bit: the value offset to be unsigned (32 bits),
+# the move code plus one, or 0 for no move (21 bits), the depth (7 bits), the
+# flag (2 bits) and the generation modulo 4 (2 bits).
+_VALUE_OFFSET = 1 << 31
+_MOVE_SHIFT = 32
+_DEPTH_SHIFT = 53
+_FLAG_SHIFT = 60
+_GENERATION_SHIFT = 62
+_MASK_64 = (1 << 64) - 1
+
+# The first two words of the shared block hold the generation and the stop flag.
+_HEADER_WORDS = 2
+
+
+def _move_codes(size):
+    """
+    Returns the number of move codes of a board with the given number of rows
+    and columns. A code packs the center a piece starts on, which is never on
+    the edge, the direction and the number of squares it slides.
+    """
+    return (size - 2) * (size - 2) * len(DIRECTIONS) * (size - 3)
+
+
+# The largest board whose move codes fit in the 21 bits of an entry.
+MAX_SIZE = SIZE
+while _move_codes(MAX_SIZE + 1) < 1 << 21:
+    MAX_SIZE += 1
+
+
+def _encode_move(move, size):
+    """ Returns the 21-bit encoding of an (x1, y1, x2, y2) move or None. """
+    if move is None:
+        return 0
+    x1, y1, x2, y2 = move
+    dx, dy = x2 - x1, y2 - y1
+    direction = DIRECTIONS.index(((dx > 0) - (dx < 0), (dy > 0) - (dy < 0)))
+    start = (y1 - 1) * (size - 2) + x1 - 1
+    return (start * len(DIRECTIONS) + direction) * (size - 3) + max(abs(dx), abs(dy))
+
+
+def _decode_move(bits, size):
+    """ Returns the move for a 21-bit encoding made by _encode_move. """
+    if not bits:
+        return None
+    rest, distance = divmod(bits - 1, size - 3)
+    start, direction = divmod(rest, len(DIRECTIONS))
+    y1, x1 = divmod(start, size - 2)
+    dx, dy = DIRECTIONS[direction]
+    distance += 1
+    return (x1 + 1, y1 + 1, x1 + 1 + dx * distance, y1 + 1 + dy * distance)
+
+
+class SharedTranspositionTable:
+    """
+    The SharedTranspositionTable class is a TranspositionTable whose two-slot
+    buckets live in shared memory, so that every process attached to it sees
+    the same entries. It has the same probe and store methods and entry tuples
+    as GessHash.TranspositionTable. The process that creates the table owns it
+    and must close it with unlink set once the other processes are done.
+    """
+
+    def __init__(self, entries=1 << 18, name=None, size=SIZE):
+        """
+        Takes as optional parameters the maximum number of entries, which is
+        rounded down to a power of two, the name of an existing table to attach
+        to and the size of the board searched. A new shared block is created if
+        no name is given. Raises ValueError for boards larger than MAX_SIZE.
+        """
+        if not 5 <= size <= MAX_SIZE:
+            raise ValueError("a shared table holds the moves of boards from 5x5 to %dx%d, not %dx%d"
+                             % (MAX_SIZE, MAX_SIZE, size, size))
+        self.size = size
+        buckets = 1
+        while buckets * 4 <= entries:
+            buckets *= 2
+        self._mask = buckets - 1
+        size = (_HEADER_WORDS + 4 * buckets) * 8
+        self.owner = name is None
+        if self.owner:
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self._words = self._memory.buf.cast("Q")
+        self._generation = self._words[0]
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    @property
+    def name(self):
+        """ Returns the name other processes use to attach to the table. """
+        return self._memory.name
+
+    def capacity(self):
+        """ Returns the maximum number of entries the table can hold. """
+        return 2 * (self._mask + 1)
+
+    def __len__(self):
+        """ Returns the number of entries in the table. """
+        words = self._words
+        return sum(1 for slot in range(2 * (self._mask + 1))
+                   if words[_HEADER_WORDS + 2 * slot + 1])
+
+    def new_search(self):
+        """
+        Marks the start of a new search. The owner moves every process to the
+        next generation, and attached tables pick up the owner's generation.
+        """
+        if self.owner:
+            self._words[0] = (self._words[0] + 1) & _MASK_64
+        self._generation = self._words[0]
+
+    def clear(self):
+        """ Removes every entry and resets the counters. """
+        words = self._words
+        for word in range(_HEADER_WORDS, len(words)):
+            words[word] = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def request_stop(self):
+        """ Asks every search that watches stop_requested to stop. """
+        self._words[1] = 1
+
+    def clear_stop(self):
+        """ Clears a stop request. """
+        self._words[1] = 0
+
+    def stop_requested(self):
+        """ Returns True if a stop was requested. """
+        return self._words[1] != 0
+
+    def _read(self, slot, key):
+        """ Returns the entry in the given slot if it holds the key, otherwise None. """
+        words = self._words
+        base = _HEADER_WORDS + 2 * slot
+        data = words[base + 1]
+        if not data or words[base] ^ data != key:
+            return None
+        return (key, data >> _DEPTH_SHIFT & 127,
+                (data & 0xFFFFFFFF) - _VALUE_OFFSET, data >> _FLAG_SHIFT & 3,
+                _decode_move(data >> _MOVE_SHIFT & 0x1FFFFF, self.size), data >> _GENERATION_SHIFT)
+
+    def probe(self, key):
+        """
+        Takes as a parameter a Zobrist hash. Returns the stored entry as a
+        (key, depth, value, flag, move, generation) tuple, or None if the position
+        is not in the table.
+        """
+        self.probes += 1
+        bucket = key & self._mask
+        entry = self._read(2 * bucket, key)
+        if entry is None:
+            entry = self._read(2 * bucket + 1, key)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def store(self, key, depth, value, flag, move=None):
+        """
+        Takes as parameters a Zobrist hash, the search depth, the value, its flag
+        (EXACT, LOWER or UPPER) and the best move found. Stores the result in the
+        deep slot if it is at least as deep as the entry there or that entry is
+        from an earlier search, and in the recent slot otherwise.
+        """
+        self.stores += 1
+        generation = self._generation & 3
+        data = ((value + _VALUE_OFFSET) & 0xFFFFFFFF
+                | _encode_move(move, self.size) << _MOVE_SHIFT
+                | min(depth, 127) << _DEPTH_SHIFT
+                | flag << _FLAG_SHIFT
+                | generation << _GENERATION_SHIFT)
+
+        words = self._words
+        deep = _HEADER_WORDS + 4 * (key & self._mask)
+        recent = deep + 2
+        deep_data = words[deep + 1]
+        deep_key = words[deep] ^ deep_data
+        if (not deep_data or deep_key == key or depth >= deep_data >> _DEPTH_SHIFT & 127
+                or deep_data >> _GENERATION_SHIFT != generation):
+            if deep_data and deep_key != key:
+                words[recent] = words[deep]
+                words[recent + 1] = deep_data
+            words[deep] = key ^ data
+            words[deep + 1] = data
+        else:
+            words[recent] = key ^ data
+            words[recent + 1] = data
+
+    def close(self, unlink=False):
+        """ Detaches from the shared block, and frees it if unlink is set. """
+        self._words.release()
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+
+
+# The table each worker process is attached to, kept between searches.
+_worker_table = None
+
+
+def _attach(name, entries, size):
+    """ Returns this process's attachment to the named table. """
+    global _worker_table
+    if _worker_table is None or _worker_table.name != name:
+        if _worker_table is not None:
+            _worker_table.close()
+        _worker_table = SharedTranspositionTable(entries, name, size)
+    return _worker_table
+
+
+def _worker_search(name, entries, position, history, root_moves, time_ms, max_depth,
+                   node_limit, main):
+    """
+    Rebuilds the game from a Position and the hashes of the positions before it
+    in a worker process and searches it with the shared table. The main worker
+    asks the others to stop when it finishes. Returns the SearchResult.
+    """
+    table = _attach(name, entries, position.size)
+    game = GessGame.from_position(position, history=history)
+    result = Searcher(table).search(game, time_ms, max_depth, node_limit, root_moves,
+                                    stop=None if main else table.stop_requested)
+    if main:
+        table.request_stop()
+    return result
+
+
+class ParallelSearcher:
+    """
+    The ParallelSearcher class runs a Lazy SMP search: every worker process
+    searches the whole tree with the same shared transposition table, starting
+    from a different part of the root move list. The result of the deepest
+    completed search is used, preferring the main worker.
+    """
+
+    def __init__(self, workers=2, table_entries=1 << 18, size=SIZE):
+        """
+        Takes as optional parameters the number of worker processes, the maximum
+        number of entries in the shared table and the size of the board searched,
+        at most MAX_SIZE.
+        """
+        self.workers = workers
+        self.table = SharedTranspositionTable(table_entries, size=size)
+        self._entries = table_entries
+        self._executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def search(self, game, time_ms=1000, max_depth=64, node_limit=None):
+        """
+        Takes as parameters a GessGame, the time budget in milliseconds, and
+        optionally the deepest iteration and a node budget per worker. Returns a
+        SearchResult whose nodes are the total over all workers. The game is left
+        as it was.
+        """
+        if game.get_size() != self.table.size:
+            raise ValueError("the table was made for a %dx%d board, not %dx%d" % (
+                self.table.size, self.table.size, game.get_size(), game.get_size()))
+        start = time.perf_counter()
+        self.table.new_search()
+        self.table.clear_stop()
+        moves = game.generate_moves()
+        if self._executor is None or len(moves) < 2:
+            result = Searcher(self.table).search(game, time_ms, max_depth, node_limit)
+            result.seconds = time.perf_counter() - start
+            return result
+
+        position = game.get_position()
+        history = game.get_hash_history()
+        futures = []
+        for worker in range(self.workers):
+            # Rotate the root moves so that each worker starts somewhere else.
+            first = worker * len(moves) // self.workers
+            root_moves = moves[first:] + moves[:first]
+            futures.append(self._executor.submit(
+                _worker_search, self.table.name, self._entries, position, history, root_moves,
+                time_ms, max_depth, node_limit, worker == 0))
+        results = [future.result() for future in futures]
+
+        best = results[0]
+        for result in results[1:]:
+            if result.depth > best.depth:
+                best = result
+        return SearchResult(best.move, best.score, best.pv, best.depth,
+                            sum(result.nodes for result in results),
+                            time.perf_counter() - start)
+
+    def close(self):
+        """ Shuts down the workers and frees the shared table. """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.table is not None:
+            self.table.close(unlink=True)
+            self.table = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def best_move(game, time_ms=1000, workers=2, max_depth=64, node_limit=None):
+    """
+    Takes as parameters a GessGame, the time budget in milliseconds, and
+    optionally the number of worker processes, the deepest iteration and a node
+    budget per worker. Returns a SearchResult with the best move found.
+    """
+    with ParallelSearcher(workers, size=game.get_size()) as searcher:
+        return searcher.search(game, time_ms, max_depth, node_limit)
@@ -0,0 +1,201 @@
+# Description:  Perft for the Gess Game.  Counts the positions reachable at each
+# depth from the starting board and from a few saved midgame positions, checks
+# the counts against stored values, and reports the time and nodes per second
+# of every depth.  The counts can also be taken with the original list based
+# Move and GamePiece rules, which serve as the reference for faster boards.
+#
+# Usage:  python GessPerft.py [depth] [--reference] [--position name]
+
+import argparse
+import sys
+import time
+
+from GessGame import GamePiece, GessGame, Move
+
+# Midgame positions reached by seeded random play, stored as the moves from the
+# starting position.
+POSITIONS = {
+    "start": [],
+    "midgame20": [(12, 13, 10, 13), (8, 7, 8, 6), (14, 12, 14, 13), (3, 3, 4, 3),
+                  (14, 13, 14, 14), (9, 6, 8, 5), (11, 17, 11, 14), (3, 6, 2, 6),
+                  (7, 17, 8, 16), (15, 2, 16, 2), (2, 14, 2, 13), (1, 7, 1, 5),
+                  (4, 12, 6, 14), (8, 5, 7, 4), (2, 18, 3, 17), (6, 4, 5, 3),
+                  (14, 17, 13, 16), (18, 5, 15, 8), (1, 11, 2, 12), (12, 5, 11, 6)],
+    "midgame40": [(11, 12, 11, 14), (2, 2, 2, 1), (1, 13, 4, 13), (3, 5, 1, 7),
+                  (17, 14, 17, 12), (14, 3, 14, 2), (6, 16, 7, 16), (11, 2, 10, 3),
+                  (5, 12, 5, 15), (6, 2, 7, 1), (12, 16, 11, 16), (13, 5, 14, 6),
+                  (7, 16, 6, 17), (5, 7, 5, 5), (3, 18, 2, 18), (16, 3, 15, 2),
+                  (14, 16, 15, 16), (10, 4, 9, 4), (1, 17, 9, 9), (4, 4, 6, 4),
+                  (7, 12, 8, 13), (2, 1, 2, 7), (18, 18, 16, 18), (7, 1, 7, 2),
+                  (13, 13, 15, 13), (18, 6, 16, 6), (17, 12, 16, 13), (7, 6, 8, 6),
+                  (16, 15, 14, 13), (4, 7, 3, 7), (10, 9, 5, 14), (1, 8, 1, 6),
+                  (13, 13, 13, 12), (9, 3, 10, 2), (15, 13, 18, 10), (6, 1, 6, 2),
+                  (14, 12, 12, 10), (1, 4, 3, 6), (4, 12, 5, 13), (10, 2, 9, 2)],
+    "midgame60": [(14, 14, 14, 11), (13, 7, 14, 6), (1, 18, 2, 17), (5, 2, 6, 3),
+                  (16, 16, 17, 16), (6, 6, 4, 6), (14, 18, 14, 17), (16, 1, 17, 2),
+                  (15, 9, 14, 10), (12, 6, 10, 6), (1, 15, 2, 16), (7, 3, 7, 5),
+                  (4, 14, 5, 13), (1, 7, 2, 6), (17, 18, 17, 17), (4, 6, 3, 5),
+                  (17, 17, 18, 16), (3, 3, 1, 5), (7, 13, 5, 11), (17, 2, 16, 2),
+                  (13, 12, 13, 9), (17, 4, 16, 3), (6, 17, 7, 16), (16, 6, 18, 6),
+                  (14, 7, 12, 9), (10, 6, 9, 6), (10, 10, 12, 10), (4, 2, 6, 2),
+                  (5, 10, 2, 10), (11, 3, 10, 3), (7, 17, 8, 16), (6, 1, 7, 2),
+                  (4, 18, 3, 17), (15, 3, 14, 2), (3, 15, 2, 16), (16, 5, 17, 5),
+                  (16, 17, 15, 17), (7, 6, 8, 6), (16, 14, 17, 13), (10, 5, 9, 6),
+                  (7, 17, 8, 16), (10, 3, 14, 3), (4, 11, 3, 11), (8, 4, 7, 4),
+                  (1, 11, 1, 9), (10, 1, 9, 1), (12, 10, 13, 10), (17, 5, 18, 5),
+                  (1, 12, 4, 15), (8, 3, 7, 4), (18, 16, 18, 15), (6, 4, 6, 10),
+                  (14, 16, 14, 18), (6, 11, 6, 3), (18, 15, 18, 14), (1, 3, 1, 4),
+                  (10, 14, 13, 11), (14, 2, 14, 5), (5, 15, 5, 18), (8, 2, 8, 1)],
+}
+
+# The number of positions at depth 1, 2, ... from every saved position. The
+# first two depths agree with the original Move and GamePiece rules.
+EXPECTED = {
+    "start": [319, 101761, 31552410],
+    "midgame20": [244, 62915, 15090534],
+    "midgame40": [183, 32664, 5752566],
+    "midgame60": [123, 17139, 1997897],
+}
+
+# The Move method for each direction, in the order of GessBitboard.DIRECTIONS.
+REFERENCE_DIRECTIONS = (((-1, -1), "move_up_left", "up_left"),
+                         ((0, -1), "move_up", "up"),
+                         ((1, -1), "move_up_right", "up_right"),
+                         ((-1, 0), "move_left", "left"),
+                         ((1, 0), "move_right", "right"),
+                         ((-1, 1), "move_down_left", "down_left"),
+                         ((0, 1), "move_down", "down"),
+                         ((1, 1), "move_down_right", "down_right"))
+
+
+def position(name):
+    """ Returns a GessGame for the saved position with the given name. """
+    game = GessGame()
+    for move in POSITIONS[name]:
+        if not game.push_move(*move):
+            raise ValueError("saved position %r has an illegal move %r" % (name, move))
+    return game
+
+
+def perft(game, depth):
+    """
+    Takes as parameters a GessGame and a depth. Returns the number of positions
+    reached by every sequence of depth legal moves. Finished games have no moves.
+    The game is left as it was.
+    """
+    moves = game.generate_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in moves:
+        game.push_move(*move)
+        nodes += perft(game, depth - 1)
+        game.pop_move()
+    return nodes
+
+
+def reference_moves(board, player):
+    """
+    Takes as parameters a board in the list of lists format and the player to
+    move. Returns a list of (move, new_board) pairs for every legal move, found
+    with the original GamePiece and Move rules. There are no moves once either
+    player has lost their rings.
+    """
+    black_ring, white_ring = GessGame().check_ring(board)
+    if not black_ring or not white_ring:
+        return []
+
+    moves = []
+    for y1 in range(1, 19):
+        for x1 in range(1, 19):
+            game_piece = GamePiece(board, player, x1, y1)
+            if not game_piece.valid_piece():
+                continue
+            limit = 3 if game_piece.move_three() else 17
+            piece = game_piece.playing_piece()
+            move = Move(piece, player)
+            for (dx, dy), allowed, direction in REFERENCE_DIRECTIONS:
+                if not getattr(game_piece, allowed)():
+                    continue
+                for move_spaces in range(1, limit + 1):
+                    x2 = x1 + dx * move_spaces
+                    y2 = y1 + dy * move_spaces
+                    if x2 <= 0 or x2 >= 19 or y2 <= 0 or y2 >= 19:
+                        break
+                    new_board = [[square for square in row] for row in board]
+                    if getattr(move, direction)(new_board, x1, y1, move_spaces):
+                        moves.append(((x1, y1, x2, y2), new_board))
+    return moves
+
+
+def reference_perft(board, player, depth):
+    """
+    Takes as parameters a board in the list of lists format, the player to move
+    and a depth. Returns the perft count using the original GamePiece and Move
+    rules.
+    """
+    if depth == 0:
+        return 1
+
+    moves = reference_moves(board, player)
+    if depth == 1:
+        return len(moves)
+
+    opponent = "o" if player == "x" else "x"
+    return sum(reference_perft(new_board, opponent, depth - 1) for _, new_board in moves)
+
+
+def run(names, depth, reference=False, output=sys.stdout):
+    """
+    Takes as parameters the names of saved positions and the deepest depth.
+    Prints the count, time and nodes per second of every depth, and whether the
+    count matches the stored value. With reference set the counts are also
+    taken with the original rules. Returns True if every count matched.
+    """
+    matched = True
+    print("%-10s %5s %12s %10s %12s  %s" % ("position", "depth", "nodes", "seconds", "nps", "check"),
+          file=output)
+    for name in names:
+        game = position(name)
+        expected = EXPECTED.get(name, [])
+        for current in range(1, depth + 1):
+            start = time.perf_counter()
+            nodes = perft(game, current)
+            seconds = time.perf_counter() - start
+            if current <= len(expected):
+                check = "ok" if nodes == expected[current - 1] else "FAIL expected %d" % expected[current - 1]
+            else:
+                check = "-"
+
+            if reference:
+                board = game.get_board()
+                start = time.perf_counter()
+                reference_nodes = reference_perft(board, game.get_current_player(), current)
+                reference_seconds = time.perf_counter() - start
+                if reference_nodes != nodes:
+                    check += ", FAIL reference %d" % reference_nodes
+                else:
+                    check += ", reference ok in %.2f s" % reference_seconds
+
+            matched = matched and "FAIL" not in check
+            nps = nodes / seconds if seconds > 0 else 0.0
+            print("%-10s %5d %12d %10.3f %12.0f  %s" % (name, current, nodes, seconds, nps, check),
+                  file=output)
+    return matched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count Gess positions at each depth.")
+    parser.add_argument("depth", type=int, nargs="?", default=2, help="deepest depth to count")
+    parser.add_argument("--reference", action="store_true",
+                        help="also count with the original Move and GamePiece rules")
+    parser.add_argument("--position", action="append", choices=sorted(POSITIONS),
+                        help="saved position to count from, may be repeated")
+    args = parser.parse_args(argv)
+    if not run(args.position or list(POSITIONS), args.depth, args.reference):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# Description:  Opt-in instrumentation for the Gess rules.  While it is running,
+# an Instrumentation counts ring checks, board copies, reference Move steps and
+# GamePiece constructions, and times the phases of GessGame.make_move.  It works
+# by wrapping the functions it watches and puts the originals back when it
+# stops, so the rules run unchanged and pay nothing while it is off.
+#
+# Usage:
+#     with GessProfile.instrument() as stats:
+#         game.make_move(...)
+#     print(stats.to_json())
+
+import json
+import sys
+import time
+
+import GessBitboard
+import GessGame
+
+# (owner, attribute, counter) for every counted function. The owner is a class
+# or a module.
+_COUNTED = (
+    (GessGame.GessGame, "check_ring", "check_ring"),
+    (GessBitboard.RingIndex, "check_ring", "check_ring"),
+    (GessBitboard.Bitboard, "check_ring", "check_ring"),
+    (GessBitboard.Geometry, "ring_centres", "ring_scans"),
+    (GessBitboard.Bitboard, "copy", "board_copies"),
+    (GessBitboard.Bitboard, "to_board", "board_copies"),
+    (GessBitboard.RingIndex, "copy", "board_copies"),
+    (GessGame.GamePiece, "__init__", "game_pieces"),
+    (GessGame.GessGame, "push_move", "push_move"),
+    (GessGame.GessGame, "pop_move", "pop_move"),
+    (GessGame.GessGame, "generate_moves", "generate_moves"),
+) + tuple((GessGame.Move, name, "move_steps")
+          for name in ("up_left", "up", "up_right", "left", "right",
+                       "down_left", "down", "down_right"))
+
+# (owner, attribute, phase) for every timed function. Phases are timed
+# inclusively, so the ring check is also part of apply, and every phase is part
+# of make_move.
+_TIMED = (
+    (GessGame.GessGame, "make_move", "make_move"),
+    (GessGame.GessGame, "_check_bounds", "bounds"),
+    (GessGame.GessGame, "_check_piece", "piece"),
+    (GessBitboard.Bitboard, "slide_masks", "slide"),
+    (GessGame.GessGame, "_apply_move", "apply"),
+    (GessBitboard.RingIndex, "update", "ring_check"),
+)
+
+# Timed in the Pygame front end when it has been imported.
+_RENDER = (("BoardView", "draw"), ("BoardView", "refresh"), ("BoardView", "flip"))
+
+
+class Instrumentation:
+    """
+    The Instrumentation class holds counters and phase timings for the Gess
+    rules. Nothing is recorded until start is called, and stop puts every
+    wrapped function back.
+    """
+
+    def __init__(self):
+        """ Initializes empty counters and phase timings. """
+        self.counters = {}
+        self.phases = {}
+        self._originals = []
+        self.reset()
+
+    def reset(self):
+        """
+        Sets every counter and phase timing back to zero. The dictionaries are
+        changed in place, since the wrapped functions hold on to them.
+        """
+        for _, _, counter in _COUNTED:
+            self.counters[counter] = 0
+        for _, _, phase in _TIMED:
+            self.phases[phase] = [0, 0.0]
+        self.phases["render"] = [0, 0.0]
+
+    @property
+    def running(self):
+        """ Returns True while the instrumentation is recording. """
+        return bool(self._originals)
+
+    def start(self):
+        """ Starts recording by wrapping the counted and timed functions. """
+        if self.running:
+            raise RuntimeError("instrumentation is already running")
+
+        for owner, name, counter in _COUNTED:
+            self._wrap(owner, name, self._counted(getattr(owner, name), counter))
+        for owner, name, phase in _TIMED:
+            self._wrap(owner, name, self._timed(getattr(owner, name), phase))
+
+        gui = sys.modules.get("GessGui")
+        if gui is not None:
+            for class_name, name in _RENDER:
+                owner = getattr(gui, class_name)
+                self._wrap(owner, name, self._timed(getattr(owner, name), "render"))
+        return self
+
+    def stop(self):
+        """ Stops recording and puts back every wrapped function. """
+        while self._originals:
+            owner, name, original = self._originals.pop()
+            setattr(owner, name, original)
+
+    def __enter__(self):
+        if not self.running:
+            self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def _wrap(self, owner, name, wrapper):
+        """ Replaces the attribute of the owner with the wrapper and remembers the original. """
+        self._originals.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, wrapper)
+
+    def _counted(self, function, counter):
+        """ Returns a function that adds one to the counter and calls the given function. """
+        counters = self.counters
+
+        def counted(*args, **kwargs):
+            counters[counter] += 1
+            return function(*args, **kwargs)
+
+        counted.__name__ = function.__name__
+        counted.__doc__ = function.__doc__
+        return counted
+
+    def _timed(self, function, phase):
+        """ Returns a function that calls the given function and adds its time to the phase. """
+        phases = self.phases
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                totals = phases[phase]
+                totals[0] += 1
+                totals[1] += clock() - start
+
+        timed.__name__ = function.__name__
+        timed.__doc__ = function.__doc__
+        return timed
+
+    def snapshot(self):
+        """
+        Returns a dictionary with a copy of the counters and, for every phase, the
+        number of calls and the total and mean time in seconds.
+        """
+        phases = {}
+        for phase, (calls, seconds) in self.phases.items():
+            phases[phase] = {"calls": calls, "seconds": seconds,
+                             "mean_seconds": seconds / calls if calls else 0.0}
+        return {"counters": dict(self.counters), "phases": phases}
+
+    def to_json(self, indent=None):
+        """ Returns the snapshot as a JSON string. """
+        return json.dumps(self.snapshot(), indent=indent, sort_keys=True)
+
+
+def instrument():
+    """
+    Returns a new Instrumentation that starts recording when it is used in a
+    with statement and stops at the end of it.
+    """
+    return Instrumentation()
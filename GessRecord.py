@@ -0,0 +1,375 @@
+# Description:  A compact binary record of Gess games.  A file is a fixed
+# header, then every game as a small game header followed by two bytes per ply,
+# then an index with the file offset of every game.  The reader maps the file
+# with mmap, so any game or ply of a multi-gigabyte archive is reached with two
+# lookups and nothing is parsed until it is read.  Records can be exported as
+# text, one numbered line per turn.
+#
+# Usage:  python GessRecord.py pack games.jsonl -o games.gessrec
+#         python GessRecord.py text games.gessrec [--game 12] [-o games.txt]
+#         python GessRecord.py info games.gessrec
+#
+# Layout, all little endian:
+#     header  8s magic, H version, B board size, 5 reserved bytes,
+#             Q number of games, Q file offset of the index         32 bytes
+#     game    I plies, B game state (index in GAME_STATES), 3 reserved bytes,
+#             then one H move code per ply                           8 + 2n bytes
+#     index   Q file offset of every game, in order                  8 bytes per game
+#
+# A move code packs the center the piece starts on, the direction and the
+# number of squares it slides. Both centers of a move are inside the edge rows,
+# so on the standard board there are 18 * 18 * 8 * 17 = 44064 codes.
+
+import argparse
+import json
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+
+from GessAnalyze import read_lines
+from GessBitboard import DIRECTIONS, SIZE
+from GessGame import GAME_STATES, GessGame
+
+MAGIC = b"GESSREC\0"
+VERSION = 1
+SUFFIX = ".gessrec"
+
+_HEADER = struct.Struct("<8sHB5xQQ")
+_GAME = struct.Struct("<IB3x")
+_OFFSET = struct.Struct("<Q")
+_CODE = struct.Struct("<H")
+
+
+class MoveCodec:
+    """
+    The MoveCodec class turns the moves of a board of one size into two-byte
+    codes and back. Only straight and diagonal slides between centers inside the
+    edge rows have a code, which every legal move is. There are few enough that
+    both ways are kept as tables.
+    """
+
+    def __init__(self, size=SIZE):
+        """ Takes as an optional parameter the number of rows and columns of the board. """
+        self.size = size
+        self._inner = size - 2
+        self._longest = size - 3
+        codes = self._inner * self._inner * 8 * self._longest
+        if size < 5 or codes > 1 << 16:
+            raise ValueError("moves of a %dx%d board do not fit in two bytes" % (size, size))
+        self._moves = [self._decode(code) for code in range(codes)]
+        self._codes = {move: code for code, move in enumerate(self._moves)
+                       if 0 < move[2] <= self._inner and 0 < move[3] <= self._inner}
+
+    def encode(self, x1, y1, x2, y2):
+        """ Returns the code of the move. Raises ValueError if the move has no code. """
+        code = self._codes.get((x1, y1, x2, y2))
+        if code is not None:
+            return code
+        inner = self._inner
+        if not (0 < x1 <= inner and 0 < y1 <= inner and 0 < x2 <= inner and 0 < y2 <= inner):
+            raise ValueError("move %r leaves the centers of the board" % ((x1, y1, x2, y2),))
+        dx, dy = x2 - x1, y2 - y1
+        distance = max(abs(dx), abs(dy))
+        if not distance or (dx and dy and abs(dx) != abs(dy)):
+            raise ValueError("move %r is not a straight or diagonal slide" % ((x1, y1, x2, y2),))
+        direction = DIRECTIONS.index(((dx > 0) - (dx < 0), (dy > 0) - (dy < 0)))
+        start = (y1 - 1) * inner + x1 - 1
+        return (start * 8 + direction) * self._longest + distance - 1
+
+    def codes(self, moves):
+        """ Returns the list of codes of the moves. Raises ValueError if a move has no code. """
+        table = self._codes
+        try:
+            return [table[move] for move in moves]
+        except (KeyError, TypeError):
+            return [self.encode(*move) for move in moves]
+
+    def decode(self, code):
+        """ Returns the (x1, y1, x2, y2) move of the code. """
+        return self._moves[code]
+
+    def decode_all(self, codes):
+        """ Returns the list of moves of the codes. """
+        table = self._moves
+        return [table[code] for code in codes]
+
+    def _decode(self, code):
+        """ Works out the move of the code from its parts. """
+        rest, distance = divmod(code, self._longest)
+        start, direction = divmod(rest, 8)
+        y1, x1 = divmod(start, self._inner)
+        x1 += 1
+        y1 += 1
+        dx, dy = DIRECTIONS[direction]
+        distance += 1
+        return (x1, y1, x1 + dx * distance, y1 + dy * distance)
+
+
+class RecordWriter:
+    """
+    The RecordWriter class writes games to a new record file one at a time. The
+    offsets of the games are kept in a temporary file, so memory stays flat
+    however many games are written. The index and the header are written by
+    close, and a file that was not closed cannot be read.
+    """
+
+    def __init__(self, path, size=SIZE):
+        """ Takes as parameters the path of the file to write and the board size. """
+        self._codec = MoveCodec(size)
+        self.size = size
+        self.games = 0
+        self._file = open(path, "wb")
+        self._offsets = tempfile.TemporaryFile()
+        self._file.write(_HEADER.pack(MAGIC, VERSION, size, 0, 0))
+        self._position = _HEADER.size
+
+    def add(self, moves, game_state="UNFINISHED"):
+        """
+        Takes as parameters an iterable of (x1, y1, x2, y2) moves and the final
+        game state. Writes the game and returns its number. Raises ValueError if
+        a move has no code, in which case nothing is written.
+        """
+        if game_state not in GAME_STATES:
+            raise ValueError("unknown game state %r" % (game_state,))
+        codes = self._codec.codes(list(moves))
+        data = (_GAME.pack(len(codes), GAME_STATES.index(game_state))
+                + struct.pack("<%dH" % len(codes), *codes))
+        self._file.write(data)
+        self._offsets.write(_OFFSET.pack(self._position))
+        self._position += len(data)
+        self.games += 1
+        return self.games - 1
+
+    def add_game(self, game):
+        """
+        Writes the moves and the state of a GessGame and returns the game number.
+        Raises ValueError if the game is not the record's board size or if its
+        moves do not start from the starting position, which readers replay
+        them from.
+        """
+        if game.get_size() != self.size:
+            raise ValueError("the record is for a %dx%d board, not %dx%d" % (
+                self.size, self.size, game.get_size(), game.get_size()))
+        if not game.is_replayable():
+            raise ValueError("the game's moves do not start from the starting position")
+        return self.add(game.get_move_history(), game.get_game_state())
+
+    def close(self):
+        """ Writes the index and the header and closes the file. """
+        if self._file.closed:
+            return
+        self._offsets.seek(0)
+        shutil.copyfileobj(self._offsets, self._file)
+        self._offsets.close()
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, self.size, self.games, self._position))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+class RecordReader:
+    """
+    The RecordReader class reads a record file through a read-only memory map.
+    Games are numbered from 0 and negative numbers count from the end. Finding
+    a game or a ply reads a fixed number of bytes at known offsets, and only the
+    pages that are touched are loaded from disk.
+    """
+
+    def __init__(self, path):
+        """ Takes as a parameter the path of a record file. Raises ValueError if it is not one. """
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("%s is empty" % path)
+
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError("%s is not a Gess record" % path)
+        magic, version, size, games, index = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("%s is not a Gess record" % path)
+        if version != VERSION:
+            self.close()
+            raise ValueError("%s has record version %d, not %d" % (path, version, VERSION))
+        if not index or index + games * _OFFSET.size > len(self._map):
+            self.close()
+            raise ValueError("%s was not closed or is truncated" % path)
+
+        self.size = size
+        self.games = games
+        self._codec = MoveCodec(size)
+        self._index = index
+
+    def __len__(self):
+        return self.games
+
+    def _offset(self, game):
+        """ Returns the file offset of the game header. Raises IndexError for a missing game. """
+        if game < 0:
+            game += self.games
+        if not 0 <= game < self.games:
+            raise IndexError("game %d is not in the record" % game)
+        return _OFFSET.unpack_from(self._map, self._index + game * _OFFSET.size)[0]
+
+    def plies(self, game):
+        """ Returns the number of plies of the game. """
+        return _GAME.unpack_from(self._map, self._offset(game))[0]
+
+    def game_state(self, game):
+        """ Returns the final state of the game, as in GessGame.get_game_state. """
+        return GAME_STATES[_GAME.unpack_from(self._map, self._offset(game))[1]]
+
+    def move(self, game, ply):
+        """ Returns the move made at the given ply of the game, counting from 0. """
+        offset = self._offset(game)
+        plies = _GAME.unpack_from(self._map, offset)[0]
+        if ply < 0:
+            ply += plies
+        if not 0 <= ply < plies:
+            raise IndexError("game %d has no ply %d" % (game, ply))
+        code = _CODE.unpack_from(self._map, offset + _GAME.size + ply * _CODE.size)[0]
+        return self._codec.decode(code)
+
+    def moves(self, game):
+        """ Returns the list of moves of the game. """
+        offset = self._offset(game)
+        plies = _GAME.unpack_from(self._map, offset)[0]
+        return self._codec.decode_all(struct.unpack_from("<%dH" % plies, self._map,
+                                                         offset + _GAME.size))
+
+    def position(self, game, ply=None):
+        """
+        Returns a GessGame after the first ply moves of the game, or after every
+        move if ply is None. Raises ValueError if a move is illegal.
+        """
+        moves = self.moves(game)
+        result = GessGame(self.size)
+        for move in moves[:ply]:
+            if not result.push_move(*move):
+                raise ValueError("game %d has an illegal move %r" % (game, move))
+        return result
+
+    def __getitem__(self, game):
+        return self.moves(game)
+
+    def __iter__(self):
+        for game in range(self.games):
+            yield self.moves(game)
+
+    def close(self):
+        """ Unmaps and closes the file. """
+        if getattr(self, "_map", None) is not None and not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def format_move(move):
+    """ Returns the move as text, such as "2,2-2,5". """
+    return "%d,%d-%d,%d" % move
+
+
+def write_text(reader, output, games=None):
+    """
+    Takes as parameters a RecordReader, a text file object and optionally a list
+    of game numbers. Writes every game, or the listed ones, as a short header
+    and one numbered line per turn with the black and the white move.
+    """
+    for game in range(len(reader)) if games is None else games:
+        moves = reader.moves(game)
+        output.write("[Game %d]\n[Result %s]\n[Plies %d]\n" % (
+            game % len(reader), reader.game_state(game), len(moves)))
+        for turn in range(0, len(moves), 2):
+            output.write("%d. %s\n" % (turn // 2 + 1,
+                                       " ".join(format_move(move) for move in moves[turn:turn + 2])))
+        output.write("\n")
+
+
+def _replayed_state(moves):
+    """ Replays the moves and returns the final game state. Raises ValueError for an illegal move. """
+    game = GessGame()
+    for move in moves:
+        if not game.push_move(*move):
+            raise ValueError("illegal move %r" % (move,))
+    return game.get_game_state()
+
+
+def pack(paths, path):
+    """
+    Takes as parameters a list of JSON lines archives, in the format read by
+    GessAnalyze, and the path of the record to write. Games without a result are
+    replayed to find it. Returns the number of games written and the number of
+    lines that could not be packed.
+    """
+    errors = 0
+    with RecordWriter(path) as writer:
+        for line in read_lines(paths):
+            try:
+                record = json.loads(line)
+                game_state = None
+                if isinstance(record, dict):
+                    game_state = record.get("result")
+                    record = record.get("moves")
+                if not isinstance(record, list):
+                    raise ValueError("expected a list of moves")
+                moves = [tuple(move) for move in record]
+                writer.add(moves, game_state or _replayed_state(moves))
+            except (ValueError, TypeError):
+                errors += 1
+        return writer.games, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack, read and export binary Gess game records.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack_parser = commands.add_parser("pack", help="pack JSON lines archives into a record")
+    pack_parser.add_argument("archives", nargs="+", help="JSON lines files, .gz allowed, - for stdin")
+    pack_parser.add_argument("-o", "--output", required=True, help="record file to write")
+    text_parser = commands.add_parser("text", help="export a record as text")
+    text_parser.add_argument("record", help="record file to read")
+    text_parser.add_argument("--game", type=int, action="append", help="game to export, repeatable")
+    text_parser.add_argument("-o", "--output", default="-", help="text file to write, - for stdout")
+    info_parser = commands.add_parser("info", help="summarize a record")
+    info_parser.add_argument("record", help="record file to read")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "pack":
+            games, errors = pack(args.archives, args.output)
+            print("%d games packed, %d lines skipped" % (games, errors))
+            return
+
+        with RecordReader(args.record) as reader:
+            if args.command == "text":
+                if args.output == "-":
+                    write_text(reader, sys.stdout, args.game)
+                else:
+                    with open(args.output, "w") as output:
+                        write_text(reader, output, args.game)
+            else:
+                plies = sum(reader.plies(game) for game in range(len(reader)))
+                print("%d games, %d plies on a %dx%d board" % (len(reader), plies,
+                                                              reader.size, reader.size))
+    except (OSError, ValueError, IndexError) as error:
+        parser.error(str(error))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# Description:  Renders recorded Gess games without a window, as one PNG frame per
+# ply or as an animated GIF, for the replay gallery and the README images.
+# Pygame runs on the dummy SDL video driver, the GessGui BoardView draws on an
+# offscreen surface, and the background, stones and status text are rendered
+# once per process and blitted.  After the first frame of a game only the
+# squares a move changed are redrawn.  Games are handed to a process pool in
+# chunks, with a bounded number of chunks in flight, like GessAnalyze.
+#
+# Usage:  python GessRender.py games.jsonl -o gallery [--gif] [-w 4] [--scale 0.5]
+#
+# The archive is a JSON lines file in the format read by GessAnalyze. Animated
+# GIFs need Pillow. PNG frames only need Pygame, but encoding them is most of
+# the cost of a frame, and Pillow writes them about twice as fast with a
+# lighter compression level.
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# The video driver is read when the display starts, so it is set before Pygame
+# is imported. A driver chosen by the caller is left alone.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from GessAnalyze import parse_moves, read_lines
+from GessGame import GessGame
+from GessGui import SCREEN_SIZE, BoardView
+
+# The time each GIF frame is shown, and how long the final position is held.
+FRAME_MS = 400
+FINAL_MS = 2000
+
+# The number of colors in a GIF palette.
+GIF_COLORS = 64
+
+# The zlib level of PNG frames written with Pillow. The bamboo background
+# barely compresses, so higher levels cost time for almost no space.
+PNG_COMPRESSION = 1
+
+
+def start_display():
+    """
+    Starts the Pygame display on a 1x1 offscreen window, which the images must
+    be converted for, and the font module.
+    """
+    if not pygame.display.get_init():
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+    if not pygame.font.get_init():
+        pygame.font.init()
+
+
+class FrameRenderer:
+    """
+    The FrameRenderer class draws the positions of recorded games on one
+    offscreen surface, which is reused for every frame of every game. Making a
+    FrameRenderer starts the display and renders the background and stones.
+    """
+
+    def __init__(self, scale=1.0):
+        """ Takes as an optional parameter the size of the frames relative to the window. """
+        if scale <= 0:
+            raise ValueError("scale must be positive, not %r" % (scale,))
+        start_display()
+        self.scale = scale
+        self._surface = pygame.Surface(SCREEN_SIZE).convert()
+        self._view = BoardView(GessGame(), self._surface)
+        self._size = (max(1, round(SCREEN_SIZE[0] * scale)), max(1, round(SCREEN_SIZE[1] * scale)))
+
+    def frames(self, moves):
+        """
+        Takes as a parameter an iterable of (x1, y1, x2, y2) moves. Yields a
+        surface with the starting position and then one after every move. The
+        same surface is redrawn for the next frame, so each frame must be saved
+        before the next is taken. Raises ValueError at the first illegal move.
+        """
+        game = GessGame()
+        view = self._view
+        view.set_game(game)
+        yield self._frame()
+        for move in moves:
+            if len(move) != 4 or not game.push_move(*move):
+                raise ValueError("ply %d has an illegal move %r"
+                                 % (game.get_ply_count() + 1, tuple(move)))
+            view.refresh()
+            yield self._frame()
+
+    def _frame(self):
+        """ Returns the surface of the current frame at the requested size. """
+        self._view.changed()
+        if self._size == SCREEN_SIZE:
+            return self._surface
+        return pygame.transform.smoothscale(self._surface, self._size)
+
+    def save_pngs(self, moves, directory):
+        """
+        Takes as parameters the moves of a game and a directory, which is made if
+        needed. Writes ply0000.png for the starting position and one file per
+        move after it. Returns the number of frames written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        frames = 0
+        for frame in self.frames(moves):
+            path = os.path.join(directory, "ply%04d.png" % frames)
+            if Image is None:
+                pygame.image.save(frame, path)
+            else:
+                _to_image(frame).save(path, compress_level=PNG_COMPRESSION)
+            frames += 1
+        return frames
+
+    def save_gif(self, moves, path, frame_ms=FRAME_MS, final_ms=FINAL_MS):
+        """
+        Takes as parameters the moves of a game, the path of the GIF to write,
+        and optionally the milliseconds each frame and the final position are
+        shown. Every frame uses the palette of the first one, which is much
+        faster than choosing a palette per frame. Returns the number of frames.
+        """
+        if Image is None:
+            raise ImportError("animated GIFs need Pillow")
+
+        images = []
+        palette = None
+        for frame in self.frames(moves):
+            image = _to_image(frame)
+            if palette is None:
+                palette = image.quantize(GIF_COLORS)
+            images.append(image.quantize(palette=palette, dither=0))
+
+        durations = [frame_ms] * len(images)
+        durations[-1] = final_ms
+        images[0].save(path, save_all=True, append_images=images[1:], duration=durations,
+                       loop=0, optimize=False)
+        return len(images)
+
+
+def _to_image(surface):
+    """ Returns a Pillow RGB image with a copy of the pixels of the surface. """
+    return Image.frombytes("RGB", surface.get_size(), pygame.image.tostring(surface, "RGB"))
+
+
+# The FrameRenderer of a worker process, made once by _start_worker.
+_renderer = None
+
+
+def _start_worker(scale):
+    """ Makes the FrameRenderer of a worker process. """
+    global _renderer
+    _renderer = FrameRenderer(scale)
+
+
+def render_lines(numbered_lines, directory, gif=False, scale=1.0):
+    """
+    Takes as parameters a list of (game number, archive line) pairs, the output
+    directory, whether to write GIFs instead of PNG frames and the frame scale.
+    Renders every game and returns (games, frames, errors). Lines that are not
+    games are counted as errors.
+    """
+    global _renderer
+    if _renderer is None or _renderer.scale != scale:
+        _renderer = FrameRenderer(scale)
+
+    games = frames = errors = 0
+    for number, line in numbered_lines:
+        name = os.path.join(directory, "game%06d" % number)
+        try:
+            moves = parse_moves(line)
+            if gif:
+                frames += _renderer.save_gif(moves, name + ".gif")
+            else:
+                frames += _renderer.save_pngs(moves, name)
+        except (ValueError, TypeError):
+            errors += 1
+            continue
+        games += 1
+    return games, frames, errors
+
+
+def _chunks(lines, size, first=0, limit=None):
+    """
+    Yields lists of up to size (game number, line) pairs, skipping the games
+    before first and stopping after limit games.
+    """
+    chunk = []
+    for number, line in enumerate(lines):
+        if number < first:
+            continue
+        if limit is not None and number >= first + limit:
+            break
+        chunk.append((number, line))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render(paths, directory, gif=False, scale=1.0, workers=None, chunk_size=10,
+           first=0, limit=None, progress=None):
+    """
+    Takes as parameters a list of archive paths and the output directory, and
+    optionally whether to write GIFs, the frame scale, the number of worker
+    processes, the number of games per chunk, the first game and the number of
+    games to render, and a function called with the number of frames so far.
+    Returns (games, frames, errors) and the time taken in seconds.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(directory, exist_ok=True)
+    totals = [0, 0, 0]
+    start = time.perf_counter()
+    chunks = _chunks(read_lines(paths), chunk_size, first, limit)
+
+    def add(result):
+        for number, value in enumerate(result):
+            totals[number] += value
+        if progress is not None:
+            progress(totals[1])
+
+    if workers == 1:
+        for chunk in chunks:
+            add(render_lines(chunk, directory, gif, scale))
+        return tuple(totals), time.perf_counter() - start
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(scale,)) as executor:
+        pending = set()
+        exhausted = False
+        while not exhausted or pending:
+            # Keep a bounded number of chunks in flight so memory stays flat.
+            while not exhausted and len(pending) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending.add(executor.submit(render_lines, chunk, directory, gif, scale))
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                add(future.result())
+
+    return tuple(totals), time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render recorded Gess games to PNG frames or GIFs.")
+    parser.add_argument("archives", nargs="+", help="JSON lines files, .gz allowed, - for stdin")
+    parser.add_argument("-o", "--output", default="frames", help="directory to write the images to")
+    parser.add_argument("--gif", action="store_true", help="write one animated GIF per game")
+    parser.add_argument("--scale", type=float, default=1.0, help="frame size relative to the window")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--chunk", type=int, default=10, help="games sent to a worker at a time")
+    parser.add_argument("--first", type=int, default=0, help="number of the first game to render")
+    parser.add_argument("-n", "--games", type=int, default=None, help="number of games to render")
+    args = parser.parse_args(argv)
+
+    if args.scale <= 0:
+        parser.error("--scale must be positive")
+    try:
+        (games, frames, errors), seconds = render(
+            args.archives, args.output, args.gif, args.scale, args.workers, args.chunk,
+            args.first, args.games)
+    except OSError as error:
+        parser.error(str(error))
+    except ImportError as error:
+        parser.error(str(error))
+
+    print("%d games, %d frames in %.1f s: %.0f frames/min" % (
+        games, frames, seconds, frames / seconds * 60 if seconds > 0 else 0.0))
+    if errors:
+        print("unreadable lines %d" % errors, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# Description:  A computer opponent for the Gess Game.  Searches the game tree
+# with negamax alpha-beta on top of GessGame.push_move and pop_move, deepening
+# one ply at a time until a wall clock or node budget runs out.  Moves are
+# ordered with the transposition table move first, then captures, then killer
+# moves and the history heuristic.
+
+import time
+
+from GessBitboard import count
+from GessHash import EXACT, LOWER, UPPER, TranspositionTable
+
+# Scores are from the point of view of the player to move.
+WIN = 1000000
+RING_VALUE = 1000
+STONE_VALUE = 10
+
+# Wins found within this many plies of the root are scored as WIN - ply.
+_WIN_BOUND = WIN - 1000
+
+# How many nodes to search between clock checks.
+_CHECK_INTERVAL = 256
+
+
+def evaluate(game):
+    """
+    Takes as a parameter a GessGame. Returns a score for the player to move that
+    rewards having more rings and stones than the opponent.
+    """
+    player = game.get_current_player()
+    opponent = "o" if player == "x" else "x"
+    bitboard = game.get_bitboard()
+    return (RING_VALUE * (game.get_ring_count(player) - game.get_ring_count(opponent))
+            + STONE_VALUE * (count(bitboard.stones(player)) - count(bitboard.stones(opponent))))
+
+
+class SearchResult:
+    """
+    The SearchResult class holds the outcome of a search: the best move, its
+    score, the principal variation, the depth of the last completed iteration,
+    the number of nodes searched and the time taken.
+    """
+
+    def __init__(self, move, score, pv, depth, nodes, seconds):
+        """ Takes as parameters and initializes the outcome of a search. """
+        self.move = move
+        self.score = score
+        self.pv = pv
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+    @property
+    def nps(self):
+        """ Returns the number of nodes searched per second. """
+        if self.seconds <= 0:
+            return 0.0
+        return self.nodes / self.seconds
+
+    def __repr__(self):
+        return ("SearchResult(move=%r, score=%d, depth=%d, nodes=%d, nps=%.0f, pv=%r)"
+                % (self.move, self.score, self.depth, self.nodes, self.nps, self.pv))
+
+
+class Searcher:
+    """
+    The Searcher class runs an iterative deepening negamax alpha-beta search on a
+    GessGame. It keeps its transposition table and history scores between
+    searches, so one Searcher can play a whole game.
+    """
+
+    def __init__(self, table=None, evaluator=None):
+        """
+        Takes as optional parameters the TranspositionTable to use and an
+        incremental evaluator, such as GessEval.IncrementalEvaluator, to score the
+        leaves with instead of evaluate. A new table is created if none is given.
+        """
+        self.table = table if table is not None else TranspositionTable()
+        self.evaluator = evaluator
+        self._evaluate = evaluate if evaluator is None else evaluator.evaluate
+        self._history = {}
+        self._killers = []
+        self._game = None
+        self._nodes = 0
+        self._deadline = None
+        self._node_limit = None
+        self._stop = None
+        self._stopped = False
+        self._seen = {}
+
+    def search(self, game, time_ms=1000, max_depth=64, node_limit=None, root_moves=None,
+               stop=None):
+        """
+        Takes as parameters a GessGame, the time budget in milliseconds, and
+        optionally the deepest iteration, a node budget, the root moves in the
+        order to try them when nothing else ranks them, of which any that are not
+        legal are left out, and a function that
+        returns True when the search should stop early. Searches from the
+        current position and returns a SearchResult. The game is left as it was.
+        """
+        start = time.perf_counter()
+        self._game = game
+        self._nodes = 0
+        self._deadline = start + time_ms / 1000 if time_ms is not None else None
+        self._node_limit = node_limit
+        self._stop = stop
+        self._stopped = False
+        self._killers = [[None, None] for _ in range(max_depth + 1)]
+        self.table.new_search()
+
+        # Positions earlier in the game count as repetitions in the search.
+        self._seen = {}
+        for position_hash in game.get_hash_history():
+            self._seen[position_hash] = self._seen.get(position_hash, 0) + 1
+
+        # The evaluator follows the search's moves while it is attached to the game.
+        attached = game.get_evaluator()
+        if self.evaluator is not None and attached is not self.evaluator:
+            game.set_evaluator(self.evaluator)
+        try:
+            return self._deepen(game, start, max_depth, root_moves)
+        finally:
+            if game.get_evaluator() is not attached:
+                game.set_evaluator(attached)
+
+    def _deepen(self, game, start, max_depth, root_moves):
+        """ Runs the iterative deepening loop of search and returns its SearchResult. """
+        moves = game.generate_moves()
+        if root_moves is not None:
+            # Keep the caller's order, but only the moves that are legal here.
+            legal = set(moves)
+            moves = [tuple(move) for move in root_moves if tuple(move) in legal]
+        if not moves:
+            return SearchResult(None, self._evaluate(game), [], 0, 0, time.perf_counter() - start)
+
+        best = SearchResult(moves[0], 0, [moves[0]], 0, 0, 0.0)
+        for depth in range(1, max_depth + 1):
+            score, move = self._root(depth, moves)
+            if self._stopped:
+                break
+            best = SearchResult(move, score, self._principal_variation(depth), depth,
+                                self._nodes, time.perf_counter() - start)
+
+            # Stop once a forced win or loss is found.
+            if abs(score) >= _WIN_BOUND:
+                break
+
+        best.nodes = self._nodes
+        best.seconds = time.perf_counter() - start
+        return best
+
+    def _out_of_budget(self):
+        """ Returns True once the time or node budget has run out. """
+        if self._node_limit is not None and self._nodes >= self._node_limit:
+            self._stopped = True
+        elif self._deadline is not None and time.perf_counter() >= self._deadline:
+            self._stopped = True
+        elif self._stop is not None and self._stop():
+            self._stopped = True
+        return self._stopped
+
+    def _order(self, moves, ply, table_move):
+        """
+        Returns the moves sorted with the transposition table move first, then
+        captures with the most opposing stones, then killer moves, then by history
+        score.
+        """
+        game = self._game
+        bitboard = game.get_bitboard()
+        occupied = bitboard.black | bitboard.white
+        enemy = bitboard.stones("o" if game.get_current_player() == "x" else "x")
+        killers = self._killers[ply] if ply < len(self._killers) else (None, None)
+        history = self._history
+        geometry = bitboard.geometry
+        footprints, index = geometry.footprints, geometry.index
+
+        def score(move):
+            if move == table_move:
+                return 1 << 40
+            x1, y1, x2, y2 = move
+            landing = footprints[index(x2, y2)] & ~footprints[index(x1, y1)]
+            if occupied & landing:
+                return (1 << 30) + (count(enemy & landing) << 8) + count(occupied & landing)
+            if move == killers[0] or move == killers[1]:
+                return 1 << 29
+            return history.get(move, 0)
+
+        return sorted(moves, key=score, reverse=True)
+
+    def _root(self, depth, moves):
+        """
+        Searches every root move to the given depth. Returns the best score and
+        move. Moves are reordered so that the best move of this iteration is
+        searched first in the next one.
+        """
+        game = self._game
+        entry = self.table.probe(game.get_hash())
+        ordered = self._order(moves, 0, entry[4] if entry is not None else None)
+
+        alpha = -WIN - 1
+        beta = WIN + 1
+        best_move = ordered[0]
+        root_hash = game.get_hash()
+        self._seen[root_hash] = self._seen.get(root_hash, 0) + 1
+        for move in ordered:
+            if not game.push_move(*move):
+                continue
+            score = -self._negamax(depth - 1, 1, -beta, -alpha)
+            game.pop_move()
+            if self._stopped:
+                break
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self._seen[root_hash] -= 1
+
+        if not self._stopped:
+            self.table.store(game.get_hash(), depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax(self, depth, ply, alpha, beta):
+        """
+        Returns the score of the current position for the player to move, searched
+        to the given depth within the (alpha, beta) window.
+        """
+        self._nodes += 1
+        if self._nodes % _CHECK_INTERVAL == 0 and self._out_of_budget():
+            return 0
+
+        game = self._game
+
+        # The player to move has lost if the game is over.
+        if game.get_game_state() != "UNFINISHED":
+            return -(WIN - ply)
+
+        position_hash = game.get_hash()
+        if self._seen.get(position_hash):
+            return 0
+
+        if depth <= 0:
+            return self._evaluate(game)
+
+        original_alpha = alpha
+        table_move = None
+        entry = self.table.probe(position_hash)
+        if entry is not None:
+            table_move = entry[4]
+            if entry[1] >= depth:
+                value = entry[2]
+                if value >= _WIN_BOUND:
+                    value -= ply
+                elif value <= -_WIN_BOUND:
+                    value += ply
+                flag = entry[3]
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value >= beta:
+                    return value
+                if flag == UPPER and value <= alpha:
+                    return value
+
+        moves = game.generate_moves()
+        if not moves:
+            return 0
+
+        self._seen[position_hash] = 1
+        best_score = -WIN - 1
+        best_move = None
+        for move in self._order(moves, ply, table_move):
+            if not game.push_move(*move):
+                continue
+            score = -self._negamax(depth - 1, ply + 1, -beta, -alpha)
+            game.pop_move()
+            if self._stopped:
+                break
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self._record_cutoff(move, ply, depth)
+                break
+        del self._seen[position_hash]
+
+        if self._stopped:
+            return 0
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        value = best_score
+        if value >= _WIN_BOUND:
+            value += ply
+        elif value <= -_WIN_BOUND:
+            value -= ply
+        self.table.store(position_hash, depth, value, flag, best_move)
+        return best_score
+
+    def _record_cutoff(self, move, ply, depth):
+        """ Updates the killer moves and history scores for a quiet move that caused a cutoff. """
+        x1, y1, x2, y2 = move
+        bitboard = self._game.get_bitboard()
+        footprints, index = bitboard.geometry.footprints, bitboard.geometry.index
+        if (bitboard.black | bitboard.white) & footprints[index(x2, y2)] & ~footprints[index(x1, y1)]:
+            return
+        if ply < len(self._killers):
+            killers = self._killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self._history[move] = self._history.get(move, 0) + depth * depth
+
+    def _principal_variation(self, depth):
+        """ Returns the principal variation by following the best moves in the table. """
+        game = self._game
+        pv = []
+        seen = set()
+        while len(pv) < depth:
+            entry = self.table.probe(game.get_hash())
+            if entry is None or entry[4] is None or game.get_hash() in seen:
+                break
+            seen.add(game.get_hash())
+            if not game.push_move(*entry[4]):
+                break
+            pv.append(entry[4])
+        for _ in pv:
+            game.pop_move()
+        return pv
+
+
+def best_move(game, time_ms=1000, max_depth=64, node_limit=None, table=None):
+    """
+    Takes as parameters a GessGame, the time budget in milliseconds, and optionally
+    the deepest iteration, a node budget and a TranspositionTable to reuse.
+    Returns a SearchResult with the best move found for the current player, its
+    score, the principal variation, the depth reached and the nodes per second.
+    """
+    return Searcher(table).search(game, time_ms, max_depth, node_limit)
@@ -0,0 +1,215 @@
+# Description:  Plays complete Gess games headlessly between configurable
+# players and streams every finished game to a JSON lines file as soon as it
+# completes.  Games are spread across a process pool.  Reports games per
+# second, the average number of plies and how often each side won.
+#
+# Usage:  python GessSelfPlay.py -n 1000 --black random --white greedy -o games.jsonl
+#
+# Players are "random", "greedy", "engine" (alpha-beta) or "mcts". The engine
+# players take an optional time budget in milliseconds, as in "engine:200".
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from GessGame import GessGame
+from GessSearch import Searcher, evaluate
+
+PLAYERS = ("random", "greedy", "engine", "mcts")
+
+
+class RandomPlayer:
+    """ The RandomPlayer class picks a legal move uniformly at random. """
+
+    def __init__(self, rng):
+        """ Takes as a parameter the random.Random to draw moves from. """
+        self._rng = rng
+
+    def choose(self, game):
+        """ Returns a random legal move for the current player, or None if there is none. """
+        moves = game.generate_moves()
+        if not moves:
+            return None
+        return self._rng.choice(moves)
+
+
+class GreedyPlayer:
+    """
+    The GreedyPlayer class looks one move ahead and picks the move with the best
+    evaluation, breaking ties at random.
+    """
+
+    def __init__(self, rng):
+        """ Takes as a parameter the random.Random used to break ties. """
+        self._rng = rng
+
+    def choose(self, game):
+        """ Returns the best looking legal move for the current player, or None. """
+        best_moves = []
+        best_score = None
+        for move in game.generate_moves():
+            game.push_move(*move)
+            # The evaluation is for the opponent, who is now to move.
+            if game.get_game_state() != "UNFINISHED":
+                score = float("inf")
+            else:
+                score = -evaluate(game)
+            game.pop_move()
+            if best_score is None or score > best_score:
+                best_moves = [move]
+                best_score = score
+            elif score == best_score:
+                best_moves.append(move)
+        if not best_moves:
+            return None
+        return self._rng.choice(best_moves)
+
+
+class EnginePlayer:
+    """ The EnginePlayer class picks moves with the alpha-beta search in GessSearch. """
+
+    def __init__(self, time_ms):
+        """ Takes as a parameter the time budget per move in milliseconds. """
+        self._searcher = Searcher()
+        self._time_ms = time_ms
+
+    def choose(self, game):
+        """ Returns the engine's move for the current player, or None. """
+        return self._searcher.search(game, self._time_ms).move
+
+
+class MctsSelfPlayer:
+    """ The MctsSelfPlayer class picks moves with a single-process GessMcts search. """
+
+    def __init__(self, time_ms, rng):
+        """ Takes as parameters the time budget per move and the random.Random to seed from. """
+        from GessMcts import MctsPlayer
+        self._player = MctsPlayer(time_ms=time_ms, seed=rng.getrandbits(64))
+
+    def choose(self, game):
+        """ Returns the most visited move for the current player, or None. """
+        return self._player.search(game).move
+
+
+def make_player(spec, rng):
+    """
+    Takes as parameters a player description such as "random" or "engine:200"
+    and a random.Random. Returns a player with a choose(game) method.
+    """
+    name, _, budget = spec.partition(":")
+    time_ms = int(budget) if budget else 100
+    if name == "random":
+        return RandomPlayer(rng)
+    if name == "greedy":
+        return GreedyPlayer(rng)
+    if name == "engine":
+        return EnginePlayer(time_ms)
+    if name == "mcts":
+        return MctsSelfPlayer(time_ms, rng)
+    raise ValueError("unknown player %r, expected one of %s" % (spec, ", ".join(PLAYERS)))
+
+
+def play_game(number, black, white, seed, max_plies):
+    """
+    Plays one complete game between the described black and white players.
+    Returns a dictionary with the game number, the players, the seed, the final
+    game state, the number of plies and the moves.
+    """
+    rng = random.Random(seed)
+    players = {"x": make_player(black, rng), "o": make_player(white, rng)}
+    game = GessGame()
+    while game.get_game_state() == "UNFINISHED" and game.get_ply_count() < max_plies:
+        move = players[game.get_current_player()].choose(game)
+        if move is None or not game.push_move(*move):
+            break
+
+    moves = game.get_move_history()
+    return {"game": number, "black": black, "white": white, "seed": seed,
+            "result": game.get_game_state(), "plies": len(moves),
+            "moves": [list(move) for move in moves]}
+
+
+def run(games, black, white, output, workers=None, seed=0, max_plies=400, progress=None):
+    """
+    Plays the given number of games on a process pool and writes each finished
+    game as one JSON line to the output file object as soon as it completes.
+    Returns a dictionary of statistics: games, seconds, games per second,
+    average plies and the number of games each side won or left unfinished.
+    """
+    # Check the players before starting any processes.
+    for spec in (black, white):
+        make_player(spec, random.Random(0))
+
+    workers = workers or os.cpu_count() or 1
+    results = {"BLACK_WON": 0, "WHITE_WON": 0, "UNFINISHED": 0}
+    total_plies = 0
+    finished = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        submitted = 0
+        while submitted < games or pending:
+            # Keep a bounded number of games in flight so memory stays flat.
+            while submitted < games and len(pending) < workers * 4:
+                pending.add(executor.submit(play_game, submitted, black, white,
+                                            seed * 1000003 + submitted, max_plies))
+                submitted += 1
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                output.write(json.dumps(record, separators=(",", ":")) + "\n")
+                output.flush()
+                results[record["result"]] += 1
+                total_plies += record["plies"]
+                finished += 1
+                if progress is not None:
+                    progress(finished, games)
+
+    seconds = time.perf_counter() - start
+    return {"games": finished, "seconds": seconds,
+            "games_per_second": finished / seconds if seconds > 0 else 0.0,
+            "average_plies": total_plies / finished if finished else 0.0,
+            "black_won": results["BLACK_WON"], "white_won": results["WHITE_WON"],
+            "unfinished": results["UNFINISHED"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Gess games headlessly.")
+    parser.add_argument("-n", "--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--black", default="random", help="black player: %s[:ms]" % "|".join(PLAYERS))
+    parser.add_argument("--white", default="random", help="white player: %s[:ms]" % "|".join(PLAYERS))
+    parser.add_argument("-o", "--output", default="-", help="JSON lines file to write, - for stdout")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="base random seed")
+    parser.add_argument("--max-plies", type=int, default=400, help="stop unfinished games after this many plies")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.output == "-":
+            stats = run(args.games, args.black, args.white, sys.stdout, args.workers,
+                        args.seed, args.max_plies)
+        else:
+            with open(args.output, "w") as output:
+                stats = run(args.games, args.black, args.white, output, args.workers,
+                            args.seed, args.max_plies)
+    except ValueError as error:
+        parser.error(str(error))
+
+    games = stats["games"] or 1
+    print("%d games in %.1f s: %.2f games/s, %.1f plies per game" % (
+        stats["games"], stats["seconds"], stats["games_per_second"], stats["average_plies"]),
+        file=sys.stderr)
+    print("BLACK_WON %d (%.1f%%)  WHITE_WON %d (%.1f%%)  UNFINISHED %d (%.1f%%)" % (
+        stats["black_won"], 100.0 * stats["black_won"] / games,
+        stats["white_won"], 100.0 * stats["white_won"] / games,
+        stats["unfinished"], 100.0 * stats["unfinished"] / games), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
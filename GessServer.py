@@ -0,0 +1,333 @@
+# Description:  An asyncio server that hosts many Gess games in one process.
+# Clients talk to it over TCP with a line protocol, one command per line, and
+# every reply is one line.  Moves are checked with GessGame.validate_move, which
+# neither prints nor draws, and every change is sent to the players and
+# spectators of the game.  Engine moves are searched in a process pool so they
+# never block the event loop.
+#
+# Usage:  python GessServer.py [--host 127.0.0.1] [--port 8765] [--workers N]
+#
+# Commands and replies:
+#   NEW                           GAME <id>
+#   JOIN <id> x|o|watch           JOINED <id> <role>
+#   MOVE <id> <x1> <y1> <x2> <y2> MOVED <id> <x1> <y1> <x2> <y2> <player> <state> <ply>
+#   ENGINE <id> [ms]              MOVED ... as for MOVE, ms is capped by the server
+#   BOARD <id>                    BOARD <id> <player> <state> <ply> <400 squares of . x o>
+#   LEAVE <id>                    LEFT <id>
+#   QUIT                          BYE
+# MOVED lines go to everyone who joined the game. Errors are ERROR <reason>, and
+# a rejected move gives ERROR invalid move <reason code from validate_move>.
+# A line over 64 KiB gives ERROR line too long and ends the connection, and a
+# client that stops reading is disconnected once MAX_BUFFERED bytes of MOVED
+# lines wait for it.
+# A game is dropped once the connection that created it and everyone who joined
+# it have left, by LEAVE or by disconnecting.
+
+import argparse
+import asyncio
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from GessGame import GessGame
+
+ROLES = ("x", "o", "watch")
+
+# The longest an ENGINE command may think, so one client cannot hold a worker.
+MAX_ENGINE_MS = 5000
+
+# The most bytes of broadcast lines the server keeps for a client that is not
+# reading them. A client past this is disconnected.
+MAX_BUFFERED = 1 << 20
+
+
+def _engine_move(position, history, time_ms):
+    """
+    Rebuilds the game from a Position and the hashes of the positions before it
+    in a worker process and returns the engine's move, or None if there is none.
+    """
+    from GessSearch import best_move
+
+    game = GessGame.from_position(position, history=history)
+    return best_move(game, time_ms).move
+
+
+class ProtocolError(Exception):
+    """ Raised for a command the server cannot carry out. The message is sent to the client. """
+
+
+class _Table:
+    """
+    The _Table class holds one hosted game with the connection that created it,
+    the connections in its seats and the connections watching it.
+    """
+
+    __slots__ = ("game", "creator", "seats", "watchers", "thinking")
+
+    def __init__(self, creator=None):
+        """ Takes as a parameter the connection that asked for the game and starts it. """
+        self.game = GessGame()
+        self.creator = creator
+        self.seats = {"x": None, "o": None}
+        self.watchers = set()
+        self.thinking = False
+
+    def members(self):
+        """ Returns the set of connections that joined the game. """
+        members = set(self.watchers)
+        for writer in self.seats.values():
+            if writer is not None:
+                members.add(writer)
+        return members
+
+
+class GessServer:
+    """
+    The GessServer class keeps many headless GessGame instances in memory and
+    serves them to clients over the line protocol described at the top of this
+    module.
+    """
+
+    def __init__(self, workers=None, engine_ms=200, max_engine_ms=MAX_ENGINE_MS):
+        """
+        Takes as optional parameters the number of engine worker processes, the
+        default engine time budget in milliseconds and the largest budget a
+        client may ask for.
+        """
+        self.games = {}
+        self.max_engine_ms = max_engine_ms
+        self.engine_ms = min(engine_ms, max_engine_ms)
+        self.moves = 0
+        self._ids = itertools.count(1)
+        self._joined = {}
+        self._workers = workers
+        self._executor = None
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """ Starts listening. Returns the asyncio server, whose sockets give the port. """
+        self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server
+
+    async def close(self):
+        """ Stops listening and shuts down the engine workers. """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+    async def _serve(self, reader, writer):
+        """ Reads commands from one connection until it quits or disconnects. """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # The rest of the line may still be coming, so the next
+                    # command cannot be found.
+                    writer.write(b"ERROR line too long\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                words = line.decode("ascii", "replace").split()
+                if not words:
+                    continue
+                command = words[0].upper()
+                if command == "QUIT":
+                    writer.write(b"BYE\n")
+                    break
+                try:
+                    reply = await self._dispatch(command, words[1:], writer)
+                except ProtocolError as error:
+                    reply = "ERROR %s" % error
+                if reply is not None:
+                    # Errors can quote the client's words, which may not be ASCII.
+                    writer.write(reply.encode("ascii", "replace") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._forget(writer)
+            writer.close()
+
+    async def _dispatch(self, command, arguments, writer):
+        """
+        Carries out one command for the connection. Returns the reply line, or
+        None if the reply was sent to everyone in the game.
+        """
+        if command == "NEW":
+            game_id = next(self._ids)
+            self.games[game_id] = _Table(writer)
+            self._joined.setdefault(writer, set()).add(game_id)
+            return "GAME %d" % game_id
+
+        if command == "JOIN":
+            table, game_id = self._table(arguments, 2)
+            role = arguments[1].lower()
+            if role not in ROLES:
+                raise ProtocolError("role must be x, o or watch")
+            if role == "watch":
+                table.watchers.add(writer)
+            elif table.seats[role] not in (None, writer):
+                raise ProtocolError("seat %s is taken" % role)
+            else:
+                table.seats[role] = writer
+            self._joined.setdefault(writer, set()).add(game_id)
+            return "JOINED %d %s" % (game_id, role)
+
+        if command == "MOVE":
+            table, game_id = self._table(arguments, 5)
+            try:
+                move = tuple(int(word) for word in arguments[1:5])
+            except ValueError:
+                raise ProtocolError("coordinates must be integers") from None
+            self._check_turn(table, writer)
+            self._play(table, game_id, move)
+            return None
+
+        if command == "ENGINE":
+            table, game_id = self._table(arguments, 1)
+            time_ms = self.engine_ms
+            if len(arguments) > 1:
+                try:
+                    time_ms = int(arguments[1])
+                except ValueError:
+                    raise ProtocolError("time must be an integer") from None
+                if time_ms <= 0:
+                    raise ProtocolError("time must be positive")
+                time_ms = min(time_ms, self.max_engine_ms)
+            self._check_turn(table, writer)
+            if table.thinking:
+                raise ProtocolError("engine is already thinking")
+
+            table.thinking = True
+            position = table.game.get_position()
+            ply = table.game.get_ply_count()
+            try:
+                move = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, _engine_move, position, table.game.get_hash_history(),
+                    time_ms)
+            finally:
+                table.thinking = False
+            if (self.games.get(game_id) is not table or table.game.get_ply_count() != ply
+                    or table.game.get_position() != position):
+                raise ProtocolError("game changed while the engine was thinking")
+            if move is None:
+                raise ProtocolError("no legal moves")
+            self._play(table, game_id, move)
+            return None
+
+        if command == "BOARD":
+            table, game_id = self._table(arguments, 1)
+            game = table.game
+            squares = "".join(square if square != " " else "."
+                              for row in game.get_board() for square in row)
+            return "BOARD %d %s %s %d %s" % (game_id, game.get_current_player(),
+                                            game.get_game_state(), game.get_ply_count(), squares)
+
+        if command == "LEAVE":
+            table, game_id = self._table(arguments, 1)
+            self._leave(game_id, writer)
+            self._joined.get(writer, set()).discard(game_id)
+            return "LEFT %d" % game_id
+
+        raise ProtocolError("unknown command %s" % command)
+
+    def _table(self, arguments, count):
+        """
+        Returns the table and id of the game named by the first argument, after
+        checking that there are at least count arguments.
+        """
+        if len(arguments) < count:
+            raise ProtocolError("expected %d arguments" % count)
+        try:
+            game_id = int(arguments[0])
+        except ValueError:
+            raise ProtocolError("game id must be an integer") from None
+        table = self.games.get(game_id)
+        if table is None:
+            raise ProtocolError("no game %d" % game_id)
+        return table, game_id
+
+    def _check_turn(self, table, writer):
+        """ Raises ProtocolError unless the connection holds the seat of the player to move. """
+        game = table.game
+        if game.get_game_state() != "UNFINISHED":
+            raise ProtocolError("game over %s" % game.get_game_state())
+        if table.seats[game.get_current_player()] is not writer:
+            raise ProtocolError("not your turn")
+
+    def _play(self, table, game_id, move):
+        """ Makes the move and sends the new state to everyone in the game. """
+        game = table.game
+        result = game.validate_move(*move)
+        if not result.valid:
+            raise ProtocolError("invalid move %s" % result.reason)
+        game.push_move(*move)
+        self.moves += 1
+        line = ("MOVED %d %d %d %d %d %s %s %d\n" % (
+            (game_id,) + tuple(move) + (game.get_current_player(), game.get_game_state(),
+                                        game.get_ply_count()))).encode("ascii")
+        for member in table.members():
+            member.write(line)
+            # The other members are not drained here, so one that stops reading
+            # is dropped rather than buffered without limit.
+            if member.transport.get_write_buffer_size() > MAX_BUFFERED:
+                member.transport.abort()
+
+    def _leave(self, game_id, writer):
+        """
+        Removes the connection from the creator, seats and watchers of the game,
+        and drops the game once nobody is left in it.
+        """
+        table = self.games.get(game_id)
+        if table is None:
+            return
+        if table.creator is writer:
+            table.creator = None
+        table.watchers.discard(writer)
+        for role, seated in table.seats.items():
+            if seated is writer:
+                table.seats[role] = None
+        if table.creator is None and not table.members():
+            del self.games[game_id]
+
+    def _forget(self, writer):
+        """ Removes a closed connection from every game it joined. """
+        for game_id in self._joined.pop(writer, ()):
+            self._leave(game_id, writer)
+
+
+async def serve(host, port, workers=None, engine_ms=200, max_engine_ms=MAX_ENGINE_MS):
+    """ Runs a GessServer on the given address until the task is cancelled. """
+    server = GessServer(workers, engine_ms, max_engine_ms)
+    listener = await server.start(host, port)
+    print("Serving Gess games on %s:%d" % listener.sockets[0].getsockname()[:2], flush=True)
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host Gess games over a line protocol.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="engine worker processes")
+    parser.add_argument("--engine-ms", type=int, default=200, help="default engine time per move")
+    parser.add_argument("--max-engine-ms", type=int, default=MAX_ENGINE_MS,
+                        help="longest engine time a client may ask for")
+    args = parser.parse_args(argv)
+    if args.engine_ms <= 0 or args.max_engine_ms <= 0:
+        parser.error("engine times must be positive")
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.engine_ms,
+                          args.max_engine_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
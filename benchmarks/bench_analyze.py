@@ -0,0 +1,52 @@
+# Description:  Measures how GessAnalyze scales with the number of worker
+# processes.  Writes an archive of random games, repeated to the requested
+# size, then analyzes it with 1, 2, 4, ... workers and reports games per second
+# and the peak memory of the main process, which should not grow with the
+# archive.
+#
+# Usage:  python benchmarks/bench_analyze.py [games] [max workers]
+
+import os
+import resource
+import sys
+import tempfile
+
+from positions import random_game
+
+from GessAnalyze import analyze
+
+
+def write_archive(path, games):
+    """ Writes the given number of games, cycling through 20 random games. """
+    lines = []
+    for seed in range(20):
+        moves = random_game(400, seed).get_move_history()
+        lines.append('{"moves":%s}\n' % [list(move) for move in moves])
+    with open(path, "w") as archive:
+        for number in range(games):
+            archive.write(lines[number % len(lines)].replace(" ", ""))
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "games.jsonl")
+        write_archive(path, games)
+        print("%d games, %.1f MB" % (games, os.path.getsize(path) / 1e6))
+
+        workers = 1
+        base = None
+        while workers <= limit:
+            stats, seconds = analyze([path], workers)
+            rate = stats.games / seconds
+            base = base or rate
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print("%2d workers  %8.1f games/s  %5.2fx  peak %.0f MB" % (
+                workers, rate, rate / base, peak))
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
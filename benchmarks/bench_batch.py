@@ -0,0 +1,95 @@
+# Description:  Times the batched ring and piece checks in GessBatch against the
+# scalar GessGame.check_ring and GamePiece.valid_piece on midgame positions, and
+# checks that both give the same answers.  Then replays random games with
+# generate_moves and push_move and checks the batched ring counts after every
+# move, and that every piece generate_moves moves is a valid batched piece.
+# Needs NumPy.
+#
+# Usage:  python benchmarks/bench_batch.py [boards] [games]
+
+import random
+import sys
+import time
+
+from positions import random_game
+
+import numpy as np
+
+import GessBatch
+from GessGame import GamePiece, GessGame
+
+
+def check_games(games, plies=200):
+    """
+    Plays seeded random games and checks GessBatch against the ring counts and
+    generated moves of GessGame at every position. Returns the positions checked.
+    """
+    bitboards = []
+    rings = []
+    starts = []
+    for seed in range(games):
+        rng = random.Random(seed)
+        game = GessGame()
+        for _ in range(plies):
+            moves = game.generate_moves()
+            bitboards.append(game.get_bitboard().copy())
+            rings.append((game.get_ring_count("x"), game.get_ring_count("o")))
+            starts.append((game.get_current_player(), {(x1, y1) for x1, y1, _, _ in moves}))
+            if not moves or not game.push_move(*rng.choice(moves)):
+                break
+
+    array = GessBatch.bitboards_to_array(bitboards)
+    black, white = GessBatch.ring_counts(array)
+    assert list(zip(black.tolist(), white.tolist())) == rings
+    piece_maps = {player: GessBatch.valid_piece_map(array, player) for player in ("x", "o")}
+    for number, (player, centres) in enumerate(starts):
+        piece_map = piece_maps[player][number]
+        assert all(piece_map[y - 1, x - 1] for x, y in centres)
+    return len(bitboards)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    replays = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    games = [random_game(seed % 60, seed) for seed in range(count)]
+    boards = [game.get_board() for game in games]
+    array = GessBatch.bitboards_to_array([game.get_bitboard() for game in games])
+    assert (array == GessBatch.boards_to_array(boards)).all()
+
+    checker = GessGame()
+    start = time.perf_counter()
+    scalar_rings = [checker.check_ring(board) for board in boards]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    black, white = GessBatch.check_rings(array)
+    batch_seconds = time.perf_counter() - start
+    assert [(bool(b), bool(w)) for b, w in zip(black, white)] == scalar_rings
+
+    print("%-12s %8s %12s %12s" % ("check", "boards", "scalar s", "batched s"))
+    print("%-12s %8d %12.4f %12.4f" % ("check_ring", count, scalar_seconds, batch_seconds))
+
+    rng = random.Random(0)
+    xs = np.array([rng.randint(1, 18) for _ in range(count)])
+    ys = np.array([rng.randint(1, 18) for _ in range(count)])
+    for player in ("x", "o"):
+        start = time.perf_counter()
+        scalar_valid = [GamePiece(board, player, x, y).valid_piece()
+                        for board, x, y in zip(boards, xs.tolist(), ys.tolist())]
+        scalar_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        valid = GessBatch.valid_pieces(array, player, xs, ys)
+        batch_seconds = time.perf_counter() - start
+        assert valid.tolist() == scalar_valid
+
+        piece_map = GessBatch.valid_piece_map(array, player)
+        assert piece_map[np.arange(count), ys - 1, xs - 1].tolist() == scalar_valid
+        print("%-12s %8d %12.4f %12.4f" % ("valid %s" % player, count, scalar_seconds, batch_seconds))
+
+    positions = check_games(replays)
+    print("%d positions of %d random games match generate_moves and push_move" % (positions, replays))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Description:  Measures GessHash.MoveCache.  Times generate_moves on midgame
+# positions without a cache, on the first visit with a cache and on a revisit,
+# then runs a fixed-depth search with and without a cache and reports the
+# cache counters.
+#
+# Usage:  python benchmarks/bench_cache.py [positions] [depth]
+
+import sys
+import time
+
+from positions import midgame_positions
+
+from GessHash import MoveCache
+from GessSearch import Searcher
+
+
+def time_moves(games):
+    """ Returns the seconds taken to generate the moves of every game once. """
+    start = time.perf_counter()
+    for game in games:
+        game.generate_moves()
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    games = midgame_positions(count)
+
+    uncached = time_moves(games)
+    cache = MoveCache()
+    for game in games:
+        game.set_move_cache(cache)
+    first = time_moves(games)
+    revisit = time_moves(games)
+    for name, seconds in (("no cache", uncached), ("first visit", first), ("revisit", revisit)):
+        print("generate_moves %-12s %8.1f us/position" % (name, seconds / count * 1e6))
+    print(cache.stats())
+
+    for cache in (None, MoveCache()):
+        games[0].set_move_cache(cache)
+        start = time.perf_counter()
+        result = Searcher().search(games[0], time_ms=None, max_depth=depth)
+        print("search depth %d %-9s %6.2f s  %d nodes" % (
+            depth, "cached" if cache else "uncached", time.perf_counter() - start, result.nodes))
+        if cache is not None:
+            print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
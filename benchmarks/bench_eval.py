@@ -0,0 +1,54 @@
+# Description:  Visits every legal move of midgame positions and scores each
+# one, first with an IncrementalEvaluator attached to the game and updated by
+# push_move, then by computing the same components from the whole board after
+# every move.  Checks that both give the same scores.
+#
+# Usage:  python benchmarks/bench_eval.py [positions]
+
+import sys
+import time
+
+from positions import midgame_positions
+
+from GessEval import IncrementalEvaluator
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    games = midgame_positions(count)
+    move_lists = [game.generate_moves() for game in games]
+    total = sum(len(moves) for moves in move_lists)
+
+    incremental = []
+    start = time.perf_counter()
+    for game, moves in zip(games, move_lists):
+        evaluator = IncrementalEvaluator()
+        game.set_evaluator(evaluator)
+        for move in moves:
+            game.push_move(*move)
+            incremental.append(evaluator.evaluate(game))
+            game.pop_move()
+        game.set_evaluator(None)
+    incremental_seconds = time.perf_counter() - start
+
+    full = []
+    evaluator = IncrementalEvaluator()
+    start = time.perf_counter()
+    for game, moves in zip(games, move_lists):
+        for move in moves:
+            game.push_move(*move)
+            game.set_evaluator(evaluator)
+            full.append(evaluator.evaluate(game))
+            game.set_evaluator(None)
+            game.pop_move()
+    full_seconds = time.perf_counter() - start
+
+    if incremental != full:
+        raise AssertionError("the incremental and full evaluations differ")
+
+    for name, seconds in (("incremental", incremental_seconds), ("full board", full_seconds)):
+        print("%-12s %8d moves  %8.1f us/move" % (name, total, seconds / total * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Description:  Measures MCTS playouts per second from the starting position
+# with 1, 2, 4, ... worker processes up to the number of cores, and the speedup
+# over one worker.  The process pool is started before timing so that worker
+# start-up is not counted.
+#
+# Usage:  python benchmarks/bench_mcts.py [time_ms] [max_workers]
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GessGame import GessGame
+from GessMcts import MctsPlayer
+
+
+def worker_counts(limit):
+    """ Returns 1, 2, 4, ... up to and including the limit. """
+    counts = []
+    workers = 1
+    while workers < limit:
+        counts.append(workers)
+        workers *= 2
+    counts.append(limit)
+    return counts
+
+
+def main():
+    time_ms = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    game = GessGame()
+
+    print("%8s %10s %14s %8s" % ("workers", "playouts", "playouts/s", "speedup"))
+    base = None
+    for workers in worker_counts(limit):
+        player = MctsPlayer(time_ms=time_ms, workers=workers, seed=workers)
+        if workers == 1:
+            result = player.search(game)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Warm the pool up so that every worker has imported the rules.
+                MctsPlayer(time_ms=10, workers=workers).search(game, executor)
+                result = player.search(game, executor)
+        rate = result.playouts_per_second
+        base = base or rate
+        print("%8d %10d %14.0f %8.2f" % (workers, result.playouts, rate, rate / base))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# Description:  Times GessGame.generate_moves on the starting position and on
+# midgame positions reached by seeded random play.
+#
+# Usage:  python benchmarks/bench_movegen.py [plies] [runs]
+
+import sys
+import time
+
+from positions import random_game
+
+from GessGame import GessGame
+
+
+def time_generate(game, runs):
+    """ Returns the number of legal moves and the mean time per call in microseconds. """
+    start = time.perf_counter()
+    for _ in range(runs):
+        moves = game.generate_moves()
+    return len(moves), (time.perf_counter() - start) / runs * 1e6
+
+
+def main():
+    plies = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    print("%-20s %8s %12s" % ("position", "moves", "us/call"))
+    count, elapsed = time_generate(GessGame(), runs)
+    print("%-20s %8d %12.1f" % ("start", count, elapsed))
+    for seed in range(5):
+        count, elapsed = time_generate(random_game(plies, seed), runs)
+        print("%-20s %8d %12.1f" % ("midgame seed %d" % seed, count, elapsed))
+
+
+if __name__ == "__main__":
+    main()
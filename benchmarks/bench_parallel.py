@@ -0,0 +1,56 @@
+# Description:  Measures the speedup curve of the Lazy SMP search in GessParallel
+# with 1, 2, 4, ... worker processes up to the number of cores.  Each run times
+# how long it takes to complete a fixed depth on midgame positions, starting
+# from an empty shared table, and reports the speedup over one worker.  The
+# worker processes are started before timing.
+#
+# Usage:  python benchmarks/bench_parallel.py [depth] [max_workers] [positions]
+
+import os
+import sys
+import time
+
+from positions import midgame_positions
+
+from GessParallel import ParallelSearcher
+
+
+def worker_counts(limit):
+    """ Returns 1, 2, 4, ... up to and including the limit. """
+    counts = []
+    workers = 1
+    while workers < limit:
+        counts.append(workers)
+        workers *= 2
+    counts.append(limit)
+    return counts
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    games = midgame_positions(count)
+
+    print("%8s %10s %12s %10s %8s" % ("workers", "seconds", "nodes", "nps", "speedup"))
+    base = None
+    for workers in worker_counts(limit):
+        with ParallelSearcher(workers) as searcher:
+            # Warm the pool up so that every worker has imported the rules.
+            searcher.search(games[0], max_depth=1)
+
+            seconds = 0.0
+            nodes = 0
+            for game in games:
+                searcher.table.clear()
+                start = time.perf_counter()
+                result = searcher.search(game, time_ms=None, max_depth=depth)
+                seconds += time.perf_counter() - start
+                nodes += result.nodes
+        base = base or seconds
+        print("%8d %10.2f %12d %10.0f %8.2f" % (workers, seconds, nodes, nodes / seconds,
+                                                base / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Description:  Compares keeping a game history as list of lists boards with
+# keeping it as Position snapshots: the memory per position, measured with
+# tracemalloc, and the time to take a snapshot after every move.
+#
+# Usage:  python benchmarks/bench_position.py [games] [plies]
+
+import sys
+import time
+import tracemalloc
+
+from positions import random_game
+
+from GessGame import GessGame
+
+
+def measure(games, take):
+    """
+    Replays every game and keeps take(game) after each move. Returns the number
+    of snapshots, the bytes they hold and the seconds spent taking them.
+    """
+    histories = [game.get_move_history() for game in games]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = []
+    seconds = 0.0
+    for moves in histories:
+        game = GessGame()
+        for move in moves:
+            game.push_move(*move)
+            start = time.perf_counter()
+            kept.append(take(game))
+            seconds += time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return len(kept), used, seconds
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    plies = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    games = [random_game(plies, seed) for seed in range(count)]
+
+    print("%-12s %10s %14s %14s" % ("snapshot", "positions", "bytes/position", "us/snapshot"))
+    for name, take in (("board", lambda game: game.get_board()),
+                       ("Position", lambda game: game.get_position()),
+                       ("packed", lambda game: game.get_position().pack())):
+        positions, used, seconds = measure(games, take)
+        print("%-12s %10d %14.0f %14.2f" % (name, positions, used / positions,
+                                             seconds / positions * 1e6))
+
+
+if __name__ == "__main__":
+    main()
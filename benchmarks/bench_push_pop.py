@@ -0,0 +1,29 @@
+# Description:  Measures how many moves per second GessGame.push_move and
+# pop_move can make and take back by visiting every legal move of midgame
+# positions, the way a search walks the game tree.
+#
+# Usage:  python benchmarks/bench_push_pop.py [positions]
+
+import sys
+import time
+
+from positions import midgame_positions
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    games = midgame_positions(count)
+    move_lists = [game.generate_moves() for game in games]
+    total = sum(len(moves) for moves in move_lists)
+
+    start = time.perf_counter()
+    for game, moves in zip(games, move_lists):
+        for move in moves:
+            game.push_move(*move)
+            game.pop_move()
+    elapsed = time.perf_counter() - start
+    print("push_move + pop_move  %8d moves  %10.0f moves/s" % (total, total / elapsed))
+
+
+if __name__ == "__main__":
+    main()
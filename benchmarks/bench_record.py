@@ -0,0 +1,69 @@
+# Description:  Measures GessRecord.  Writes the same random games, repeated to
+# the requested number, as a JSON lines archive and as a binary record, then
+# reports the size of both, the time to write the record and the time to read
+# random (game, ply) moves from it, which should not depend on the number of
+# games.  For comparison, also times finding one late game in the JSON lines.
+#
+# Usage:  python benchmarks/bench_record.py [games] [lookups]
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from positions import random_game
+
+from GessRecord import RecordReader, RecordWriter
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    samples = [random_game(400, seed).get_move_history() for seed in range(20)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        text_path = os.path.join(directory, "games.jsonl")
+        record_path = os.path.join(directory, "games.gessrec")
+        with open(text_path, "w") as archive:
+            for number in range(games):
+                moves = samples[number % len(samples)]
+                archive.write(json.dumps({"moves": [list(move) for move in moves]},
+                                         separators=(",", ":")) + "\n")
+
+        start = time.perf_counter()
+        with RecordWriter(record_path) as writer:
+            for number in range(games):
+                writer.add(samples[number % len(samples)])
+        written = time.perf_counter() - start
+        print("%d games  JSON lines %.1f MB  record %.1f MB  written in %.2f s" % (
+            games, os.path.getsize(text_path) / 1e6, os.path.getsize(record_path) / 1e6, written))
+
+        rng = random.Random(0)
+        with RecordReader(record_path) as reader:
+            pairs = []
+            for _ in range(lookups):
+                game = rng.randrange(games)
+                pairs.append((game, rng.randrange(max(reader.plies(game), 1))))
+            start = time.perf_counter()
+            for game, ply in pairs:
+                if reader.plies(game):
+                    reader.move(game, ply)
+            seconds = time.perf_counter() - start
+            print("record     random move      %8.2f us/lookup" % (seconds / lookups * 1e6))
+
+            start = time.perf_counter()
+            reader.moves(games - 1)
+            print("record     last game        %8.2f us" % ((time.perf_counter() - start) * 1e6))
+
+        start = time.perf_counter()
+        with open(text_path) as archive:
+            for line in archive:
+                pass
+            json.loads(line)
+        print("JSON lines last game        %8.2f us" % ((time.perf_counter() - start) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
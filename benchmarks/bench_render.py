@@ -0,0 +1,44 @@
+# Description:  Measures GessRender.  Writes an archive of random games, then
+# renders it to PNG frames, and optionally to GIFs, with 1, 2, 4, ... worker
+# processes and reports frames per minute.
+#
+# Usage:  python benchmarks/bench_render.py [games] [max workers] [--gif]
+
+import os
+import sys
+import tempfile
+
+from positions import random_game
+
+from GessRender import render
+
+
+def write_archive(path, games, plies=60):
+    """ Writes the given number of seeded random games of up to plies moves. """
+    with open(path, "w") as archive:
+        for seed in range(games):
+            moves = random_game(plies, seed).get_move_history()
+            archive.write('{"moves":%s}\n' % [list(move) for move in moves])
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != "--gif"]
+    gif = "--gif" in sys.argv[1:]
+    games = int(args[0]) if args else 20
+    limit = int(args[1]) if len(args) > 1 else os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "games.jsonl")
+        write_archive(path, games)
+
+        workers = 1
+        while workers <= limit:
+            output = os.path.join(directory, "frames%d" % workers)
+            (rendered, frames, _), seconds = render([path], output, gif=gif, workers=workers)
+            print("%2d workers  %3d games  %6d frames  %10.0f frames/min" % (
+                workers, rendered, frames, frames / seconds * 60))
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# Description:  Runs GessSearch.best_move on the starting position and on
+# midgame positions and reports the depth reached, the nodes searched and the
+# nodes per second.
+#
+# Usage:  python benchmarks/bench_search.py [time_ms] [positions]
+
+import sys
+
+from positions import midgame_positions
+
+from GessGame import GessGame
+from GessSearch import best_move
+
+
+def main():
+    time_ms = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    games = [("start", GessGame())]
+    games += [("midgame seed %d" % seed, game)
+              for seed, game in enumerate(midgame_positions(count))]
+
+    print("%-16s %6s %10s %10s %8s  %s" % ("position", "depth", "nodes", "nps", "score", "move"))
+    for name, game in games:
+        result = best_move(game, time_ms)
+        print("%-16s %6d %10d %10.0f %8d  %s" % (name, result.depth, result.nodes, result.nps,
+                                                result.score, result.move))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Description:  A load-test client for GessServer.  Opens many connections to a
+# server on localhost, plays random legal games on all of them at once, and
+# reports the moves per second and the median and 99th percentile time from
+# sending a MOVE to receiving its MOVED line.  Starts its own server in a
+# separate process unless an address is given.
+#
+# Usage:  python benchmarks/bench_server.py [--connect host:port] [--clients 50] [--seconds 10]
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from GessGame import GessGame
+from GessMcts import push_random_move
+
+
+async def request(reader, writer, line):
+    """ Sends one command and returns the words of the reply. """
+    writer.write(line.encode("ascii") + b"\n")
+    await writer.drain()
+    reply = (await reader.readline()).decode("ascii").split()
+    if not reply or reply[0] == "ERROR":
+        raise RuntimeError("%s -> %s" % (line, " ".join(reply)))
+    return reply
+
+
+async def client(host, port, deadline, seed, latencies):
+    """
+    Plays random games on one connection until the deadline, adding the time of
+    every move in seconds to latencies. Returns the number of games finished.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    finished = 0
+    try:
+        while time.perf_counter() < deadline:
+            game_id = (await request(reader, writer, "NEW"))[1]
+            await request(reader, writer, "JOIN %s x" % game_id)
+            await request(reader, writer, "JOIN %s o" % game_id)
+            game = GessGame()
+            while game.get_game_state() == "UNFINISHED" and game.get_ply_count() < 300 \
+                    and time.perf_counter() < deadline:
+                move = push_random_move(game, rng)
+                if move is None:
+                    break
+                start = time.perf_counter()
+                await request(reader, writer, "MOVE %s %d %d %d %d" % ((game_id,) + move))
+                latencies.append(time.perf_counter() - start)
+            if game.get_game_state() != "UNFINISHED":
+                finished += 1
+            await request(reader, writer, "LEAVE %s" % game_id)
+        writer.write(b"QUIT\n")
+        await writer.drain()
+    finally:
+        writer.close()
+    return finished
+
+
+def start_server():
+    """ Starts GessServer on a free port in a new process. Returns the process and port. """
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "GessServer.py"), "--port", "0",
+                                "--workers", "1"], stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    return process, int(line.rsplit(":", 1)[1])
+
+
+async def run(host, port, clients, seconds):
+    """ Runs the clients against the server and prints the results. """
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + seconds
+    finished = await asyncio.gather(*(client(host, port, deadline, seed, latencies)
+                                      for seed in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    if not latencies:
+        print("no moves were made")
+        return
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print("%d clients, %d moves, %d finished games in %.1f s" % (clients, len(latencies),
+                                                                sum(finished), elapsed))
+    print("%.0f moves/s, p50 %.2f ms, p99 %.2f ms, max %.2f ms" % (
+        len(latencies) / elapsed, p50 * 1000, p99 * 1000, latencies[-1] * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a GessServer.")
+    parser.add_argument("--connect", help="host:port of a running server")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent connections")
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of the test")
+    args = parser.parse_args()
+
+    process = None
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        port = int(port)
+    else:
+        process, port = start_server()
+        host = "127.0.0.1"
+    try:
+        asyncio.run(run(host, port, args.clients, args.seconds))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Description:  Measures how the cost of GessGame grows with the size of the
+# board.  For each size, plays seeded random moves to reach a midgame position,
+# then times push_move and pop_move over a sample of its legal moves, and
+# generate_moves on the position.  A move should cost about the same on every
+# board, while generating every move grows with the number of pieces.
+#
+# Usage:  python benchmarks/bench_sizes.py [sizes ...]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GessGame import GessGame
+from GessMcts import push_random_move
+
+
+def midgame(size, plies=30, seed=0):
+    """ Returns a GessGame of the given size after seeded random moves. """
+    rng = random.Random(seed)
+    game = GessGame(size)
+    for _ in range(plies):
+        if push_random_move(game, rng) is None:
+            break
+    return game
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [20, 50, 100]
+    print("size    new game us   push+pop us/move   generate_moves ms   moves")
+    for size in sizes:
+        start = time.perf_counter()
+        GessGame(size)
+        created = time.perf_counter() - start
+
+        game = midgame(size)
+        start = time.perf_counter()
+        moves = game.generate_moves()
+        generated = time.perf_counter() - start
+
+        sample = random.Random(size).sample(moves, min(len(moves), 300))
+        start = time.perf_counter()
+        for move in sample:
+            game.push_move(*move)
+            game.pop_move()
+        pushed = time.perf_counter() - start
+
+        print("%4d %14.0f %18.1f %19.1f %7d" % (
+            size, created * 1e6, pushed / len(sample) * 1e6, generated * 1e3, len(moves)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Description:  Times Bitboard.slide_masks against the recursive Move methods on
+# every straight line move of every valid piece in midgame positions, grouped by
+# the length of the move, and checks that both give the same boards.
+#
+# Usage:  python benchmarks/bench_slide.py [positions] [plies]
+
+import sys
+import time
+
+from positions import midgame_positions
+
+from GessBitboard import Bitboard
+from GessGame import GamePiece, Move
+from GessPerft import REFERENCE_DIRECTIONS
+
+GROUPS = ((1, 3), (4, 9), (10, 17))
+
+
+def candidate_moves(board, player):
+    """
+    Returns (x, y, dx, dy, move_spaces, direction) for every move of a valid piece
+    in a direction it can move in, whether or not the move is legal.
+    """
+    moves = []
+    for y in range(1, 19):
+        for x in range(1, 19):
+            game_piece = GamePiece(board, player, x, y)
+            if not game_piece.valid_piece():
+                continue
+            limit = 3 if game_piece.move_three() else 17
+            for (dx, dy), allowed, direction in REFERENCE_DIRECTIONS:
+                if not getattr(game_piece, allowed)():
+                    continue
+                for move_spaces in range(1, limit + 1):
+                    if not (0 < x + dx * move_spaces < 19 and 0 < y + dy * move_spaces < 19):
+                        break
+                    moves.append((x, y, dx, dy, move_spaces, direction))
+    return moves
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    plies = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    totals = {group: [0, 0, 0.0, 0.0] for group in GROUPS}
+
+    for game in midgame_positions(count, plies):
+        board = game.get_board()
+        bitboard = game.get_bitboard()
+        player = game.get_current_player()
+        for x, y, dx, dy, move_spaces, direction in candidate_moves(board, player):
+            group = next(group for group in GROUPS if group[0] <= move_spaces <= group[1])
+
+            start = time.perf_counter()
+            masks = bitboard.slide_masks(player, x, y, dx, dy, move_spaces)
+            slide_seconds = time.perf_counter() - start
+
+            move = Move(GamePiece(board, player, x, y).playing_piece(), player)
+            new_board = [[square for square in row] for row in board]
+            start = time.perf_counter()
+            result = getattr(move, direction)(new_board, x, y, move_spaces)
+            move_seconds = time.perf_counter() - start
+
+            if (masks is None) != (result is False) or \
+                    (masks is not None and Bitboard(*masks).to_board() != result):
+                raise AssertionError("slide_masks differs from Move.%s at %r"
+                                     % (direction, (x, y, move_spaces)))
+
+            total = totals[group]
+            total[0] += 1
+            total[1] += masks is not None
+            total[2] += slide_seconds
+            total[3] += move_seconds
+
+    print("%-8s %8s %8s %14s %14s %9s" % ("squares", "moves", "legal", "slide us/move",
+                                           "Move us/move", "speedup"))
+    for (low, high), (moves, legal, slide_seconds, move_seconds) in totals.items():
+        if not moves:
+            continue
+        print("%-8s %8d %8d %14.1f %14.1f %8.1fx" % (
+            "%d-%d" % (low, high), moves, legal, slide_seconds / moves * 1e6,
+            move_seconds / moves * 1e6, move_seconds / slide_seconds))
+
+
+if __name__ == "__main__":
+    main()
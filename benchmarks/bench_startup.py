@@ -0,0 +1,53 @@
+# Description:  Measures how long it takes to start a fresh Python process and
+# import the headless Gess rules, compared with an empty interpreter and with
+# the Pygame front end.  Each import runs in its own process so nothing is
+# cached between samples.
+#
+# Usage:  python benchmarks/bench_startup.py [runs]
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [("python (no import)", "pass"),
+         ("import GessGame", "import GessGame"),
+         ("import GessGame + new game", "import GessGame; GessGame.GessGame()"),
+         ("import GessGui (pygame)", "import GessGui")]
+
+
+def time_import(statement, runs):
+    """
+    Runs the statement in a new interpreter the given number of times. Returns
+    a list of wall clock times in milliseconds, or None if the statement fails,
+    for example because Pygame is not installed.
+    """
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", statement], cwd=ROOT, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            return None
+    return times
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print("%-30s %10s %10s %10s" % ("case", "median ms", "min ms", "max ms"))
+    for name, statement in CASES:
+        times = time_import(statement, runs)
+        if times is None:
+            print("%-30s %10s" % (name, "unavailable"))
+            continue
+        print("%-30s %10.1f %10.1f %10.1f" % (name, statistics.median(times),
+                                             min(times), max(times)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# Description:  Positions shared by the benchmarks.  Midgame positions are
+# reached by seeded random play so that every run measures the same boards.
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GessGame import GessGame
+
+
+def random_game(plies, seed):
+    """ Returns a GessGame after the given number of seeded random legal moves. """
+    rng = random.Random(seed)
+    game = GessGame()
+    for _ in range(plies):
+        moves = game.generate_moves()
+        if not moves:
+            break
+        game.push_move(*rng.choice(moves))
+    return game
+
+
+def midgame_positions(count, plies=30):
+    """ Returns a list of GessGames reached by seeded random play. """
+    return [random_game(plies, seed) for seed in range(count)]